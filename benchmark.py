@@ -0,0 +1,138 @@
+'''
+Repeatable timing of a query workload.
+
+Every query is run a few times untimed to warm the caches, then timed over a number of repetitions,
+the timing including the fetch of all rows. Results give min, p50, p95 and max per query and can be
+written to JSON, so runs before and after a change (e.g. indexing) can be compared.
+'''
+
+import json
+import math
+import time
+
+
+def percentile(values, fraction):
+    '''
+    Nearest-rank percentile
+    :param values: list of numbers
+    :param fraction: between 0 and 1, e.g. 0.95
+    :return: the value, None for an empty list
+    '''
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Benchmark:
+
+    def __init__(self, cursor, queries, warmup=1, repetitions=5, explain=False):
+        '''
+        :param cursor: psycopg2 cursor
+        :param queries: list of (name, query)
+        :param warmup: untimed runs per query
+        :param repetitions: timed runs per query, at least one
+        :param explain: also capture EXPLAIN (ANALYZE, BUFFERS) of every query, after the timed runs
+        '''
+        if repetitions < 1:
+            raise ValueError("a benchmark needs at least one timed repetition, got %r" % repetitions)
+        self.cursor = cursor
+        self.queries = queries
+        self.warmup = warmup
+        self.repetitions = repetitions
+        self.explain = explain
+
+    def run(self):
+        '''
+        Run the workload
+        :return: dict of query name to dict with rows, seconds of every repetition, min, p50, p95, max and plan
+        '''
+        results = {}
+        for name, query in self.queries:
+            for i in range(self.warmup):
+                self.cursor.execute(query)
+                self.cursor.fetchall()
+
+            seconds = []
+            rows = 0
+            for i in range(self.repetitions):
+                start_time = time.time()
+                self.cursor.execute(query)
+                rows = len(self.cursor.fetchall())
+                seconds.append(time.time() - start_time)
+
+            results[name] = {
+                'rows': rows,
+                'seconds': seconds,
+                'min': min(seconds),
+                'p50': percentile(seconds, 0.5),
+                'p95': percentile(seconds, 0.95),
+                'max': max(seconds),
+                'plan': self.plan(query) if self.explain else None,
+            }
+        return results
+
+    def plan(self, query):
+        '''
+        Executed plan of a query with buffer usage
+        :param query: SQL query
+        :return: plan text
+        '''
+        self.cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query)
+        return '\n'.join(row[0] for row in self.cursor.fetchall())
+
+
+def write_results(results, path, label=None):
+    '''
+    Write benchmark results to a JSON file
+    :param results: dict returned by Benchmark.run
+    :param path: file path
+    :param label: name of the run
+    :return: None
+    '''
+    with open(path, 'w') as f_out:
+        json.dump({'label': label, 'time': time.time(), 'queries': results}, f_out, indent=2)
+
+
+def read_results(path):
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def print_results(results):
+    for name, result in results.items():
+        print("--- %s: p50 %.4f p95 %.4f max %.4f seconds, %d rows ---" %
+              (name, result['p50'], result['p95'], result['max'], result['rows']))
+        if result['plan']:
+            print(result['plan'])
+
+
+def compare(before, after, threshold=0.1):
+    '''
+    Compare the p50 timings of two runs
+    :param before: results dict or JSON path of the first run
+    :param after: results dict or JSON path of the second run
+    :param threshold: relative change below which a query counts as unchanged
+    :return: dict of query name to (p50 before, p50 after, speedup, 'faster'/'slower'/'same')
+    '''
+    if isinstance(before, str):
+        before = read_results(before)['queries']
+    if isinstance(after, str):
+        after = read_results(after)['queries']
+
+    comparison = {}
+    for name in before:
+        if name not in after:
+            continue
+        old, new = before[name]['p50'], after[name]['p50']
+        speedup = old / new if new else float('inf')
+        if new < old * (1 - threshold):
+            verdict = 'faster'
+        elif new > old * (1 + threshold):
+            verdict = 'slower'
+        else:
+            verdict = 'same'
+        comparison[name] = (old, new, speedup, verdict)
+        print("%s: %.4f -> %.4f seconds (x%.2f, %s)" % (name, old, new, speedup, verdict))
+    return comparison
@@ -0,0 +1,214 @@
+'''
+Database connections shared by the loading, querying and normalization programs.
+
+A pool hands out autocommit connections to any number of threads. It opens them lazily up to a limit
+and replaces the ones that broke. Connecting, and statements run through the pool, are retried with
+exponential backoff when they fail with a transient error: a dropped connection, a serialization
+failure, a deadlock or a server restart.
+'''
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+
+# SQLSTATE class 08 (connection exception), serialization failure, deadlock, server shutdown and restart
+TRANSIENT_CODES = ('08', '40001', '40P01', '57P01', '57P02', '57P03')
+
+
+def is_transient(error):
+    '''
+    Whether a failed statement is worth another try
+    :param error: psycopg2.Error
+    :return: bool
+    '''
+    code = getattr(error, 'pgcode', None)
+    if code is None:
+        # no SQLSTATE: the connection itself failed
+        return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+    return code.startswith(TRANSIENT_CODES)
+
+
+def retry(function, attempts=3, delay=0.5):
+    '''
+    Call a function, calling it again after a transient database error
+    :param function: callable without arguments
+    :param attempts: total number of calls at most
+    :param delay: seconds before the second call, doubled before every further one
+    :return: what the function returns
+    '''
+    for attempt in range(attempts):
+        try:
+            return function()
+        except psycopg2.Error as e:
+            if attempt == attempts - 1 or not is_transient(e):
+                raise
+            print("retrying after %s" % getattr(e, 'message', str(e)).strip())
+            time.sleep(delay * 2 ** attempt)
+
+
+class ConnectionPool:
+    '''
+    Thread-safe pool of autocommit connections to one database
+    '''
+
+    def __init__(self, connect_args, size=4, attempts=3):
+        '''
+        :param connect_args: keyword arguments of psycopg2.connect
+        :param size: most connections open at the same time; get() waits while all are in use
+        :param attempts: calls per connect or run before a transient error is raised
+        '''
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.attempts = attempts
+        # idle connections, or None for a slot that may open a new one
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def connect(self):
+        '''
+        Open a new autocommit connection outside the pool
+        :return: psycopg2 connection
+        '''
+        def connect():
+            connection = psycopg2.connect(**self.connect_args)
+            connection.autocommit = True
+            return connection
+        return retry(connect, self.attempts)
+
+    def get(self):
+        '''
+        Take a connection, opening one if none is idle and the pool is not full
+        :return: psycopg2 connection, to be handed back with put
+        '''
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                below_size = self._opened < self.size
+                if below_size:
+                    self._opened += 1
+            connection = None if below_size else self._idle.get()
+        if connection is not None:
+            return connection
+        try:
+            return self.connect()
+        except Exception:
+            self._idle.put(None)
+            raise
+
+    def put(self, connection):
+        '''
+        Hand a connection back. An open transaction is rolled back; a broken connection is closed and its
+        slot freed for a new one.
+        '''
+        status = None if connection.closed else connection.get_transaction_status()
+        if status in (psycopg2.extensions.TRANSACTION_STATUS_INTRANS, psycopg2.extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+                status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            except psycopg2.Error:
+                status = None
+        if status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._idle.put(connection)
+            return
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        self._idle.put(None)
+
+    @contextmanager
+    def connection(self):
+        connection = self.get()
+        try:
+            yield connection
+        finally:
+            self.put(connection)
+
+    def run(self, function):
+        '''
+        Call a function with a cursor on a pooled connection. After a transient error it is called again,
+        on whatever connection is free then, so it has to be safe to repeat.
+        :param function: callable taking a cursor
+        :return: what the function returns
+        '''
+        def attempt():
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    return function(cursor)
+        return retry(attempt, self.attempts)
+
+    def close(self):
+        '''
+        Close the idle connections. The pool stays usable and opens new ones when needed.
+        '''
+        slots = []
+        while True:
+            try:
+                slots.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for connection in slots:
+            if connection is not None:
+                connection.close()
+            self._idle.put(None)
+
+
+class DatabaseConnection:
+    '''
+    Base of the DatabaseConnection classes of the programs: one connection and cursor for the sequential
+    steps, plus a pool for the steps that run on several connections at a time.
+    '''
+
+    def __init__(self, h, db, username, pwd, pool_size=4):
+        '''
+        Constructor is used to connect to the database. Raises psycopg2.Error if it cannot.
+        :param h: hostname
+        :param db: database name
+        :param username: Username
+        :param pwd: password
+        :param pool_size: most pooled connections open at the same time
+        '''
+        self.connect_args = dict(host=str(h), database=str(db), user=str(username), password=str(pwd))
+        self.pool = ConnectionPool(self.connect_args, pool_size)
+        # connecting is already retried; an error that remains is raised rather than leaving no cursor behind
+        self.connection = self.connect()
+        self.cursor = self.connection.cursor()
+
+    def connect(self):
+        '''
+        Open another autocommit connection to the same database
+        :return: psycopg2 connection
+        '''
+        return self.pool.connect()
+
+    def run_concurrently(self, queries, workers=None):
+        '''
+        Run independent read-only queries at the same time, each on a pooled connection
+        :param queries: list of (name, query)
+        :param workers: queries running at the same time, the pool size by default
+        :return: dict of query name to (rows, seconds including the fetch), in query order
+        '''
+        def timed(query):
+            def fetch(cursor):
+                start_time = time.time()
+                cursor.execute(query)
+                rows = cursor.fetchall()
+                return rows, time.time() - start_time
+            return self.pool.run(fetch)
+
+        with ThreadPoolExecutor(workers or self.pool.size) as executor:
+            futures = [(name, executor.submit(timed, query)) for name, query in queries]
+            return {name: future.result() for name, future in futures}
+
+    def close(self):
+        self.pool.close()
+        if getattr(self, 'connection', None) is not None:
+            self.connection.close()
@@ -0,0 +1,193 @@
+'''
+Bulk extraction of a table into dictionary-encoded integer columns.
+
+The table is streamed once with COPY ... TO STDOUT (FORMAT binary). Every column is encoded into an
+array of small ints, one per row, with equal values (and NULLs, which get a code of their own) sharing
+a code. The FD algorithms only compare codes, so values are kept in their raw binary form and only
+decoded when they need to be shown.
+'''
+
+import hashlib
+import struct
+from array import array
+
+
+COPY_SIGNATURE = b'PGCOPY\n\377\r\n\0'
+
+_INT16 = struct.Struct('>h')
+_INT32 = struct.Struct('>i')
+
+# binary decoders by type oid, for showing dictionary values
+DECODERS = {
+    16: lambda raw: raw != b'\0',
+    20: lambda raw: struct.unpack('>q', raw)[0],
+    21: lambda raw: struct.unpack('>h', raw)[0],
+    23: lambda raw: struct.unpack('>i', raw)[0],
+    700: lambda raw: struct.unpack('>f', raw)[0],
+    701: lambda raw: struct.unpack('>d', raw)[0],
+    19: lambda raw: raw.decode('utf-8'),
+    25: lambda raw: raw.decode('utf-8'),
+    1042: lambda raw: raw.decode('utf-8'),
+    1043: lambda raw: raw.decode('utf-8'),
+}
+
+
+class EncodedRelation:
+    '''
+    A relation held as one int array per column plus, per column, the list of distinct raw values by code.
+    '''
+
+    def __init__(self, names, types=None):
+        '''
+        :param names: column names
+        :param types: column type oids, used only to decode values for display
+        '''
+        self.names = list(names)
+        self.types = list(types) if types is not None else [None] * len(self.names)
+        self.columns = [array('i') for name in self.names]
+        self.dictionaries = [[] for name in self.names]
+        self.row_ids = array('q')
+        # sha256 of the COPY stream the relation was extracted from, to tell snapshots of different data apart
+        self.checksum = None
+        # table, where condition and id column the relation was extracted with
+        self.source = None
+        self._codes = [{} for name in self.names]
+
+    @property
+    def num_rows(self):
+        return len(self.row_ids)
+
+    def materialize(self):
+        '''
+        Copy columns and row ids mapped from a snapshot into arrays and rebuild the value to code lookups
+        from the dictionaries, so that the relation can be pickled and rows appended to it
+        :return: None
+        '''
+        if not isinstance(self.row_ids, array):
+            self.row_ids = array('q', self.row_ids.tobytes())
+            self.columns = [array('i', column.tobytes()) for column in self.columns]
+        if len(self._codes) != len(self.names) or any(len(codes) != len(dictionary)
+                                                      for codes, dictionary in zip(self._codes, self.dictionaries)):
+            self._codes = [{value: code for code, value in enumerate(dictionary)} for dictionary in self.dictionaries]
+
+    def add_row(self, row_id, values):
+        '''
+        Append one row
+        :param row_id: id of the row in the source table
+        :param values: raw column values, None for NULL
+        :return: None
+        '''
+        for value, column, codes, dictionary in zip(values, self.columns, self._codes, self.dictionaries):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            column.append(code)
+        self.row_ids.append(row_id)
+
+    def decode(self, position, code):
+        '''
+        Value behind a code
+        :param position: column position
+        :param code: code in that column
+        :return: decoded value, or the raw bytes if the type has no decoder
+        '''
+        raw = self.dictionaries[position][code]
+        decoder = DECODERS.get(self.types[position])
+        if raw is None or decoder is None:
+            return raw
+        return decoder(raw)
+
+
+class BinaryCopyReader:
+    '''
+    File-like sink for copy_expert that parses a binary COPY stream as it arrives.
+    The first field of every tuple is the row id; the remaining fields are added to the relation.
+    '''
+
+    def __init__(self, relation):
+        self.relation = relation
+        self.bytes_read = 0
+        self.checksum = hashlib.sha256()
+        self._buffer = b''
+        self._header_done = False
+
+    def write(self, data):
+        self.bytes_read += len(data)
+        self.checksum.update(data)
+        buffer = self._buffer + bytes(data)
+        offset = 0
+
+        if not self._header_done:
+            if len(buffer) >= 11 and buffer[:11] != COPY_SIGNATURE:
+                raise ValueError("not a binary COPY stream")
+            # signature, flags and the length of the header extension that follows them
+            if len(buffer) < 19 or len(buffer) < 19 + _INT32.unpack_from(buffer, 15)[0]:
+                self._buffer = buffer
+                return len(data)
+            offset = 19 + _INT32.unpack_from(buffer, 15)[0]
+            self._header_done = True
+
+        add_row = self.relation.add_row
+        end = len(buffer)
+        while offset + 2 <= end:
+            count = _INT16.unpack_from(buffer, offset)[0]
+            if count == -1:
+                offset = end
+                break
+            position = offset + 2
+            values = []
+            for i in range(count):
+                if position + 4 > end:
+                    break
+                length = _INT32.unpack_from(buffer, position)[0]
+                position += 4
+                if length == -1:
+                    values.append(None)
+                    continue
+                if position + length > end:
+                    break
+                values.append(buffer[position:position + length])
+                position += length
+            if len(values) < count:
+                # tuple continues in the next chunk
+                break
+            row_id = values[0]
+            add_row(int.from_bytes(row_id, 'big', signed=True) if row_id is not None else None, values[1:])
+            offset = position
+
+        self._buffer = buffer[offset:]
+        return len(data)
+
+
+def extract(cursor, table, columns, id_column='nid', where=None, relation=None):
+    '''
+    Stream a table once and dictionary-encode its columns
+    :param cursor: psycopg2 cursor
+    :param table: table name
+    :param columns: column names to encode
+    :param id_column: integer column identifying the rows, kept alongside the codes; None for a table without
+                      one, whose rows are numbered in scan order instead
+    :param where: optional SQL condition restricting the rows
+    :param relation: EncodedRelation to append to, so new rows reuse existing codes
+    :return: EncodedRelation
+    '''
+    row_id = id_column if id_column is not None else "row_number() OVER ()"
+    select = "SELECT " + ', '.join([row_id] + list(columns)) + " FROM " + table
+    if where:
+        select += " WHERE " + where
+    if id_column is not None:
+        select += " ORDER BY " + id_column
+
+    fresh = relation is None
+    if fresh:
+        cursor.execute(select + " LIMIT 0")
+        relation = EncodedRelation(columns, [description[1] for description in cursor.description[1:]])
+
+    reader = BinaryCopyReader(relation)
+    cursor.copy_expert("COPY (" + select + ") TO STDOUT (FORMAT binary)", reader)
+    # a checksum of appended rows alone would not describe the relation
+    relation.checksum = reader.checksum.hexdigest() if fresh else None
+    if fresh:
+        relation.source = {'table': table, 'where': where, 'id_column': id_column}
+    return relation
@@ -0,0 +1,256 @@
+'''
+Reasoning over sets of functional dependencies: attribute closure, minimal cover, candidate keys and
+3NF/BCNF decomposition.
+
+Attribute sets are int bitmasks over the column positions, as in tane.py, and dependencies are
+(lhs mask, rhs column position) pairs, the form Tane.run returns. Dependencies with the same LHS are
+merged, and the dependency set is also indexed the other way round: per attribute, a bitset of the
+dependencies using it on the left and of those giving it on the right. A closure then grows a round at a
+time, where one OR per missing attribute finds every dependency that can fire. A closure takes at most
+one round per attribute, and each round is linear in the number of dependencies, run word-parallel on
+Python ints, which keeps sets of tens of thousands of dependencies fast.
+'''
+
+from partitions import bits
+
+
+class FDSet:
+    '''
+    Dependencies indexed for repeated closure computations
+    '''
+
+    def __init__(self, fds, num_attributes):
+        '''
+        :param fds: iterable of (lhs mask, rhs column position) pairs
+        :param num_attributes: number of columns
+        '''
+        self.num_attributes = num_attributes
+        self.everything = (1 << num_attributes) - 1
+        merged = {}
+        for lhs, rhs in fds:
+            merged[lhs] = merged.get(lhs, 0) | 1 << rhs
+        self.lhs = list(merged)
+        self.rhs = [merged[lhs] for lhs in self.lhs]
+        self.index = {lhs: i for i, lhs in enumerate(self.lhs)}
+        # per attribute position, the dependencies (bit i for the i-th LHS) it is on the left and on the right of
+        self.uses = [0] * num_attributes
+        self.gives = [0] * num_attributes
+        for i, (lhs, rhs) in enumerate(zip(self.lhs, self.rhs)):
+            for a in bits(lhs):
+                self.uses[a.bit_length() - 1] |= 1 << i
+            for a in bits(rhs):
+                self.gives[a.bit_length() - 1] |= 1 << i
+        self.all = (1 << len(self.lhs)) - 1
+
+    def __iter__(self):
+        '''
+        Dependencies as (lhs mask, rhs column position) pairs
+        '''
+        for lhs, rhs in zip(self.lhs, self.rhs):
+            for a in bits(rhs):
+                yield lhs, a.bit_length() - 1
+
+    def __len__(self):
+        return sum(bin(rhs).count('1') for rhs in self.rhs)
+
+    def closure(self, mask, target=None, skip=None):
+        '''
+        Attributes determined by a set
+        :param mask: attribute set
+        :param target: stop as soon as all of these attributes are in the closure
+        :param skip: (lhs mask, rhs column position) of a dependency to leave out
+        :return: attribute set, complete unless target was reached first
+        '''
+        gives = self.gives
+        if skip is not None and skip[0] in self.index:
+            gives = list(gives)
+            gives[skip[1]] &= ~(1 << self.index[skip[0]])
+
+        result = mask
+        missing = [a for a in range(self.num_attributes) if not mask >> a & 1]
+        while missing and (target is None or result & target != target):
+            blocked = 0
+            for a in missing:
+                blocked |= self.uses[a]
+            fired = self.all & ~blocked
+            new = 0
+            still_missing = []
+            for a in missing:
+                if fired & gives[a]:
+                    new |= 1 << a
+                else:
+                    still_missing.append(a)
+            if not new:
+                break
+            result |= new
+            missing = still_missing
+        return result
+
+    def implies(self, lhs, rhs, skip=None):
+        '''
+        Whether lhs --> rhs follows from the dependencies
+        :param rhs: column position
+        '''
+        return self.closure(lhs, 1 << rhs, skip) >> rhs & 1 == 1
+
+    def is_superkey(self, mask, within=None):
+        '''
+        :param within: attribute set of a subrelation, all attributes by default
+        '''
+        within = self.everything if within is None else within
+        return self.closure(mask, within) & within == within
+
+    def discard(self, lhs, rhs):
+        '''
+        Drop one dependency
+        '''
+        i = self.index[lhs]
+        self.rhs[i] &= ~(1 << rhs)
+        self.gives[rhs] &= ~(1 << i)
+
+
+def minimal_cover(fds, num_attributes):
+    '''
+    Canonical minimal cover: single-attribute RHSs, no extraneous LHS attribute and no redundant dependency
+    :param fds: iterable of (lhs mask, rhs column position) pairs
+    :param num_attributes: number of columns
+    :return: sorted list of (lhs mask, rhs column position) pairs
+    '''
+    fds = {(lhs, rhs) for lhs, rhs in fds if not lhs >> rhs & 1}
+
+    # remove extraneous LHS attributes, checked against the whole set; the closure of an LHS minus one
+    # attribute serves every RHS of that LHS and every other LHS with the same subset
+    fd_set = FDSet(fds, num_attributes)
+    closures = {}
+    reduced = set()
+    for lhs, rhs in fds:
+        for b in bits(lhs):
+            subset = lhs ^ b
+            determined = closures.get(subset)
+            if determined is None:
+                determined = closures[subset] = fd_set.closure(subset)
+            if determined >> rhs & 1:
+                lhs = subset
+        reduced.add((lhs, rhs))
+
+    # remove redundant dependencies one at a time, each checked against the ones still kept
+    fd_set = FDSet(reduced, num_attributes)
+    kept = set(reduced)
+    for lhs, rhs in sorted(reduced, key=lambda fd: (-bin(fd[0]).count('1'), fd)):
+        if fd_set.implies(lhs, rhs, skip=(lhs, rhs)):
+            kept.discard((lhs, rhs))
+            fd_set.discard(lhs, rhs)
+    return sorted(kept, key=lambda fd: (bin(fd[0]).count('1'), fd[0], fd[1]))
+
+
+def candidate_keys(fds, num_attributes, limit=None):
+    '''
+    All candidate keys, by the algorithm of Lucchesi and Osborn
+    :param fds: FDSet or iterable of (lhs mask, rhs column position) pairs
+    :param num_attributes: number of columns
+    :param limit: stop after this many keys
+    :return: list of key masks, smallest first
+    '''
+    fd_set = fds if isinstance(fds, FDSet) else FDSet(fds, num_attributes)
+    # attributes that no dependency determines are in every key
+    determined = 0
+    for lhs, rhs in zip(fd_set.lhs, fd_set.rhs):
+        determined |= rhs & ~lhs
+    core = fd_set.everything & ~determined
+
+    def reduce(mask):
+        for a in bits(mask & ~core):
+            if fd_set.is_superkey(mask ^ a):
+                mask ^= a
+        return mask
+
+    keys = [reduce(fd_set.everything)]
+    for key in keys:
+        if limit is not None and len(keys) >= limit:
+            break
+        for lhs, rhs in zip(fd_set.lhs, fd_set.rhs):
+            for a in bits(rhs & key & ~lhs):
+                superkey = lhs | key & ~a
+                if not any(known & superkey == known for known in keys):
+                    keys.append(reduce(superkey))
+                    if limit is not None and len(keys) >= limit:
+                        return sorted(keys, key=lambda key: (bin(key).count('1'), key))[:limit]
+    return sorted(keys, key=lambda key: (bin(key).count('1'), key))[:limit]
+
+
+def synthesize_3nf(fds, num_attributes):
+    '''
+    Lossless, dependency-preserving 3NF decomposition by Bernstein's synthesis
+    :param fds: iterable of (lhs mask, rhs column position) pairs
+    :param num_attributes: number of columns
+    :return: list of (attribute set, key) pairs, one per relation
+    '''
+    cover = minimal_cover(fds, num_attributes)
+    groups = {}
+    for lhs, rhs in cover:
+        groups[lhs] = groups.get(lhs, lhs) | 1 << rhs
+
+    relations = []
+    for lhs, mask in sorted(groups.items(), key=lambda group: -bin(group[1]).count('1')):
+        if not any(mask & other == mask for other, key in relations):
+            relations.append((mask, lhs))
+
+    fd_set = FDSet(cover, num_attributes)
+    if not any(fd_set.is_superkey(mask) for mask, key in relations):
+        key = candidate_keys(fd_set, num_attributes, limit=1)[0]
+        relations.append((key, key))
+    # attributes outside every dependency belong to the key relation, so nothing is left out
+    return sorted(relations, key=lambda relation: relation[1])
+
+
+def decompose_bcnf(fds, num_attributes, exhaustive=16):
+    '''
+    Lossless BCNF decomposition by repeatedly splitting on a violating dependency X --> X+. Subrelations of
+    up to `exhaustive` attributes are searched for violations over all their subsets, smallest first; larger
+    ones only over the LHSs of the cover, so they can be left with a violation that needs a derived LHS.
+    :param fds: iterable of (lhs mask, rhs column position) pairs
+    :param num_attributes: number of columns
+    :return: list of attribute sets
+    '''
+    fd_set = FDSet(minimal_cover(fds, num_attributes), num_attributes)
+    pending = [fd_set.everything]
+    result = []
+    while pending:
+        relation = pending.pop()
+        violation = _bcnf_violation(fd_set, relation, exhaustive)
+        if violation is None:
+            result.append(relation)
+            continue
+        lhs, determined = violation
+        pending.append(determined)
+        pending.append(lhs | relation & ~determined)
+    return sorted(result)
+
+
+def _bcnf_violation(fd_set, relation, exhaustive):
+    '''
+    A set X inside a relation that determines more than itself but not the whole relation
+    :return: (X, X+ restricted to the relation), None if the relation is in BCNF
+    '''
+    if bin(relation).count('1') <= exhaustive:
+        attributes = list(bits(relation))
+        candidates = sorted((sum(a for i, a in enumerate(attributes) if subset >> i & 1)
+                             for subset in range(1, (1 << len(attributes)) - 1)),
+                            key=lambda mask: bin(mask).count('1'))
+    else:
+        candidates = [lhs for lhs in fd_set.lhs if lhs & relation == lhs]
+    for lhs in candidates:
+        determined = fd_set.closure(lhs, relation) & relation
+        if determined != lhs and determined != relation:
+            return lhs, determined
+    return None
+
+
+def format_relations(relations, names):
+    '''
+    Render attribute sets, e.g. "(movieid, type, runtime)"
+    :param relations: list of attribute sets
+    :param names: column names by position
+    :return: list of strings
+    '''
+    return ["(" + ', '.join(names[a.bit_length() - 1] for a in bits(mask)) + ")" for mask in relations]
@@ -0,0 +1,73 @@
+'''
+Streaming of the gzip-compressed IMDB datasets straight into COPY ... FROM STDIN.
+
+Nothing is decompressed to disk and the database server does not need to see the files: the gzip reader
+is handed to copy_expert, which pulls the decompressed bytes through in chunks of a bounded size.
+Every file is loaded the same way: its header line is skipped, columns are tab-separated and \\N is NULL.
+'''
+
+import gzip
+import os
+
+from metrics import registry
+
+
+CHUNK_SIZE = 1 << 20
+
+
+class GzipCopyStream:
+    '''
+    Read-only file object over the decompressed contents of a .tsv.gz file, minus its header line.
+    '''
+
+    def __init__(self, path, skip_header=True):
+        '''
+        :param path: path of the .gz file
+        :param skip_header: drop the first line
+        '''
+        self.path = path
+        self.bytes_read = 0
+        self._file = gzip.open(path, 'rb')
+        if skip_header:
+            self._file.readline()
+
+    def read(self, size=-1):
+        data = self._file.read(size if size is not None and size >= 0 else CHUNK_SIZE)
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self._file.readline(size)
+        self.bytes_read += len(data)
+        return data
+
+    @property
+    def compressed_bytes_read(self):
+        return self._file.fileobj.tell()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def copy_gzip(cursor, path, table, columns, chunk_size=CHUNK_SIZE):
+    '''
+    Load a .tsv.gz file into a table
+    :param cursor: psycopg2 cursor
+    :param path: path of the .gz file
+    :param table: table name
+    :param columns: table columns in file order
+    :param chunk_size: bytes handed to the server per round trip
+    :return: number of decompressed bytes read
+    '''
+    with GzipCopyStream(path) as stream:
+        cursor.copy_expert("COPY " + table + "(" + ', '.join(columns) + ") FROM STDIN "
+                           "WITH (FORMAT text, DELIMITER E'\\t', NULL '\\N')", stream, chunk_size)
+        registry.inc('gzip_bytes_read', stream.bytes_read, file=os.path.basename(path))
+        registry.inc('gzip_compressed_bytes_read', stream.compressed_bytes_read, file=os.path.basename(path))
+        return stream.bytes_read
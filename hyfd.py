@@ -0,0 +1,261 @@
+'''
+Hybrid discovery of minimal functional dependencies for wide relations (HyFD, Papenbrock and Naumann 2016).
+
+tane.py walks the attribute lattice level by level, which stops scaling after a few dozen columns. The
+hybrid search works on a set of candidate dependencies instead and alternates between two phases:
+
+Sampling compares pairs of rows that agree on some column, neighbours within a window of its sorted
+classes. The agree set of a pair, the columns on which both rows are equal, is a non-FD: it determines
+none of the other columns. Every candidate X --> A with X inside an agree set that lacks A is replaced by
+its specializations X+B, for the columns B the pair disagrees on, so that the candidates stay the minimal
+LHSs that no known non-FD refutes.
+
+Validation checks the candidates against stripped partitions, smallest LHSs first. A failed check yields
+a violating row pair, whose agree set refines the candidates like a sampled one. When too many checks of a
+level fail, sampling finds non-FDs more cheaply, so the search samples again with wider windows on the
+columns whose windows found the most non-FDs so far, then goes on validating.
+'''
+
+from metrics import registry
+from partitions import PartitionCache, StrippedPartition, bits
+
+
+class LhsTree:
+    '''
+    Set-trie of attribute sets, one level per attribute in increasing order, to find the sets inside a given
+    set without looking at all of them
+    '''
+
+    __slots__ = ('children', 'present')
+
+    def __init__(self):
+        self.children = {}
+        self.present = False
+
+    def add(self, mask):
+        node = self
+        for mask_bit in bits(mask):
+            child = node.children.get(mask_bit)
+            if child is None:
+                child = node.children[mask_bit] = LhsTree()
+            node = child
+        node.present = True
+
+    def remove(self, mask):
+        node = self
+        for mask_bit in bits(mask):
+            node = node.children[mask_bit]
+        node.present = False
+
+    def subsets(self, mask, prefix=0):
+        '''
+        :return: generator of the sets in the tree that are subsets of mask
+        '''
+        if self.present:
+            yield prefix
+        children = self.children
+        # the attributes of a path increase, so a child only has to look at the attributes above its own
+        for mask_bit in bits(mask):
+            child = children.get(mask_bit)
+            if child is not None:
+                yield from child.subsets(mask & ~(2 * mask_bit - 1), prefix | mask_bit)
+
+    def has_subset(self, mask):
+        '''
+        :return: whether some set in the tree is a subset of mask
+        '''
+        if self.present:
+            return True
+        children = self.children
+        for mask_bit in bits(mask):
+            child = children.get(mask_bit)
+            if child is not None and child.has_subset(mask & ~(2 * mask_bit - 1)):
+                return True
+        return False
+
+
+class HyFD:
+    '''
+    Finds every minimal non-trivial functional dependency X --> A that holds on a relation given as columns.
+    '''
+
+    def __init__(self, columns, cache_bytes=None, max_lhs=None, switch_ratio=0.01, min_efficiency=0.01):
+        '''
+        :param columns: one sequence of hashable values per attribute, all of the same length
+        :param cache_bytes: byte budget of the partition cache, None for no limit
+        :param max_lhs: only find dependencies with at most this many LHS columns, None for all
+        :param switch_ratio: fraction of failed checks on a level above which the search samples again
+        :param min_efficiency: new non-FDs per compared pair below which a column's window stops growing
+        '''
+        self.columns = columns
+        self.num_attributes = len(columns)
+        self.num_rows = len(columns[0]) if columns else 0
+        self.everything = (1 << self.num_attributes) - 1
+        self.cache = PartitionCache(columns, cache_bytes)
+        self.max_lhs = max_lhs
+        self.switch_ratio = switch_ratio
+        self.min_efficiency = min_efficiency
+        # candidate LHSs per RHS column position; X --> A for the empty X until a non-FD refutes it
+        self.cover = [{0} for a in range(self.num_attributes)]
+        self._trees = [LhsTree() for a in range(self.num_attributes)]
+        for tree in self._trees:
+            tree.add(0)
+        self.valid = set()
+        self.non_fds = set()
+        # per column: its classes sorted for the windows, the distance of the next window and its efficiency
+        self._clusters = None
+        self._distances = [1] * self.num_attributes
+        self._efficiencies = [0.0] * self.num_attributes
+
+    def run(self):
+        '''
+        :return: sorted list of (lhs mask, rhs column position) pairs
+        '''
+        if not self.num_attributes:
+            return []
+        self._induce(self._sample())
+
+        level = 0
+        while True:
+            candidates = {}
+            largest = 0
+            for a, lhss in enumerate(self.cover):
+                for lhs in lhss:
+                    size = bin(lhs).count('1')
+                    largest = max(largest, size)
+                    if size == level and (lhs, a) not in self.valid:
+                        candidates[lhs] = candidates.get(lhs, 0) | 1 << a
+            if level > largest:
+                break
+
+            checked, failed, agree_sets = self._validate(candidates)
+            registry.inc('fd_candidates_checked', checked, level=level)
+            self._induce(agree_sets)
+            if failed > self.switch_ratio * checked:
+                self._induce(self._sample())
+            # candidates on this level that failed were specialized onto higher levels, and the ones that held
+            # can never be refuted, so the level is done
+            level += 1
+
+        fds = [(lhs, a) for a, lhss in enumerate(self.cover) for lhs in lhss]
+        fds.sort(key=lambda fd: (bin(fd[0]).count('1'), fd[0], fd[1]))
+
+        stats = self.cache.stats()
+        registry.set('partitions_built', stats['misses'])
+        for name, value in stats.items():
+            registry.set('partition_cache_' + name, value)
+        return fds
+
+    def agree_set(self, row, other):
+        '''
+        :return: attribute set of the columns on which two rows are equal
+        '''
+        mask = 0
+        for a, column in enumerate(self.columns):
+            if column[row] == column[other]:
+                mask |= 1 << a
+        return mask
+
+    def _sample(self):
+        '''
+        Compare row pairs. The first call compares neighbours in every column; later calls widen the window of
+        the most efficient column until no column finds enough new non-FDs, and then lower that bar.
+        :return: list of new agree sets
+        '''
+        new = []
+        if self._clusters is None:
+            self._clusters = [self._sorted_classes(a) for a in range(self.num_attributes)]
+            for a in range(self.num_attributes):
+                new.extend(self._compare(a))
+            return new
+
+        while True:
+            a = max(range(self.num_attributes), key=self._efficiencies.__getitem__)
+            if self._efficiencies[a] < self.min_efficiency:
+                break
+            new.extend(self._compare(a))
+        self.min_efficiency /= 2
+        return new
+
+    def _sorted_classes(self, a):
+        '''
+        Classes of a column with more than one row, each sorted on the next column so that the rows in a
+        window tend to agree on more than one column
+        '''
+        following = self.columns[(a + 1) % self.num_attributes]
+        return [sorted(members, key=lambda row: (following[row], row))
+                for members in StrippedPartition.from_column(self.columns[a]).classes()]
+
+    def _compare(self, a):
+        '''
+        Compare every row of a column's classes with the row the current distance after it, and widen the window
+        :return: list of new agree sets
+        '''
+        distance = self._distances[a]
+        self._distances[a] += 1
+        new = []
+        comparisons = 0
+        for members in self._clusters[a]:
+            for k in range(len(members) - distance):
+                comparisons += 1
+                agree = self.agree_set(members[k], members[k + distance])
+                if agree not in self.non_fds:
+                    self.non_fds.add(agree)
+                    new.append(agree)
+        registry.inc('fd_pairs_compared', comparisons)
+        registry.inc('fd_non_fds', len(new))
+        # a column whose classes are all shorter than the window has nothing left to compare
+        self._efficiencies[a] = len(new) / comparisons if comparisons else -1.0
+        return new
+
+    def _induce(self, agree_sets):
+        '''
+        Specialize the candidates that the given non-FDs refute. The largest agree sets go first, as they refute
+        the most candidates.
+        '''
+        for agree in sorted(agree_sets, key=lambda mask: -bin(mask).count('1')):
+            for a_bit in bits(self.everything & ~agree):
+                lhss = self.cover[a_bit.bit_length() - 1]
+                tree = self._trees[a_bit.bit_length() - 1]
+                invalid = list(tree.subsets(agree))
+                if not invalid:
+                    continue
+                for lhs in invalid:
+                    lhss.discard(lhs)
+                    tree.remove(lhs)
+                # smaller LHSs first, so a specialization is never added after one of its own subsets
+                invalid.sort(key=lambda mask: bin(mask).count('1'))
+                for lhs in invalid:
+                    if self.max_lhs is not None and bin(lhs).count('1') >= self.max_lhs:
+                        continue
+                    for b in bits(self.everything & ~agree & ~a_bit):
+                        specialized = lhs | b
+                        if not tree.has_subset(specialized):
+                            lhss.add(specialized)
+                            tree.add(specialized)
+
+    def _validate(self, candidates):
+        '''
+        Check candidates against their partitions
+        :param candidates: dict of LHS to the mask of its RHSs
+        :return: (number of checks, number failed, list of new agree sets of violating row pairs)
+        '''
+        checked = 0
+        failed = 0
+        agree_sets = []
+        for lhs in sorted(candidates):
+            partition = self.cache.get(lhs)
+            for a_bit in bits(candidates[lhs]):
+                a = a_bit.bit_length() - 1
+                checked += 1
+                pair = partition.conflict(self.columns[a])
+                if pair is None:
+                    self.valid.add((lhs, a))
+                    continue
+                failed += 1
+                agree = self.agree_set(*pair)
+                if agree not in self.non_fds:
+                    self.non_fds.add(agree)
+                    agree_sets.append(agree)
+        registry.inc('fd_non_fds', len(agree_sets))
+        return checked, failed, agree_sets
@@ -1,379 +1,669 @@
-'''
-@author-name: Rishab Katta
-
-Python program for loading IMDB database from Official IMDB's Datasets and perform querying on them.
-'''
-
-import psycopg2
-import gzip
-import shutil
-import time
-
-
-class DatabaseConnection:
-
-    def __init__(self, h, db, username, pwd):
-        '''
-        Constructor is used to connect to the database
-        :param h: hostname
-        :param db: database name
-        :param username: Username
-        :param pwd: password
-        '''
-        try:
-            self.connection = psycopg2.connect(host=str(h), database=str(db), user=str(username), password=str(pwd))
-            self.connection.autocommit=True
-            self.cursor=self.connection.cursor()
-        except Exception as e:
-            print(getattr(e, 'message', repr(e)))
-            print(getattr(e, 'message', str(e)))
-
-    def create_tables(self):
-        '''
-        Create tables for the IMDB database
-        :return: None
-        '''
-
-
-        self.cursor.execute("CREATE TABLE Movie(id VARCHAR(20), type VARCHAR(100), title VARCHAR(500), "
-                            "originalTitle VARCHAR(500), "
-                            "startYear VARCHAR(10),endYear VARCHAR(10), runtime VARCHAR, "
-                            "avgRating float, numVotes INT, PRIMARY KEY(id))")
-
-        self.cursor.execute("CREATE temporary TABLE t1(id VARCHAR(20), type VARCHAR(20), "
-                            "title VARCHAR(500), originalTitle VARCHAR(500), isAdult VARCHAR(20), "
-                            "startYear VARCHAR(10), endYear VARCHAR(10), runtime VARCHAR , genres VARCHAR(500))")
-
-        self.cursor.execute("CREATE temporary TABLE r1(id VARCHAR(20), avgRating float, "
-                            "numVotes INT, PRIMARY KEY(id))")
-
-        self.cursor.execute("CREATE TABLE Genre(id SERIAL, genre VARCHAR(500), PRIMARY KEY(id))")
-
-
-        self.cursor.execute("CREATE TABLE Movie_Genre(genre INT, movie VARCHAR(20), "
-                            "FOREIGN KEY(genre) REFERENCES Genre(id), FOREIGN KEY(movie) REFERENCES Movie(id))")
-
-        self.cursor.execute("CREATE temporary TABLE t(id VARCHAR(20),name VARCHAR(500) NOT NULL,"
-                            "birthYear VARCHAR(10), deathYear VARCHAR(10), primaryProfession VARCHAR(100), "
-                            "knownForTitles VARCHAR(100), PRIMARY KEY (id))")
-
-        self.cursor.execute("CREATE TABLE Member(id VARCHAR(20), name VARCHAR(500), birthYear VARCHAR(10), "
-                            "deathYear VARCHAR(10), PRIMARY KEY(id))")
-
-        self.cursor.execute("CREATE temporary TABLE t2(tconst VARCHAR(20), ordering VARCHAR(10),"
-                            "nconst VARCHAR(20),category VARCHAR(100), job VARCHAR(500), charactersPlayed VARCHAR(500))")
-
-        self.cursor.execute("CREATE TABLE Movie_Actor(actor VARCHAR(20), movie VARCHAR(20), UNIQUE(actor, movie), "
-                            "FOREIGN KEY(actor) REFERENCES Member(id), FOREIGN KEY(movie) REFERENCES Movie(id))")
-
-        self.cursor.execute("CREATE TABLE Movie_Writer(writer VARCHAR(20), movie VARCHAR(20), "
-                            "FOREIGN KEY(writer) REFERENCES Member(id), FOREIGN KEY(movie) REFERENCES Movie(id))")
-
-        self.cursor.execute("CREATE TABLE Movie_Director(director VARCHAR(20), movie VARCHAR(20), "
-                            "FOREIGN KEY(director) REFERENCES Member(id), FOREIGN KEY(movie) REFERENCES Movie(id))")
-
-        self.cursor.execute("CREATE TABLE Movie_Producer(producer VARCHAR(20), movie VARCHAR(20), "
-                            "FOREIGN KEY(producer) REFERENCES Member(id), FOREIGN KEY(movie) REFERENCES Movie(id))")
-
-        self.cursor.execute("CREATE TABLE Role(id SERIAL, role VARCHAR(500), PRIMARY KEY(id))")
-
-        self.cursor.execute("CREATE TABLE Actor_Movie_Role(actor VARCHAR(20), movie VARCHAR(20), role INT)")
-
-
-    def insert_tables(self):
-        '''
-        Insert data from imdb datasets into the database
-        :return: None
-        '''
-
-
-        with gzip.open(str(path) + 'title.basics.tsv.gz', 'rb') as f_in:
-            with open(str(path) + 'title.basics.tsv', 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-
-        file = str(path) + 'title.basics.tsv'
-        self.cursor.execute("COPY t1(id, type, title, originalTitle,"
-                            " isAdult, startYear, endYear, runtime, genres) FROM %s DELIMITER E'\t'", (file,))
-
-        with gzip.open(str(path) + 'title.ratings.tsv.gz', 'rb') as f_in:
-            next(f_in)
-            with open(str(path) + 'title.ratings.tsv', 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-
-        file = str(path) + 'title.ratings.tsv'
-        self.cursor.execute("COPY r1(id, avgRating, numVotes) FROM %s DELIMITER E'\t'",(file,))
-
-        self.cursor.execute("CREATE temporary TABLE tmp1 AS SELECT M.id, M.type, M.title, M.originalTitle, "
-                            "M.startYear, M.endYear, M.runtime, R.avgRating, R.numVotes"
-                            " FROM r1 R INNER JOIN t1 M ON M.id= R.id")
-
-        self.cursor.execute("CREATE temporary TABLE tmp2 AS SELECT M.id, M.genres FROM r1 R INNER JOIN t1 M ON M.id= R.id")
-
-
-        self.cursor.execute("INSERT INTO Movie(id, type, title, originalTitle, startYear ,"
-                            "endYear , runtime , avgRating , numVotes)"
-                            "SELECT * from tmp1")
-
-        self.cursor.execute("INSERT INTO Genre(genre)"
-            "SELECT DISTINCT genres FROM t1")
-
-        self.cursor.execute("DROP TABLE r1")
-        self.cursor.execute("DROP TABLE tmp1")
-        self.cursor.execute("DROP TABLE tmp2")
-
-        self.cursor.execute("INSERT INTO Movie_Genre(genre, movie)"
-                            " SELECT  G.id, M.id FROM t1 T INNER JOIN Genre G on "
-                            "G.genre= T.genres INNER JOIN Movie M on T.id=M.id")
-
-        self.cursor.execute("DROP TABLE t1")
-
-        with gzip.open(str(path) + 'name.basics.tsv.gz', 'rb') as f_in:
-            next(f_in)
-            with open(str(path) + 'name.basics.tsv', 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-
-        file=str(path) + 'name.basics.tsv'
-        self.cursor.execute("COPY t(id, name, birthYear, deathYear, primaryProfession,"
-                            " knownForTitles) FROM %s DELIMITER E'\t'", (file,))
-        self.cursor.execute("INSERT INTO Member(id,  name, birthYear, deathYear) SELECT id,"
-                            " name, birthYear, deathYear from t WHERE id LIKE 'n%'")
-        self.cursor.execute("DROP TABLE t")
-
-
-        with gzip.open(str(path) + 'title.principals.tsv.gz', 'rb') as f_in:
-            with open(str(path) + 'title.principals.tsv', 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-
-        file = str(path) + 'title.principals.tsv'
-        self.cursor.execute("COPY t2(tconst, ordering, nconst, category, job,"
-                            " charactersPlayed) FROM %s DELIMITER E'\t'", (file,))
-
-
-
-
-
-        self.cursor.execute("CREATE temporary TABLE tmp_a AS SELECT DISTINCT P.nconst as actor, P.tconst as movie FROM t2 P "
-                            "INNER JOIN Movie M ON M.id= P.tconst inner join Member R ON P.nconst=R.id WHERE lower(P.category) LIKE '%actor%'")
-
-        self.cursor.execute("CREATE temporary TABLE tmp_w AS SELECT P.nconst as writer, P.tconst as movie FROM t2 P "
-                            "INNER JOIN Movie M ON M.id= P.tconst inner join Member R ON P.nconst=R.id WHERE lower(P.category) LIKE '%writer%'")
-
-        self.cursor.execute("CREATE temporary TABLE tmp_d AS SELECT P.nconst as director, P.tconst as movie FROM t2 P "
-                            "INNER JOIN Movie M ON M.id= P.tconst inner join Member R ON P.nconst=R.id WHERE lower(P.category) LIKE '%director%'")
-
-        self.cursor.execute("CREATE temporary TABLE tmp_p AS SELECT P.nconst as producer,P.tconst as movie FROM t2 P "
-                            "INNER JOIN Movie M ON M.id= P.tconst inner join Member R ON P.nconst=R.id WHERE lower(P.category) LIKE '%producer%'")
-
-        self.cursor.execute("INSERT INTO Movie_Actor SELECT * FROM tmp_a")
-
-        self.cursor.execute("INSERT INTO Movie_Writer SELECT * FROM tmp_w")
-
-        self.cursor.execute("INSERT INTO Movie_Director SELECT * FROM tmp_d")
-
-        self.cursor.execute("INSERT INTO Movie_Producer SELECT * FROM tmp_p")
-
-
-
-        self.cursor.execute("DROP TABLE tmp_a ")
-        self.cursor.execute("DROP TABLE tmp_w ")
-        self.cursor.execute("DROP TABLE tmp_d ")
-        self.cursor.execute("DROP TABLE tmp_p ")
-
-        self.cursor.execute("INSERT INTO Role(role) SELECT DISTINCT charactersPlayed FROM t2")
-
-
-
-        self.cursor.execute("INSERT INTO Actor_Movie_Role SELECT ma.actor, ma.movie, R.id FROM t2 T RIGHT OUTER JOIN Role R "
-                            "on T.charactersPlayed=R.role RIGHT OUTER JOIN Movie_Actor ma ON ma.movie = T.tconst")
-
-        self.cursor.execute("DROP TABLE t2")
-
-
-
-        self.cursor.execute("ALTER TABLE Actor_Movie_Role ADD CONSTRAINT fk_somename FOREIGN KEY(actor, movie) "
-                            "REFERENCES Movie_Actor(actor, movie) ")
-
-        self.cursor.execute("ALTER TABLE Movie ALTER COLUMN runtime TYPE INT USING runtime::integer")
-
-        self.cursor.execute("ALTER TABLE member ALTER COLUMN deathyear TYPE INT USING deathyear::integer")
-
-        self.cursor.execute("ALTER TABLE member ALTER COLUMN birthyear TYPE INT USING birthyear::integer")
-
-        self.cursor.execute("ALTER TABLE Movie ALTER COLUMN startyear TYPE INT USING startyear::integer")
-
-        self.cursor.execute("ALTER TABLE Movie ALTER COLUMN endyear TYPE INT USING endyear::integer")
-
-
-    def sql_query(self):
-        '''
-        Perform querying on the IMDB database
-        :return: None
-        '''
-
-        start_time=time.time()
-        self.cursor.execute("select count(actor) as no_of_invalid_roles from actor_movie_role am full outer join role r "
-                            "on am.role=r.id where r.role IS NULL")
-        print("--- %s seconds for 2.1 ---" % (time.time() - start_time))
-        rows = self.cursor.fetchall()
-
-        count=0
-        print("printing only first five rows if available for 2.1")
-        for row in rows:
-            print(row)
-            count+=1
-            if count>5:
-                break
-
-
-
-        start_time = time.time()
-        self.cursor.execute("select a.id from member a join movie_actor ma on ma.actor=a.id join movie m on m.id=ma.movie "
-                            "where lower(a.name) like 'phi%' and a.deathYear is null and m.startYear != 2014 ")
-        print("--- %s seconds for 2.2 ---" % (time.time() - start_time))
-
-        rows = self.cursor.fetchall()
-
-        print("printing only first five rows if available for 2.2")
-        count = 0
-        for row in rows:
-            print(row)
-            count += 1
-            if count > 5:
-                break
-
-        start_time = time.time()
-        self.cursor.execute("select mp.producer from movie_producer mp join movie_genre mg on mp.movie=mg.movie join genre "
-                            "g on mg.genre=g.id join movie m on mp.movie=m.id "
-                            "join member mb on mp.producer=mb.id where lower(g.genre) like '%talk-show%' and "
-                            "m.startyear=2017 and lower(mb.name) like '%gill%' "
-                            " group by mp.producer having count(mp.movie)> 50 ")
-        print("--- %s seconds for 2.3 ---" % (time.time() - start_time))
-
-        rows = self.cursor.fetchall()
-
-        print("printing only first five rows if available for 2.3")
-        count = 0
-        for row in rows:
-            print(row)
-            count += 1
-            if count > 5:
-                break
-
-        start_time = time.time()
-        self.cursor.execute("select avg(m.runtime) from movie_writer mw join movie m on mw.movie=m.id join member mb on mb.id=mw.writer "
-                            "where mb.deathyear is null and lower(m.originaltitle) like '%bhardwaj%' group by mw.writer")
-        print("--- %s seconds  for 2.4---" % (time.time() - start_time))
-
-        rows = self.cursor.fetchall()
-
-        print("printing only first five rows if available for 2.4")
-        count = 0
-        for row in rows:
-            print(row)
-            count += 1
-            if count > 5:
-                break
-
-        start_time = time.time()
-        self.cursor.execute("select mp.producer from movie_producer mp "
-                            "left outer join movie m on mp.movie=m.id left outer join member mb on mb.id= mp.producer "
-                            "where mb.deathyear is null and m.runtime>120 group by mp.producer having "
-                            "count(mp.movie)=(select max(c) from (select count(mp.movie) as c from movie_producer mp "
-                            "left outer join movie m on mp.movie=m.id left outer join member mb on mb.id= mp.producer "
-                            "where mb.deathyear is null and m.runtime>120 group by mp.producer) as nestedsubquery)")
-        print("--- %s seconds  for 2.5 ---" % (time.time() - start_time))
-
-        rows = self.cursor.fetchall()
-
-        print("printing only first five rows if available for 2.5")
-        count = 0
-        for row in rows:
-            print(row)
-            count += 1
-            if count > 5:
-                break
-
-        start_time = time.time()
-        self.cursor.execute("select amr.actor from actor_movie_role amr inner join member mb on mb.id=amr.actor "
-                            "inner join role r on r.id=amr.role where mb.deathyear is null and "
-                            "(lower(r.role) like '__jesus__' or lower(r.role) like '__christ__' "
-                            " or lower(r.role) like '__jesus christ__')")
-        print("--- %s seconds for 2.6 ---" % (time.time() - start_time))
-
-        rows = self.cursor.fetchall()
-
-        print("printing only first five rows if available for 2.6")
-        count = 0
-        for row in rows:
-            print(row)
-            count += 1
-            if count > 5:
-                break
-
-    def indexing(self):
-        '''
-        Create indexes on the specific columns in the tables in the database for faster query processing
-        :return: None
-        '''
-
-        self.cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
-        self.cursor.execute("CREATE INDEX role_role ON Role USING GIN (role gin_trgm_ops)")
-
-        self.cursor.execute("CREATE INDEX amr_index on actor_movie_role(role)")
-#--------------------------------------------------------------------------------------------------
-
-        self.cursor.execute("CREATE INDEX ma_index ON movie_actor(actor)")
-
-        self.cursor.execute("CREATE INDEX ma_index1 ON movie_actor(movie)")
-
-        self.cursor.execute("CREATE INDEX mem_index ON member(name)")
-
-        self.cursor.execute("CREATE INDEX mem_index1 ON member(deathyear)")
-
-        self.cursor.execute("CREATE INDEX mov_index ON movie(startyear)")
-
-#--------------------------------------------------------------------------------------------------
-
-        self.cursor.execute("CREATE INDEX some_index_name ON movie_producer(producer)")
-
-        self.cursor.execute("CREATE INDEX mg_index ON movie_genre(movie)")
-
-        self.cursor.execute("CREATE INDEX mg_index1 ON movie_genre(genre)")
-
-        self.cursor.execute("CREATE INDEX g_index ON genre(genre)")
-
-        self.cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
-        self.cursor.execute("CREATE INDEX some_name ON Genre USING GIN (genre gin_trgm_ops)")
-
-#--------------------------------------------------------------------------------------------------
-
-
-        self.cursor.execute("CREATE INDEX movie_index ON Movie USING GIN (originaltitle gin_trgm_ops)")
-
-        self.cursor.execute("CREATE INDEX mw_writer ON Movie_writer(writer)")
-
-#--------------------------------------------------------------------------------------------------------
-
-
-        self.cursor.execute("CREATE INDEX mp_index1 ON movie_producer(movie)")
-
-        self.cursor.execute("CREATE INDEX movie_runtime ON Movie(runtime)")
-
-
-
-
-
-if __name__ == '__main__':
-    h = str(input("Enter host name"))
-    db = str(input("Enter Database Name"))
-    username = str(input("Enter username"))
-    pwd = str(input("Enter password"))
-    path = str(input("Enter Path except the file name - example- C:/users/files/"))
-
-    database_connection = DatabaseConnection(h, db, username, pwd)
-    database_connection.create_tables()
-    database_connection.insert_tables()
-    # database_connection.sql_query()
-    # database_connection.indexing()
-    # print("After indexing")
-    # database_connection.sql_query()
\ No newline at end of file
+'''
+@author-name: Rishab Katta
+
+Python program for loading IMDB database from Official IMDB's Datasets and perform querying on them.
+'''
+
+import psycopg2.extensions
+import io
+import os
+import time
+
+from benchmark import Benchmark, compare, print_results, write_results
+import dbconnection
+from gzipcopy import copy_gzip
+from indexadvisor import IndexAdvisor, print_advice
+from metrics import registry
+from loadscheduler import Stage, StageScheduler, print_report
+
+
+# (table, column definitions), referenced tables first
+TABLES = [
+    ('Movie', "id VARCHAR(20), type VARCHAR(100), title VARCHAR(500), originalTitle VARCHAR(500), "
+              "startYear INT, endYear INT, runtime INT, avgRating float, numVotes INT"),
+    ('Genre', "id SERIAL, genre VARCHAR(500)"),
+    ('Movie_Genre', "genre INT, movie VARCHAR(20)"),
+    ('Member', "id VARCHAR(20), name VARCHAR(500), birthYear INT, deathYear INT"),
+    ('Movie_Actor', "actor VARCHAR(20), movie VARCHAR(20)"),
+    ('Movie_Writer', "writer VARCHAR(20), movie VARCHAR(20)"),
+    ('Movie_Director', "director VARCHAR(20), movie VARCHAR(20)"),
+    ('Movie_Producer', "producer VARCHAR(20), movie VARCHAR(20)"),
+    ('Role', "id SERIAL, role VARCHAR(500)"),
+    ('Actor_Movie_Role', "actor VARCHAR(20), movie VARCHAR(20), role INT"),
+]
+
+# (table, primary key or unique constraint)
+KEYS = [
+    ('Movie', "PRIMARY KEY(id)"),
+    ('Genre', "PRIMARY KEY(id)"),
+    ('Member', "PRIMARY KEY(id)"),
+    ('Movie_Actor', "UNIQUE(actor, movie)"),
+    ('Role', "PRIMARY KEY(id)"),
+]
+
+# (table, foreign key, referenced table)
+FOREIGN_KEYS = [
+    ('Movie_Genre', "FOREIGN KEY(genre) REFERENCES Genre(id)", 'Genre'),
+    ('Movie_Genre', "FOREIGN KEY(movie) REFERENCES Movie(id)", 'Movie'),
+    ('Movie_Actor', "FOREIGN KEY(actor) REFERENCES Member(id)", 'Member'),
+    ('Movie_Actor', "FOREIGN KEY(movie) REFERENCES Movie(id)", 'Movie'),
+    ('Movie_Writer', "FOREIGN KEY(writer) REFERENCES Member(id)", 'Member'),
+    ('Movie_Writer', "FOREIGN KEY(movie) REFERENCES Movie(id)", 'Movie'),
+    ('Movie_Director', "FOREIGN KEY(director) REFERENCES Member(id)", 'Member'),
+    ('Movie_Director', "FOREIGN KEY(movie) REFERENCES Movie(id)", 'Movie'),
+    ('Movie_Producer', "FOREIGN KEY(producer) REFERENCES Member(id)", 'Member'),
+    ('Movie_Producer', "FOREIGN KEY(movie) REFERENCES Movie(id)", 'Movie'),
+    ('Actor_Movie_Role', "FOREIGN KEY(actor, movie) REFERENCES Movie_Actor(actor, movie)", 'Movie_Actor'),
+]
+
+# (link table, principal category)
+LINK_TABLES = [
+    ('Movie_Actor', 'actor'),
+    ('Movie_Writer', 'writer'),
+    ('Movie_Director', 'director'),
+    ('Movie_Producer', 'producer'),
+]
+
+# row hashes of the staged datasets by source, compared by refresh_tables to find what changed
+ROW_HASHES = {
+    'title': "SELECT 'title', M.id, md5(row(M.id, M.type, M.title, M.originalTitle, M.isAdult, M.startYear, "
+             "M.endYear, M.runtime, M.genres, R.avgRating, R.numVotes)::text) FROM t1 M INNER JOIN r1 R ON M.id= R.id",
+    'name': "SELECT 'name', id, md5(row(id, name, birthYear, deathYear)::text) FROM t WHERE id LIKE 'n%'",
+    'principals': "SELECT 'principals', tconst, md5(string_agg(row(ordering, nconst, category, charactersPlayed)::text, "
+                  "',' ORDER BY ordering, nconst)) FROM t2 GROUP BY tconst",
+}
+
+# runtime in minutes above which a movie counts as long in Member_Stats
+LONG_RUNTIME = 120
+
+# per member and link table category: movies, long movies and the sum and count of known runtimes
+MEMBER_STATS = "Member_Stats(member VARCHAR(20), category VARCHAR(20), movies INT, long_movies INT, " \
+               "runtime_sum BIGINT, runtime_count INT, PRIMARY KEY(member, category))"
+
+# (name, query) of the workload run by sql_query and benchmark
+QUERIES = [
+    ('2.1', "select count(actor) as no_of_invalid_roles from actor_movie_role am full outer join role r "
+            "on am.role=r.id where r.role IS NULL"),
+    ('2.2', "select a.id from member a join movie_actor ma on ma.actor=a.id join movie m on m.id=ma.movie "
+            "where lower(a.name) like 'phi%' and a.deathYear is null and m.startYear != 2014 "),
+    ('2.3', "select mp.producer from movie_producer mp join movie_genre mg on mp.movie=mg.movie join genre "
+            "g on mg.genre=g.id join movie m on mp.movie=m.id "
+            "join member mb on mp.producer=mb.id where lower(g.genre) like '%talk-show%' and "
+            "m.startyear=2017 and lower(mb.name) like '%gill%' "
+            " group by mp.producer having count(mp.movie)> 50 "),
+    ('2.4', "select avg(m.runtime) from movie_writer mw join movie m on mw.movie=m.id join member mb on mb.id=mw.writer "
+            "where mb.deathyear is null and lower(m.originaltitle) like '%bhardwaj%' group by mw.writer"),
+    # producers with the most movies over LONG_RUNTIME, read off Member_Stats, see build_statistics
+    ('2.5', "select s.member from member_stats s left outer join member mb on mb.id=s.member "
+            "where s.category='producer' and mb.deathyear is null and s.long_movies > 0 and s.long_movies="
+            "(select max(s.long_movies) from member_stats s left outer join member mb on mb.id=s.member "
+            "where s.category='producer' and mb.deathyear is null)"),
+    ('2.6', "select amr.actor from actor_movie_role amr inner join member mb on mb.id=amr.actor "
+            "inner join role r on r.id=amr.role where mb.deathyear is null and "
+            "(lower(r.role) like '__jesus__' or lower(r.role) like '__christ__' "
+            " or lower(r.role) like '__jesus christ__')"),
+]
+
+
+def _copy_value(value):
+    '''
+    Render a value for COPY text format
+    '''
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class DatabaseConnection(dbconnection.DatabaseConnection):
+
+    def create_tables(self, fast=False):
+        '''
+        Create tables for the IMDB database
+        :param fast: bulk-load mode: create the tables UNLOGGED and without keys; insert_tables(fast=True) adds
+                     the keys and foreign keys after the load and then makes the tables logged
+        :return: None
+        '''
+        for table, columns in TABLES:
+            self.cursor.execute("CREATE " + ("UNLOGGED " if fast else "") + "TABLE " + table + "(" + columns + ")")
+
+        if not fast:
+            for table, constraint in KEYS:
+                self.cursor.execute("ALTER TABLE " + table + " ADD " + constraint)
+            # Actor_Movie_Role is checked once after the load, see insert_tables
+            for table, constraint, referenced in FOREIGN_KEYS:
+                if table != 'Actor_Movie_Role':
+                    self.cursor.execute("ALTER TABLE " + table + " ADD " + constraint)
+
+        self.cursor.execute("CREATE TABLE Load_Hash(source VARCHAR(20), key VARCHAR(20), hash CHAR(32), "
+                            "PRIMARY KEY(source, key))")
+
+        # not temporary: the principals are staged on one connection and linked on others
+        self.cursor.execute("CREATE UNLOGGED TABLE t2(tconst VARCHAR(20), ordering VARCHAR(10),"
+                            "nconst VARCHAR(20),category VARCHAR(100), job VARCHAR(500), charactersPlayed VARCHAR(500))")
+
+
+    def insert_tables(self, path, workers=1, fast=False):
+        '''
+        Insert data from imdb datasets into the database. The load is split into stages that run on their
+        own connections as soon as the stages they depend on are done.
+        :param path: directory of the .tsv.gz files, ending with a separator
+        :param workers: number of stages running at the same time, each on a pooled connection
+        :param fast: the tables were created with create_tables(fast=True); add keys and foreign keys after
+                     the load, each on its own connection, then make the tables logged
+        :return: report of loadscheduler.StageScheduler.run
+        '''
+        stages = self.load_stages(path)
+        if fast:
+            stages += self.post_load_stages([stage.name for stage in stages])
+        else:
+            # the only foreign key create_tables leaves for after the load
+            constraints = [constraint for table, constraint, referenced in FOREIGN_KEYS if table == 'Actor_Movie_Role']
+            stages.append(Stage('foreign_keys_actor_movie_role', lambda cursor: cursor.execute(
+                "ALTER TABLE Actor_Movie_Role " + ', '.join("ADD " + constraint for constraint in constraints)),
+                ['actor_movie_role']))
+        scheduler = StageScheduler(stages)
+        report = scheduler.run(self.pool, workers)
+        print_report(report)
+        return report
+
+    def load_stages(self, path):
+        '''
+        Stages of insert_tables with their dependencies
+        :param path: directory of the .tsv.gz files, ending with a separator
+        :return: list of loadscheduler.Stage
+        '''
+        return [
+            Stage('movie', lambda cursor: self.load_movies(cursor, path)),
+            Stage('member', lambda cursor: self.load_members(cursor, path)),
+            Stage('principals', lambda cursor: self.load_principals(cursor, path)),
+        ] + [
+            Stage(table.lower(), lambda cursor, table=table, category=category: self.link_members(cursor, table, category),
+                  ['movie', 'member', 'principals'])
+            for table, category in LINK_TABLES
+        ] + [
+            Stage('actor_movie_role', self.load_roles, ['movie_actor']),
+            Stage('member_stats', self.build_statistics, ['movie'] + [table.lower() for table, category in LINK_TABLES]),
+            Stage('drop_principals', lambda cursor: cursor.execute("DROP TABLE t2"),
+                  ['actor_movie_role', 'movie_writer', 'movie_director', 'movie_producer']),
+        ]
+
+    def post_load_stages(self, load_stages):
+        '''
+        Stages of the bulk-load mode that run once all data is in: keys, then foreign keys, then SET LOGGED
+        with every table after the tables it references. Secondary indexes are left to indexing()
+        :param load_stages: names of the stages that load data
+        :return: list of loadscheduler.Stage
+        '''
+        def execute(*statements):
+            def run(cursor):
+                for statement in statements:
+                    cursor.execute(statement)
+            return run
+
+        stages = [Stage('key_' + table.lower(), execute("ALTER TABLE " + table + " ADD " + constraint), load_stages)
+                  for table, constraint in KEYS]
+        key_stages = [stage.name for stage in stages]
+
+        constrained = []
+        for table, columns in TABLES:
+            constraints = [constraint for name, constraint, referenced in FOREIGN_KEYS if name == table]
+            if constraints:
+                stages.append(Stage('foreign_keys_' + table.lower(), execute(
+                    "ALTER TABLE " + table + " " + ', '.join("ADD " + constraint for constraint in constraints)),
+                    key_stages))
+                constrained.append(stages[-1].name)
+
+        for table, columns in TABLES:
+            referenced = ['logged_' + target.lower() for name, constraint, target in FOREIGN_KEYS if name == table]
+            stages.append(Stage('logged_' + table.lower(), execute("ALTER TABLE " + table + " SET LOGGED"),
+                                key_stages + constrained + sorted(set(referenced))))
+        return stages
+
+    def stage_titles(self, cursor, path):
+        '''
+        Copy title.basics and title.ratings into the temporary tables t1 and r1 and record their row hashes
+        '''
+        cursor.execute("CREATE temporary TABLE t1(id VARCHAR(20), type VARCHAR(20), "
+                       "title VARCHAR(500), originalTitle VARCHAR(500), isAdult VARCHAR(20), "
+                       "startYear INT, endYear INT, runtime INT, genres VARCHAR(500))")
+
+        cursor.execute("CREATE temporary TABLE r1(id VARCHAR(20), avgRating float, "
+                       "numVotes INT, PRIMARY KEY(id))")
+
+        copy_gzip(cursor, str(path) + 'title.basics.tsv.gz', 't1',
+                  ['id', 'type', 'title', 'originalTitle', 'isAdult', 'startYear', 'endYear', 'runtime', 'genres'])
+
+        copy_gzip(cursor, str(path) + 'title.ratings.tsv.gz', 'r1', ['id', 'avgRating', 'numVotes'])
+
+    def stage_names(self, cursor, path):
+        '''
+        Copy name.basics into the temporary table t
+        '''
+        cursor.execute("CREATE temporary TABLE t(id VARCHAR(20),name VARCHAR(500) NOT NULL,"
+                       "birthYear INT, deathYear INT, primaryProfession VARCHAR(100), "
+                       "knownForTitles VARCHAR(100), PRIMARY KEY (id))")
+
+        copy_gzip(cursor, str(path) + 'name.basics.tsv.gz', 't',
+                  ['id', 'name', 'birthYear', 'deathYear', 'primaryProfession', 'knownForTitles'])
+
+    def load_movies(self, cursor, path):
+        '''
+        Load title.basics and title.ratings into Movie, Genre and Movie_Genre
+        '''
+        self.stage_titles(cursor, path)
+        cursor.execute("INSERT INTO Load_Hash " + ROW_HASHES['title'])
+
+        cursor.execute("CREATE temporary TABLE tmp1 AS SELECT M.id, M.type, M.title, M.originalTitle, "
+                       "M.startYear, M.endYear, M.runtime, R.avgRating, R.numVotes"
+                       " FROM r1 R INNER JOIN t1 M ON M.id= R.id")
+
+        cursor.execute("INSERT INTO Movie(id, type, title, originalTitle, startYear ,"
+                       "endYear , runtime , avgRating , numVotes)"
+                       "SELECT * from tmp1")
+
+        cursor.execute("INSERT INTO Genre(genre)"
+                       "SELECT DISTINCT genres FROM t1")
+
+        cursor.execute("DROP TABLE r1")
+        cursor.execute("DROP TABLE tmp1")
+
+        cursor.execute("INSERT INTO Movie_Genre(genre, movie)"
+                       " SELECT  G.id, M.id FROM t1 T INNER JOIN Genre G on "
+                       "G.genre= T.genres INNER JOIN Movie M on T.id=M.id")
+
+        cursor.execute("DROP TABLE t1")
+
+    def load_members(self, cursor, path):
+        '''
+        Load name.basics into Member
+        '''
+        self.stage_names(cursor, path)
+        cursor.execute("INSERT INTO Load_Hash " + ROW_HASHES['name'])
+        cursor.execute("INSERT INTO Member(id,  name, birthYear, deathYear) SELECT id,"
+                       " name, birthYear, deathYear from t WHERE id LIKE 'n%'")
+        cursor.execute("DROP TABLE t")
+
+    def load_principals(self, cursor, path):
+        '''
+        Stage title.principals in t2 for the link stages
+        '''
+        copy_gzip(cursor, str(path) + 'title.principals.tsv.gz', 't2',
+                  ['tconst', 'ordering', 'nconst', 'category', 'job', 'charactersPlayed'])
+        cursor.execute("INSERT INTO Load_Hash " + ROW_HASHES['principals'])
+
+    def link_members(self, cursor, table, category, movies=None):
+        '''
+        Fill one of the Movie_* link tables from the staged principals of a category
+        :param table: link table
+        :param category: principal category, also the member column of the link table
+        :param movies: optional table with a key column of the movies to link, all movies by default
+        '''
+        distinct = "DISTINCT " if category == 'actor' else ""
+        only = " AND P.tconst IN (SELECT key FROM " + movies + ")" if movies else ""
+        cursor.execute("INSERT INTO " + table + " SELECT " + distinct + "P.nconst, P.tconst FROM t2 P "
+                       "INNER JOIN Movie M ON M.id= P.tconst inner join Member R ON P.nconst=R.id "
+                       "WHERE lower(P.category) LIKE %s" + only, ('%' + category + '%',))
+
+    def load_roles(self, cursor, movies=None, batch_size=50000, measure_spill=False):
+        '''
+        Fill Role and Actor_Movie_Role from the staged principals. Every Movie_Actor pair is matched with its own
+        principal row on (tconst, nconst) and streamed through a cursor; role strings are numbered with a dict
+        as they arrive and both tables are written with COPY in batches of at most batch_size rows.
+        Actors without a character get a NULL role.
+        :param movies: optional table with a key column of the movies to link, all movies by default
+        :param batch_size: rows per fetch and per COPY
+        :param measure_spill: after every fetch, look up the temporary files this backend has open in the default
+                              tablespace with pg_ls_tmpdir(), which needs the pg_monitor role, to report how much
+                              the streaming query spilled to disk
+        :return: dict with the new roles and the links written, the largest COPY buffer built on the client and,
+                 if measured, the most temporary files and bytes the query held at once
+        '''
+        # inside refresh_tables the caller's transaction is used
+        own_transaction = cursor.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if own_transaction:
+            cursor.execute("BEGIN")
+        try:
+            cursor.execute("SELECT id, role FROM Role WHERE role IS NOT NULL")
+            role_ids = {role: role_id for role_id, role in cursor.fetchall()}
+            cursor.execute("SELECT coalesce(max(id), 0) FROM Role")
+            next_id = cursor.fetchone()[0] + 1
+
+            only = " WHERE ma.movie IN (SELECT key FROM " + movies + ")" if movies else ""
+            query = "SELECT ma.actor, ma.movie, T.charactersPlayed FROM Movie_Actor ma LEFT OUTER JOIN t2 T " \
+                    "ON T.tconst = ma.movie AND T.nconst = ma.actor AND lower(T.category) LIKE '%actor%'" + only
+
+            report = {'roles': 0, 'links': 0, 'batches': 0, 'peak_copy_buffer_bytes': 0}
+            if measure_spill:
+                report.update({'peak_temp_files': 0, 'peak_temp_bytes': 0})
+            cursor.execute("DECLARE actor_roles NO SCROLL CURSOR FOR " + query)
+
+            while True:
+                cursor.execute("FETCH %s FROM actor_roles", (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                if measure_spill:
+                    # the sort or hash of the query spills while it runs and its files are removed on CLOSE
+                    temp_files, temp_bytes = self._temp_files(cursor)
+                    report['peak_temp_files'] = max(report['peak_temp_files'], temp_files)
+                    report['peak_temp_bytes'] = max(report['peak_temp_bytes'], temp_bytes)
+
+                new_roles = []
+                links = []
+                for actor, movie, role in rows:
+                    role_id = None
+                    if role is not None:
+                        role_id = role_ids.get(role)
+                        if role_id is None:
+                            role_id = role_ids[role] = next_id
+                            next_id += 1
+                            new_roles.append((role_id, role))
+                    links.append((actor, movie, role_id))
+
+                batch_bytes = self._copy_rows(cursor, 'Role', ['id', 'role'], new_roles)
+                batch_bytes += self._copy_rows(cursor, 'Actor_Movie_Role', ['actor', 'movie', 'role'], links)
+
+                report['roles'] += len(new_roles)
+                report['links'] += len(links)
+                report['batches'] += 1
+                report['peak_copy_buffer_bytes'] = max(report['peak_copy_buffer_bytes'], batch_bytes)
+
+            cursor.execute("CLOSE actor_roles")
+            cursor.execute("SELECT setval(pg_get_serial_sequence('role', 'id'), %s, false)", (next_id,))
+            if own_transaction:
+                cursor.execute("COMMIT")
+        except Exception:
+            if own_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+
+        print("Actor_Movie_Role: %(links)d links, %(roles)d new roles in %(batches)d batches, "
+              "largest COPY buffer %(peak_copy_buffer_bytes)d bytes" % report)
+        if measure_spill:
+            print("server temporary files: at most %(peak_temp_files)d holding %(peak_temp_bytes)d bytes" % report)
+        return report
+
+    def _temp_files(self, cursor):
+        '''
+        Temporary files this backend has in the default tablespace, including the directories of parallel hash
+        joins it leads
+        :return: (number of files, bytes)
+        '''
+        cursor.execute("SELECT count(*), coalesce(sum(size), 0) FROM pg_ls_tmpdir() "
+                       "WHERE name LIKE 'pgsql_tmp' || pg_backend_pid() || '.%'")
+        return tuple(cursor.fetchone())
+
+    def _copy_rows(self, cursor, table, columns, rows):
+        '''
+        Write rows with COPY FROM STDIN in text format
+        :return: number of bytes sent
+        '''
+        if not rows:
+            return 0
+        data = ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows)
+        cursor.copy_expert("COPY " + table + "(" + ', '.join(columns) + ") FROM STDIN", io.StringIO(data))
+        return len(data)
+
+    def build_statistics(self, cursor):
+        '''
+        Build Member_Stats from the loaded link tables, and the triggers that log every later change of a link
+        table, or of a movie's runtime, to Stats_Delta for refresh_statistics
+        '''
+        cursor.execute("DROP TABLE IF EXISTS Member_Stats, Stats_Delta")
+        cursor.execute("CREATE TABLE " + MEMBER_STATS)
+        for table, category in LINK_TABLES:
+            cursor.execute("INSERT INTO Member_Stats " + self._member_stats_select(table, category))
+
+        # a row with a NULL member stands for all members of its movie
+        cursor.execute("CREATE TABLE Stats_Delta(category VARCHAR(20), member VARCHAR(20), movie VARCHAR(20))")
+        for table, category in LINK_TABLES:
+            function = table.lower() + "_stats_delta"
+            cursor.execute("CREATE OR REPLACE FUNCTION " + function + "() RETURNS trigger AS $$ BEGIN "
+                           "IF TG_OP IN ('INSERT', 'UPDATE') THEN INSERT INTO Stats_Delta "
+                           "SELECT '" + category + "', " + category + ", movie FROM new_rows; END IF; "
+                           "IF TG_OP IN ('DELETE', 'UPDATE') THEN INSERT INTO Stats_Delta "
+                           "SELECT '" + category + "', " + category + ", movie FROM old_rows; END IF; "
+                           "RETURN NULL; END $$ LANGUAGE plpgsql")
+            # a trigger with transition tables can only have one event
+            for event, transitions in [('INSERT', "NEW TABLE AS new_rows"), ('DELETE', "OLD TABLE AS old_rows"),
+                                       ('UPDATE', "OLD TABLE AS old_rows NEW TABLE AS new_rows")]:
+                cursor.execute("DROP TRIGGER IF EXISTS " + function + "_" + event.lower() + " ON " + table)
+                cursor.execute("CREATE TRIGGER " + function + "_" + event.lower() + " AFTER " + event + " ON " +
+                               table + " REFERENCING " + transitions + " FOR EACH STATEMENT "
+                               "EXECUTE PROCEDURE " + function + "()")
+
+        cursor.execute("CREATE OR REPLACE FUNCTION movie_stats_delta() RETURNS trigger AS $$ BEGIN "
+                       "INSERT INTO Stats_Delta SELECT NULL, NULL, n.id FROM new_rows n INNER JOIN old_rows o "
+                       "ON o.id = n.id WHERE n.runtime IS DISTINCT FROM o.runtime; "
+                       "RETURN NULL; END $$ LANGUAGE plpgsql")
+        cursor.execute("DROP TRIGGER IF EXISTS movie_stats_delta_update ON Movie")
+        cursor.execute("CREATE TRIGGER movie_stats_delta_update AFTER UPDATE ON Movie "
+                       "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT "
+                       "EXECUTE PROCEDURE movie_stats_delta()")
+
+    def refresh_statistics(self, cursor=None):
+        '''
+        Bring Member_Stats up to date with the changes logged in Stats_Delta since the last build or refresh.
+        Only the statistics of the members named there, or linked to a movie named there, are recomputed.
+        :return: number of (member, category) statistics recomputed
+        '''
+        cursor = cursor or self.cursor
+        # inside refresh_tables the caller's transaction is used
+        own_transaction = cursor.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if own_transaction:
+            cursor.execute("BEGIN")
+        try:
+            # rows logged while this runs stay for the next refresh
+            cursor.execute("CREATE temporary TABLE delta AS WITH d AS (DELETE FROM Stats_Delta RETURNING *) "
+                           "SELECT * FROM d")
+            cursor.execute("CREATE temporary TABLE affected AS SELECT category, member FROM delta "
+                           "WHERE member IS NOT NULL UNION " + " UNION ".join(
+                               "SELECT '" + category + "', " + category + " FROM " + table +
+                               " WHERE movie IN (SELECT movie FROM delta WHERE member IS NULL)"
+                               for table, category in LINK_TABLES))
+            cursor.execute("DELETE FROM Member_Stats S USING affected A "
+                           "WHERE S.member = A.member AND S.category = A.category")
+            for table, category in LINK_TABLES:
+                cursor.execute("INSERT INTO Member_Stats " + self._member_stats_select(
+                    table, category, "L." + category + " IN (SELECT member FROM affected WHERE category = '" +
+                    category + "')"))
+            cursor.execute("SELECT count(*) FROM affected")
+            count = cursor.fetchone()[0]
+            cursor.execute("DROP TABLE delta, affected")
+            if own_transaction:
+                cursor.execute("COMMIT")
+        except Exception:
+            if own_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+
+        print("Member_Stats: %d statistics refreshed" % count)
+        return count
+
+    def _member_stats_select(self, table, category, where=None):
+        '''
+        Member_Stats rows of one link table
+        :param where: optional condition on the link table L
+        '''
+        return ("SELECT L." + category + ", '" + category + "', count(*), count(*) FILTER (WHERE M.runtime > " +
+                str(LONG_RUNTIME) + "), sum(M.runtime), count(M.runtime) FROM " + table + " L "
+                "LEFT OUTER JOIN Movie M ON M.id = L.movie" + (" WHERE " + where if where else "") +
+                " GROUP BY L." + category)
+
+    def refresh_tables(self, path):
+        '''
+        Apply a new drop of the imdb datasets to the loaded database without reloading it. Every source row is
+        hashed (titles and names by tconst/nconst, principals per tconst) and compared with the hashes recorded
+        in Load_Hash by the previous load or refresh; only new, changed and vanished keys are written.
+        Runs in one transaction.
+        :param path: directory of the .tsv.gz files, ending with a separator
+        :return: dict of source to (inserted or updated keys, deleted keys)
+        '''
+        cursor = self.cursor
+        cursor.execute("BEGIN")
+        try:
+            self.stage_titles(cursor, path)
+            self.stage_names(cursor, path)
+            cursor.execute("CREATE temporary TABLE t2(tconst VARCHAR(20), ordering VARCHAR(10),"
+                           "nconst VARCHAR(20),category VARCHAR(100), job VARCHAR(500), charactersPlayed VARCHAR(500))")
+            copy_gzip(cursor, str(path) + 'title.principals.tsv.gz', 't2',
+                      ['tconst', 'ordering', 'nconst', 'category', 'job', 'charactersPlayed'])
+
+            cursor.execute("CREATE temporary TABLE new_hash AS " + ' UNION ALL '.join(ROW_HASHES.values()))
+            cursor.execute("CREATE temporary TABLE changed AS SELECT source, key FROM "
+                           "(SELECT * FROM new_hash EXCEPT SELECT * FROM Load_Hash) AS c")
+            cursor.execute("CREATE temporary TABLE deleted AS SELECT source, key FROM "
+                           "(SELECT source, key FROM Load_Hash EXCEPT SELECT source, key FROM new_hash) AS d")
+
+            report = {}
+            for source in ROW_HASHES:
+                cursor.execute("SELECT (SELECT count(*) FROM changed WHERE source = %s), "
+                               "(SELECT count(*) FROM deleted WHERE source = %s)", (source, source))
+                report[source] = cursor.fetchone()
+
+            # movies whose links have to be rebuilt: their principals, their own row or one of their members changed
+            cursor.execute("CREATE temporary TABLE relink AS SELECT DISTINCT key FROM ("
+                           "SELECT key FROM changed WHERE source IN ('title', 'principals') "
+                           "UNION SELECT key FROM deleted WHERE source IN ('title', 'principals') "
+                           "UNION SELECT tconst FROM t2 WHERE nconst IN "
+                           "(SELECT key FROM changed WHERE source = 'name' UNION SELECT key FROM deleted WHERE source = 'name') "
+                           "UNION SELECT movie FROM Movie_Actor WHERE actor IN (SELECT key FROM deleted WHERE source = 'name') "
+                           "UNION SELECT movie FROM Movie_Writer WHERE writer IN (SELECT key FROM deleted WHERE source = 'name') "
+                           "UNION SELECT movie FROM Movie_Director WHERE director IN (SELECT key FROM deleted WHERE source = 'name') "
+                           "UNION SELECT movie FROM Movie_Producer WHERE producer IN (SELECT key FROM deleted WHERE source = 'name')"
+                           ") AS r")
+
+            cursor.execute("DELETE FROM Actor_Movie_Role WHERE movie IN (SELECT key FROM relink)")
+            for table, category in LINK_TABLES:
+                cursor.execute("DELETE FROM " + table + " WHERE movie IN (SELECT key FROM relink)")
+            cursor.execute("DELETE FROM Movie_Genre WHERE movie IN "
+                           "(SELECT key FROM changed WHERE source = 'title' UNION "
+                           "SELECT key FROM deleted WHERE source = 'title')")
+
+            cursor.execute("DELETE FROM Movie WHERE id IN (SELECT key FROM deleted WHERE source = 'title')")
+            cursor.execute("DELETE FROM Member WHERE id IN (SELECT key FROM deleted WHERE source = 'name')")
+
+            cursor.execute("INSERT INTO Movie(id, type, title, originalTitle, startYear, endYear, runtime, avgRating, "
+                           "numVotes) SELECT M.id, M.type, M.title, M.originalTitle, M.startYear, M.endYear, M.runtime, "
+                           "R.avgRating, R.numVotes FROM r1 R INNER JOIN t1 M ON M.id= R.id "
+                           "WHERE M.id IN (SELECT key FROM changed WHERE source = 'title') "
+                           "ON CONFLICT (id) DO UPDATE SET type = EXCLUDED.type, title = EXCLUDED.title, "
+                           "originalTitle = EXCLUDED.originalTitle, startYear = EXCLUDED.startYear, "
+                           "endYear = EXCLUDED.endYear, runtime = EXCLUDED.runtime, avgRating = EXCLUDED.avgRating, "
+                           "numVotes = EXCLUDED.numVotes")
+            cursor.execute("INSERT INTO Member(id, name, birthYear, deathYear) SELECT id, name, birthYear, deathYear "
+                           "FROM t WHERE id IN (SELECT key FROM changed WHERE source = 'name') "
+                           "ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, birthYear = EXCLUDED.birthYear, "
+                           "deathYear = EXCLUDED.deathYear")
+
+            cursor.execute("INSERT INTO Genre(genre) SELECT DISTINCT genres FROM t1 "
+                           "WHERE genres NOT IN (SELECT genre FROM Genre WHERE genre IS NOT NULL)")
+            cursor.execute("INSERT INTO Movie_Genre(genre, movie) SELECT G.id, M.id FROM t1 T "
+                           "INNER JOIN Genre G on G.genre= T.genres INNER JOIN Movie M on T.id=M.id "
+                           "WHERE T.id IN (SELECT key FROM changed WHERE source = 'title')")
+
+            for table, category in LINK_TABLES:
+                self.link_members(cursor, table, category, 'relink')
+            self.load_roles(cursor, 'relink')
+            cursor.execute("SELECT to_regclass('member_stats') IS NOT NULL")
+            if cursor.fetchone()[0]:
+                self.refresh_statistics(cursor)
+
+            cursor.execute("DELETE FROM Load_Hash WHERE (source, key) IN "
+                           "(SELECT source, key FROM changed UNION ALL SELECT source, key FROM deleted)")
+            cursor.execute("INSERT INTO Load_Hash SELECT * FROM new_hash WHERE (source, key) IN "
+                           "(SELECT source, key FROM changed)")
+
+            for table in ['t1', 'r1', 't', 't2', 'new_hash', 'changed', 'deleted', 'relink']:
+                cursor.execute("DROP TABLE " + table)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+        for source, (written, deleted) in report.items():
+            print("%s: %d inserted or updated, %d deleted" % (source, written, deleted))
+        return report
+
+    def sql_query(self, workers=1):
+        '''
+        Perform querying on the IMDB database
+        :param workers: queries running at the same time, each on a pooled connection
+        :return: None
+        '''
+        start_time = time.time()
+        results = self.run_concurrently(QUERIES, workers)
+        if workers > 1:
+            print("--- %s seconds for the workload ---" % (time.time() - start_time))
+
+        for name, (rows, seconds) in results.items():
+            registry.observe('query_seconds', seconds, query=name)
+            print("--- %s seconds for %s ---" % (seconds, name))
+
+            print("printing only first five rows if available for %s" % name)
+            count = 0
+            for row in rows:
+                print(row)
+                count += 1
+                if count > 5:
+                    break
+
+    def benchmark(self, path, label=None, warmup=1, repetitions=5, explain=False):
+        '''
+        Benchmark the sql_query workload and write the results to a JSON file, see benchmark.py
+        :param path: JSON file to write
+        :param label: name of the run, e.g. "before indexing"
+        :param warmup: untimed runs per query
+        :param repetitions: timed runs per query
+        :param explain: also capture EXPLAIN (ANALYZE, BUFFERS) of every query
+        :return: dict of query name to results
+        '''
+        results = Benchmark(self.cursor, QUERIES, warmup, repetitions, explain).run()
+        write_results(results, path, label)
+        print_results(results)
+        return results
+
+    def benchmark_indexing(self, before_path, after_path, **options):
+        '''
+        Benchmark the workload, build the indexes, benchmark it again and compare the two runs
+        :param before_path: JSON file for the run without indexes
+        :param after_path: JSON file for the run with indexes
+        :param options: passed on to benchmark
+        :return: dict returned by benchmark.compare
+        '''
+        before = self.benchmark(before_path, "before indexing", **options)
+        self.indexing()
+        after = self.benchmark(after_path, "after indexing", **options)
+        return compare(before, after)
+
+    def indexing(self, workload=QUERIES, apply=True, min_gain=0.01, max_bytes=None):
+        '''
+        Create the indexes that speed up the query workload enough to be worth their size, see indexadvisor.py
+        :param workload: list of (name, query)
+        :param apply: build the chosen indexes, otherwise only report them
+        :param min_gain: smallest share of the workload's estimated cost an index has to save
+        :param max_bytes: optional limit on the total size of the chosen indexes
+        :return: advisor report
+        '''
+        self.cursor.execute("ANALYZE")
+        report = IndexAdvisor(self.cursor, workload, min_gain, max_bytes).advise(apply)
+        print_advice(report)
+        return report
+
+
+
+
+
+if __name__ == '__main__':
+    h = str(input("Enter host name"))
+    db = str(input("Enter Database Name"))
+    username = str(input("Enter username"))
+    pwd = str(input("Enter password"))
+    path = str(input("Enter Path except the file name - example- C:/users/files/"))
+
+    database_connection = DatabaseConnection(h, db, username, pwd)
+    database_connection.create_tables()
+    database_connection.insert_tables(path)
+    # database_connection.sql_query()
+    # database_connection.benchmark_indexing(path + 'before_indexing.json', path + 'after_indexing.json')
+    registry.export(os.environ.get('METRICS_DIR', '.'), 'imdbquerying')
\ No newline at end of file
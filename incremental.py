@@ -0,0 +1,180 @@
+'''
+Incremental maintenance of a set of minimal functional dependencies while rows are appended.
+
+The saved state is the encoded relation, the current minimal dependencies, the highest row id seen and,
+per dependency LHS, a partition index mapping every LHS value combination to one row of its class.
+Appending rows can only invalidate dependencies, never create new ones, so new rows are only looked up in
+these indexes, and only the supersets of invalidated LHSs are searched for minimal replacements. Checking
+a replacement builds its index on the way, which is kept if it holds. Only as many index entries as asked
+for are saved; the other indexes are rebuilt when an update needs them.
+'''
+
+import pickle
+from itertools import islice, repeat
+
+from partitions import bits
+
+
+# index entries written by FDState.save by default, a few tens of MB of pickle
+SAVED_KEYS = 1000000
+
+
+class FDState:
+    '''
+    Minimal dependencies of an encoded relation plus the partition indexes needed to keep them current.
+    '''
+
+    def __init__(self, relation, fds, saved_keys=SAVED_KEYS):
+        '''
+        :param relation: encoding.EncodedRelation the dependencies were discovered on
+        :param fds: list of (lhs mask, rhs column position) pairs, all exact and minimal
+        :param saved_keys: most index entries written by save, smallest indexes first, None for all
+        '''
+        # a relation mapped from a snapshot can neither be pickled nor appended to
+        relation.materialize()
+        self.relation = relation
+        self.fds = sorted(fds)
+        self.saved_keys = saved_keys
+        self.indexes = {}
+        for lhs, rhs in self.fds:
+            if lhs not in self.indexes:
+                self.indexes[lhs] = self._index(lhs)
+
+    @property
+    def high_water(self):
+        '''
+        Highest row id already covered, 0 for an empty relation
+        '''
+        # rows are extracted and appended in id order
+        return self.relation.row_ids[-1] if self.relation.num_rows else 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self.saved_keys is not None:
+            state['indexes'] = {}
+            total = 0
+            for lhs, index in sorted(self.indexes.items(), key=lambda item: len(item[1])):
+                total += len(index)
+                if total > self.saved_keys:
+                    break
+                state['indexes'][lhs] = index
+        return state
+
+    def save(self, path):
+        with open(path, 'wb') as f_out:
+            pickle.dump(self, f_out, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f_in:
+            return pickle.load(f_in)
+
+    def update(self, first_row):
+        '''
+        Bring the dependencies up to date after rows were appended to the relation
+        :param first_row: position of the first appended row
+        :return: (list of invalidated dependencies, list of new minimal dependencies)
+        '''
+        columns = self.relation.columns
+        num_rows = self.relation.num_rows
+        by_lhs = {}
+        for lhs, rhs in self.fds:
+            by_lhs.setdefault(lhs, []).append(rhs)
+
+        violated = []
+        for lhs, rhs_list in by_lhs.items():
+            if lhs not in self.indexes:
+                # not saved: the old rows are indexed again, the appended ones are looked up below
+                self.indexes[lhs] = self._index(lhs, rows=first_row)
+            index = self.indexes[lhs]
+            lhs_columns = [columns[a.bit_length() - 1] for a in bits(lhs)]
+            alive = list(rhs_list)
+            for row in range(first_row, num_rows):
+                key = tuple([column[row] for column in lhs_columns])
+                representative = index.setdefault(key, row)
+                if representative == row:
+                    continue
+                for rhs in list(alive):
+                    if columns[rhs][row] != columns[rhs][representative]:
+                        alive.remove(rhs)
+                        violated.append((lhs, rhs))
+                if not alive:
+                    break
+
+        added = []
+        for rhs in sorted({rhs for lhs, rhs in violated}):
+            added.extend((lhs, rhs) for lhs in self._replacements(rhs, [lhs for lhs, r in violated if r == rhs]))
+
+        violated_set = set(violated)
+        self.fds = sorted([fd for fd in self.fds if fd not in violated_set] + added)
+        used = {lhs for lhs, rhs in self.fds}
+        for lhs in list(self.indexes):
+            if lhs not in used:
+                del self.indexes[lhs]
+        for lhs in used:
+            if lhs not in self.indexes:
+                self.indexes[lhs] = self._index(lhs)
+        return sorted(violated), sorted(added)
+
+    def _replacements(self, rhs, violated):
+        '''
+        Minimal LHSs for rhs among the supersets of the invalidated ones. Sets are visited smallest first,
+        so everything found is minimal; supersets of a still valid LHS are skipped.
+        :param rhs: column position
+        :param violated: LHS masks that no longer determine rhs
+        :return: list of LHS masks
+        '''
+        num_attributes = len(self.relation.columns)
+        valid = [lhs for lhs, r in self.fds if r == rhs and lhs not in violated]
+        found = []
+        invalid = set(violated)
+        pending = {}
+        for lhs in violated:
+            pending.setdefault(bin(lhs).count('1'), set()).add(lhs)
+
+        for size in range(num_attributes):
+            for lhs in sorted(pending.get(size, ())):
+                if lhs not in invalid:
+                    if any(v & lhs == v for v in valid):
+                        continue
+                    index = self._index(lhs, rhs)
+                    if index is not None:
+                        self.indexes.setdefault(lhs, index)
+                        valid.append(lhs)
+                        found.append(lhs)
+                        continue
+                    invalid.add(lhs)
+                for a in range(num_attributes):
+                    if a != rhs and not lhs >> a & 1:
+                        pending.setdefault(size + 1, set()).add(lhs | 1 << a)
+        return found
+
+    def _index(self, lhs, rhs=None, rows=None):
+        '''
+        Partition index of an LHS: first row of every value combination
+        :param rhs: column position every row has to agree on with the first row of its class, None for no check
+        :param rows: number of leading rows to index, None for all
+        :return: dict, None as soon as a row disagrees on rhs
+        '''
+        index = {}
+        keys = self._keys(lhs)
+        if rows is not None:
+            keys = islice(keys, rows)
+        if rhs is None:
+            for row, key in enumerate(keys):
+                index.setdefault(key, row)
+            return index
+        column = self.relation.columns[rhs]
+        for row, key in enumerate(keys):
+            if column[index.setdefault(key, row)] != column[row]:
+                return None
+        return index
+
+    def _keys(self, lhs):
+        '''
+        Value combination of an LHS for every row
+        '''
+        columns = [self.relation.columns[a.bit_length() - 1] for a in bits(lhs)]
+        if not columns:
+            return repeat((), self.relation.num_rows)
+        return zip(*columns)
@@ -0,0 +1,184 @@
+'''
+Inclusion dependency discovery by a single sort-merge over all candidate columns (SPIDER, Bauckmann et al. 2006).
+
+An inclusion dependency A <= B holds when every value of column A also occurs in column B, which is what a
+foreign key from A to B needs. Rather than one anti-join per pair of columns, every candidate column is read
+once, as its sorted distinct values with their row counts, each on its own server-side cursor of one
+read-only snapshot. The streams are merged on a heap. At each value, the columns holding it are the only
+ones left that can still include the columns that hold it; every other candidate of those columns loses the
+value's rows as violations, and is dropped once it has more than the allowed number. A stream that no
+remaining candidate reads from is closed before it ends.
+
+Values are compared as text in the "C" collation, which orders them by code point both in Postgres and in
+Python, so columns of different types are merged on their text form.
+'''
+
+import heapq
+
+from metrics import registry
+from partitions import bits
+
+
+class Spider:
+    '''
+    Finds the exact and approximate inclusion dependencies among a set of columns
+    '''
+
+    def __init__(self, connection, columns, max_violations=0, pairs=None, itersize=10000):
+        '''
+        :param connection: psycopg2 connection, used in a transaction of its own and left in autocommit mode
+        :param columns: list of (table, column) to look at
+        :param max_violations: most dependent rows whose value is missing on the referenced side, for a dependency
+                               to be reported; None to report every pair with its violations
+        :param pairs: list of (dependent, referenced) pairs of (table, column) to check, all pairs of different
+                      columns by default
+        :param itersize: rows fetched per round trip on every stream
+        '''
+        self.connection = connection
+        self.columns = list(columns)
+        self.max_violations = max_violations
+        self.itersize = itersize
+        positions = {column: i for i, column in enumerate(self.columns)}
+        # per column: the columns it may still be included in, as a bitmask over positions
+        self.refs = [0] * len(self.columns)
+        if pairs is None:
+            everything = (1 << len(self.columns)) - 1
+            self.refs = [everything & ~(1 << i) for i in range(len(self.columns))]
+        else:
+            for dependent, referenced in pairs:
+                self.refs[positions[dependent]] |= 1 << positions[referenced]
+        self.rows = [0] * len(self.columns)
+        self.distinct = [0] * len(self.columns)
+        # None unless a stream was read to its end
+        self.unique = [None] * len(self.columns)
+        self._duplicates = set()
+        self.violations = [{} for column in self.columns]
+
+    def run(self):
+        '''
+        :return: list of dicts with the dependent and referenced (table, column), the dependent's non-NULL rows,
+                 its violating rows and distinct values, and whether the referenced column holds no duplicates
+        '''
+        connection = self.connection
+        connection.autocommit = False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            self._merge()
+        finally:
+            connection.rollback()
+            connection.autocommit = True
+
+        result = []
+        for i, refs in enumerate(self.refs):
+            for b_bit in bits(refs):
+                b = b_bit.bit_length() - 1
+                rows, distinct = self.violations[i].get(b, (0, 0))
+                result.append({
+                    'dependent': self.columns[i],
+                    'referenced': self.columns[b],
+                    'rows': self.rows[i],
+                    'violations': rows,
+                    'distinct_violations': distinct,
+                    'referenced_unique': self.unique[b],
+                })
+        result.sort(key=lambda ind: (ind['violations'], ind['dependent'], ind['referenced']))
+        return result
+
+    def _merge(self):
+        streams = {}
+        heap = []
+        for i in range(len(self.columns)):
+            if self._needed(i):
+                streams[i] = self._stream(i)
+                self._advance(i, streams, heap)
+
+        merged = 0
+        while heap:
+            value = heap[0][0]
+            members = []
+            group = 0
+            while heap and heap[0][0] == value:
+                value, i, count = heapq.heappop(heap)
+                members.append((i, count))
+                group |= 1 << i
+            merged += 1
+
+            pruned = False
+            for i, count in members:
+                self.rows[i] += count
+                self.distinct[i] += 1
+                if count > 1:
+                    self._duplicates.add(i)
+                for b_bit in bits(self.refs[i] & ~group):
+                    b = b_bit.bit_length() - 1
+                    rows, distinct = self.violations[i].get(b, (0, 0))
+                    self.violations[i][b] = rows + count, distinct + 1
+                    if self.max_violations is not None and rows + count > self.max_violations:
+                        self.refs[i] &= ~b_bit
+                        pruned = True
+
+            for i, count in members:
+                if not pruned or self._needed(i):
+                    self._advance(i, streams, heap)
+                else:
+                    streams.pop(i).close()
+                    registry.inc('ind_streams_closed')
+            if pruned:
+                for i in [i for i in streams if not self._needed(i)]:
+                    # its next value is still on the heap; skip it there
+                    streams.pop(i).close()
+                    registry.inc('ind_streams_closed')
+                heap = [entry for entry in heap if entry[1] in streams]
+                heapq.heapify(heap)
+        registry.inc('ind_values_merged', merged)
+
+    def _needed(self, i):
+        '''
+        Whether a column still has candidates or is still a candidate. A closed stream never is either, so the
+        streams read to their end keep their candidates open to the end too, and with them whether they are unique.
+        '''
+        return self.refs[i] != 0 or any(refs >> i & 1 for refs in self.refs)
+
+    def _advance(self, i, streams, heap):
+        try:
+            value, count = next(streams[i])
+        except StopIteration:
+            del streams[i]
+            self.unique[i] = i not in self._duplicates
+            return
+        heapq.heappush(heap, (value, i, count))
+
+    def _stream(self, i):
+        '''
+        :return: generator of (value, rows) of a column in value order, NULLs left out
+        '''
+        table, column = self.columns[i]
+        cursor = self.connection.cursor(name='spider_%d' % i)
+        cursor.itersize = self.itersize
+        cursor.execute("SELECT " + column + "::text COLLATE \"C\" AS value, count(*) FROM " + table +
+                       " WHERE " + column + " IS NOT NULL GROUP BY 1 ORDER BY 1")
+        try:
+            for value, count in cursor:
+                yield value, count
+        finally:
+            cursor.close()
+
+
+def foreign_keys(inds):
+    '''
+    Foreign keys the exact dependencies allow, referencing columns without duplicates only
+    :param inds: result of Spider.run
+    :return: list of ALTER TABLE statements
+    '''
+    return ["ALTER TABLE %s ADD FOREIGN KEY(%s) REFERENCES %s(%s)" % (ind['dependent'] + ind['referenced'])
+            for ind in inds if ind['violations'] == 0 and ind['referenced_unique'] and ind['rows']]
+
+
+def print_inds(inds):
+    for ind in inds:
+        dependent = "%s.%s" % ind['dependent']
+        referenced = "%s.%s" % ind['referenced']
+        print("%s <= %s: %d of %d rows violate (%d values)%s" % (
+            dependent, referenced, ind['violations'], ind['rows'], ind['distinct_violations'],
+            ", referenced column unique" if ind['referenced_unique'] else ""))
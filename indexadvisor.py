@@ -0,0 +1,284 @@
+'''
+Workload-driven index selection.
+
+Candidate indexes are read off the plans of the workload: a B-tree per join column and per column compared
+with =, <, >, <= or >=, a text_pattern_ops B-tree per prefix LIKE and a trigram GIN index per LIKE whose
+pattern does not start with a fixed prefix. Each candidate is priced by the planner: the workload is
+EXPLAINed with the candidate present, as a hypothetical index if the hypopg extension is installed, and
+otherwise after actually building it. Candidates are then taken greedily, most gain per byte first, for as
+long as each one still lowers the estimated cost of the workload by enough.
+'''
+
+import json
+import re
+import time
+
+
+# plan fields holding conditions, and the ones that name columns with their relation alias
+FILTERS = ('Filter', 'Index Cond', 'Recheck Cond')
+JOIN_CONDITIONS = ('Hash Cond', 'Merge Cond', 'Join Filter')
+
+_CAST = r'(?:::[a-z ]+)?'
+_LIKE = re.compile(r'(lower\()?\(?(?:(\w+)\.)?(\w+)\)?' + _CAST + r'\)? ~~ \'((?:[^\']|\'\')*)\'')
+_COMPARISON = re.compile(r'\(?(?:(\w+)\.)?(\w+)\)?' + _CAST + r' (=|<|>|<=|>=) ')
+_QUALIFIED = re.compile(r'(\w+)\.(\w+)')
+
+
+class Candidate:
+    '''
+    A possible index
+    '''
+
+    def __init__(self, table, kind, column, lowered=False):
+        '''
+        :param table: table name
+        :param kind: 'btree', 'pattern' (text_pattern_ops B-tree) or 'trigram' (gin_trgm_ops GIN)
+        :param column: column name
+        :param lowered: index lower(column) rather than the column
+        '''
+        self.table = table
+        self.kind = kind
+        self.column = column
+        self.lowered = lowered
+        self.name = ('advisor_%s_%s%s_%s' % (table, 'lower_' if lowered else '', column, kind)).lower()[:63]
+
+    @property
+    def key(self):
+        return self.table, self.kind, self.column, self.lowered
+
+    def statement(self):
+        expression = "lower(%s)" % self.column if self.lowered else self.column
+        if self.kind == 'btree':
+            return "CREATE INDEX %s ON %s (%s)" % (self.name, self.table, expression)
+        if self.kind == 'pattern':
+            return "CREATE INDEX %s ON %s (%s text_pattern_ops)" % (self.name, self.table, expression)
+        return "CREATE INDEX %s ON %s USING GIN (%s gin_trgm_ops)" % (self.name, self.table, expression)
+
+
+class IndexAdvisor:
+
+    def __init__(self, cursor, workload, min_gain=0.01, max_bytes=None):
+        '''
+        :param cursor: psycopg2 cursor on an autocommit connection
+        :param workload: list of (name, query)
+        :param min_gain: smallest share of the workload cost an index has to save to be kept
+        :param max_bytes: optional limit on the total size of the chosen indexes
+        '''
+        self.cursor = cursor
+        self.workload = workload
+        self.min_gain = min_gain
+        self.max_bytes = max_bytes
+        self.hypothetical = self._create_extension('hypopg')
+
+    def candidates(self):
+        '''
+        Indexes the plans of the workload could use, minus the ones that already exist
+        :return: list of Candidate
+        '''
+        found = {}
+        for name, query in self.workload:
+            plan = self.explain(query)['Plan']
+            aliases = {}
+            nodes = list(self._nodes(plan))
+            for node in nodes:
+                if 'Relation Name' in node:
+                    aliases[node.get('Alias', node['Relation Name'])] = node['Relation Name']
+
+            for node in nodes:
+                relation = node.get('Relation Name')
+                for field in FILTERS:
+                    condition = node.get(field)
+                    if condition:
+                        for candidate in self._filter_candidates(condition, relation, aliases):
+                            found.setdefault(candidate.key, candidate)
+                for field in JOIN_CONDITIONS:
+                    condition = node.get(field)
+                    if condition:
+                        for alias, column in _QUALIFIED.findall(condition):
+                            if alias in aliases:
+                                candidate = Candidate(aliases[alias], 'btree', column)
+                                found.setdefault(candidate.key, candidate)
+
+        existing = self._existing_indexes()
+        candidates = []
+        for candidate in found.values():
+            if candidate.name in existing['names'] or \
+                    (candidate.kind == 'btree' and (candidate.table, candidate.column) in existing['leading']):
+                continue
+            candidates.append(candidate)
+
+        if any(candidate.kind == 'trigram' for candidate in candidates) and not self._create_extension('pg_trgm'):
+            candidates = [candidate for candidate in candidates if candidate.kind != 'trigram']
+        return sorted(candidates, key=lambda candidate: candidate.key)
+
+    def advise(self, apply=False):
+        '''
+        Price every candidate and choose the set that pays off
+        :param apply: build the chosen indexes
+        :return: dict with the workload cost without and with the chosen indexes and, per candidate, how it was
+                 priced ('hypothetical' or 'built'), its size, build seconds (None when hypothetical), gain on
+                 its own, gain on top of the indexes chosen before it and whether it was chosen
+        '''
+        candidates = self.candidates()
+        baseline = self.workload_cost()
+        report = {'baseline': baseline, 'cost': baseline, 'candidates': []}
+        entries = {}
+        for candidate in candidates:
+            entry = {'name': candidate.name, 'table': candidate.table, 'statement': candidate.statement(),
+                     'method': None, 'bytes': None, 'build_seconds': None, 'gain': None, 'marginal': None,
+                     'chosen': False}
+            handle = self._add(candidate, entry)
+            if handle is None:
+                continue
+            entry['gain'] = baseline - self.workload_cost()
+            self._remove(handle)
+            entries[candidate.name] = entry
+            report['candidates'].append(entry)
+
+        # most gain per byte first; every index is kept in place while the next ones are priced
+        ordered = sorted([candidate for candidate in candidates if candidate.name in entries],
+                         key=lambda candidate: -entries[candidate.name]['gain'] /
+                         max(entries[candidate.name]['bytes'], 1))
+        chosen = []
+        cost = baseline
+        total_bytes = 0
+        for candidate in ordered:
+            entry = entries[candidate.name]
+            if entry['gain'] < self.min_gain * baseline:
+                continue
+            if self.max_bytes is not None and total_bytes + entry['bytes'] > self.max_bytes:
+                continue
+            handle = self._add(candidate, {})
+            if handle is None:
+                continue
+            new_cost = self.workload_cost()
+            entry['marginal'] = cost - new_cost
+            if entry['marginal'] >= self.min_gain * baseline:
+                entry['chosen'] = True
+                chosen.append((candidate, handle))
+                cost = new_cost
+                total_bytes += entry['bytes']
+            else:
+                self._remove(handle)
+        report['cost'] = cost
+
+        for candidate, handle in chosen:
+            if apply and handle[0] == 'built':
+                continue
+            self._remove(handle)
+        if apply:
+            for candidate, handle in chosen:
+                if handle[0] == 'hypothetical':
+                    start_time = time.time()
+                    self.cursor.execute(candidate.statement())
+                    entries[candidate.name]['build_seconds'] = time.time() - start_time
+        return report
+
+    def workload_cost(self):
+        '''
+        Sum of the planner's total cost estimates of the workload
+        '''
+        return sum(self.explain(query)['Plan']['Total Cost'] for name, query in self.workload)
+
+    def explain(self, query):
+        self.cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+        plan = self.cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]
+
+    def _add(self, candidate, entry):
+        '''
+        Put a candidate in place, hypothetically if possible
+        :return: ('hypothetical', oid) or ('built', name), None if it cannot be created
+        '''
+        statement = candidate.statement()
+        if self.hypothetical and candidate.kind != 'trigram':
+            try:
+                self.cursor.execute("SELECT indexrelid FROM hypopg_create_index(%s)", (statement,))
+                oid = self.cursor.fetchone()[0]
+                self.cursor.execute("SELECT hypopg_relation_size(%s)", (oid,))
+                entry.update(method='hypothetical', bytes=self.cursor.fetchone()[0])
+                return 'hypothetical', oid
+            except Exception:
+                # e.g. an access method hypopg does not support; build it instead
+                pass
+
+        try:
+            start_time = time.time()
+            self.cursor.execute(statement)
+            build_seconds = time.time() - start_time
+        except Exception as e:
+            print("skipping %s: %s" % (candidate.name, getattr(e, 'message', str(e)).strip()))
+            return None
+        self.cursor.execute("SELECT pg_relation_size(%s::regclass)", (candidate.name,))
+        entry.update(method='built', bytes=self.cursor.fetchone()[0], build_seconds=build_seconds)
+        return 'built', candidate.name
+
+    def _remove(self, handle):
+        method, value = handle
+        if method == 'hypothetical':
+            self.cursor.execute("SELECT hypopg_drop_index(%s)", (value,))
+        else:
+            self.cursor.execute("DROP INDEX " + value)
+
+    def _filter_candidates(self, condition, relation, aliases):
+        '''
+        Candidates for the conditions of a scan
+        '''
+        for lowered, alias, column, pattern in _LIKE.findall(condition):
+            table = aliases.get(alias, relation) if alias else relation
+            if table is None:
+                continue
+            prefix = re.match(r'[^%_]*', pattern).group(0)
+            yield Candidate(table, 'pattern' if prefix and pattern != prefix else 'trigram', column, bool(lowered))
+
+        for alias, column, operator in _COMPARISON.findall(condition):
+            table = aliases.get(alias, relation) if alias else relation
+            if table is not None and column not in ('lower', 'upper'):
+                yield Candidate(table, 'btree', column)
+
+    def _existing_indexes(self):
+        '''
+        Names of the existing indexes and (table, leading column) of the existing plain B-trees
+        '''
+        self.cursor.execute("SELECT c.relname, i.relname, pg_get_indexdef(x.indexrelid, 1, true), am.amname "
+                            "FROM pg_index x JOIN pg_class c ON c.oid = x.indrelid "
+                            "JOIN pg_class i ON i.oid = x.indexrelid JOIN pg_am am ON am.oid = i.relam "
+                            "WHERE c.relnamespace = current_schema()::regnamespace")
+        existing = {'names': set(), 'leading': set()}
+        for table, name, column, method in self.cursor.fetchall():
+            existing['names'].add(name)
+            if method == 'btree':
+                existing['leading'].add((table, column))
+        return existing
+
+    def _create_extension(self, name):
+        self.cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = %s", (name,))
+        if self.cursor.fetchone() is None:
+            return False
+        try:
+            self.cursor.execute("CREATE EXTENSION IF NOT EXISTS " + name)
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _nodes(plan):
+        yield plan
+        for child in plan.get('Plans', ()):
+            for node in IndexAdvisor._nodes(child):
+                yield node
+
+
+def print_advice(report):
+    '''
+    Print the candidates of an advisor report with their gain, size and build time
+    '''
+    for entry in sorted(report['candidates'], key=lambda entry: -entry['gain']):
+        print("%s %s: gain %.1f (%s), %d bytes, built in %s seconds, %s" % (
+            '+' if entry['chosen'] else '-', entry['name'], entry['gain'],
+            '%.1f on top' % entry['marginal'] if entry['marginal'] is not None else 'not retried',
+            entry['bytes'], '%.2f' % entry['build_seconds'] if entry['build_seconds'] is not None else '-',
+            entry['method']))
+    print("workload cost %.1f -> %.1f" % (report['baseline'], report['cost']))
@@ -0,0 +1,143 @@
+'''
+Dependency-aware scheduling of load stages over a pool of database connections (dbconnection.ConnectionPool).
+
+A load is a set of named stages, each declaring the stages it depends on. Every stage runs as soon as its
+dependencies are done, on whichever connection is free, so independent stages run at the same time.
+The report gives the wall time of every stage and the critical path, the chain of dependent stages that
+bounds the total time however many connections are used.
+'''
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import registry
+
+
+class Stage:
+    '''
+    One step of a load
+    '''
+
+    def __init__(self, name, run, depends=()):
+        '''
+        :param name: stage name
+        :param run: callable taking a cursor
+        :param depends: names of the stages that have to finish first
+        '''
+        self.name = name
+        self.run = run
+        self.depends = tuple(depends)
+
+
+class StageScheduler:
+
+    def __init__(self, stages):
+        '''
+        :param stages: list of Stage, names unique and dependencies acyclic
+        '''
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError("duplicate stage %s" % stage.name)
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for name in stage.depends:
+                if name not in self.stages:
+                    raise ValueError("stage %s depends on unknown stage %s" % (stage.name, name))
+        self.order = self._topological_order()
+
+    def run(self, pool, workers=1):
+        '''
+        Run every stage once its dependencies are done
+        :param pool: dbconnection.ConnectionPool the stages take their connections from
+        :param workers: number of stages running at the same time
+        :return: report dict with per-stage start, end and seconds, the critical path and the total seconds
+        '''
+        timings = {}
+        started = time.time()
+
+        def execute(stage):
+            # stages are not repeated after a transient error: most of them load data
+            with pool.connection() as connection:
+                with connection.cursor() as cursor, registry.stage(stage.name, cursor) as counting:
+                    begin = time.time()
+                    stage.run(counting)
+                    timings[stage.name] = (begin - started, time.time() - started)
+
+        done = set()
+        running = {}
+        with ThreadPoolExecutor(max(1, min(workers, len(self.stages)))) as executor:
+            while len(done) < len(self.stages):
+                for name in self.order:
+                    stage = self.stages[name]
+                    if name not in done and name not in running.values() and \
+                            all(dependency in done for dependency in stage.depends):
+                        running[executor.submit(execute, stage)] = name
+                finished, pending = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    # re-raise the first failure once the running stages are done; nothing new is started
+                    if future.exception() is not None:
+                        wait(running)
+                        raise future.exception()
+                    done.add(name)
+
+        durations = {name: end - begin for name, (begin, end) in timings.items()}
+        return {
+            'stages': {name: {'start': timings[name][0], 'end': timings[name][1], 'seconds': durations[name]}
+                       for name in self.order},
+            'critical_path': self.critical_path(durations),
+            'seconds': time.time() - started,
+        }
+
+    def critical_path(self, durations):
+        '''
+        Longest chain of dependent stages by total duration
+        :param durations: dict of stage name to seconds
+        :return: list of stage names, first stage first
+        '''
+        longest = {}
+        previous = {}
+        for name in self.order:
+            stage = self.stages[name]
+            best = max(stage.depends, key=lambda dependency: longest[dependency], default=None)
+            longest[name] = durations.get(name, 0) + (longest[best] if best is not None else 0)
+            previous[name] = best
+
+        if not longest:
+            return []
+        name = max(self.order, key=lambda stage_name: longest[stage_name])
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1]
+
+    def _topological_order(self):
+        order = []
+        state = {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError("stage dependencies form a cycle through %s" % name)
+            state[name] = 'visiting'
+            for dependency in self.stages[name].depends:
+                visit(dependency)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+
+def print_report(report):
+    '''
+    Print the per-stage timings and the critical path of a scheduler report
+    '''
+    for name, timing in report['stages'].items():
+        print("--- %s seconds for %s (%.1f - %.1f) ---" % (timing['seconds'], name, timing['start'], timing['end']))
+    print("critical path: %s" % ' -> '.join(report['critical_path']))
+    print("--- %s seconds in total ---" % report['seconds'])
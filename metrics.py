@@ -0,0 +1,215 @@
+'''
+Counters and timers for the loaders and the FD discovery, exported as a JSON run report and as a
+Prometheus textfile (for node_exporter's textfile collector).
+
+Everything is recorded on the module-level registry. Values carry labels. The labels of the enclosing
+stage() are added automatically, so a counter bumped deep inside a load, such as the gzip bytes in
+gzipcopy, is attributed to the stage that caused it. stage() also profiles its body with cProfile when
+profiling is turned on, either with enable_profiling or with the PROFILE_DIR environment variable.
+'''
+
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+PREFIX = 'imdb_'
+
+# statement tags whose row count is rows written
+_WRITES = ('INSERT', 'UPDATE', 'DELETE', 'COPY')
+
+
+class CountingCursor:
+    '''
+    Cursor wrapper adding up the rows written by INSERT, UPDATE, DELETE and COPY statements
+    '''
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rows = 0
+
+    def execute(self, *args):
+        result = self._cursor.execute(*args)
+        self._count()
+        return result
+
+    def copy_expert(self, *args):
+        result = self._cursor.copy_expert(*args)
+        self._count()
+        return result
+
+    def _count(self):
+        status = self._cursor.statusmessage or ''
+        if status.startswith(_WRITES) and self._cursor.rowcount > 0:
+            self.rows += self._cursor.rowcount
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class Metrics:
+
+    def __init__(self, profile_dir=None):
+        '''
+        :param profile_dir: directory stage() writes <stage>.prof files to, None for no profiling
+        '''
+        self.profile_dir = profile_dir
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.timers = {}
+        self._lock = threading.Lock()
+        self._context = threading.local()
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        '''
+        Record one duration of a timer
+        '''
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, longest = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start_time, **labels)
+
+    @contextmanager
+    def stage(self, name, cursor=None):
+        '''
+        Time a stage as stage_seconds, attribute everything recorded inside it to the stage, and profile it
+        if profiling is on
+        :param name: stage name
+        :param cursor: optional cursor; a CountingCursor over it is yielded and its rows are added to stage_rows
+        '''
+        previous = getattr(self._context, 'labels', {})
+        self._context.labels = dict(previous, stage=name)
+        counting = CountingCursor(cursor) if cursor is not None else None
+        profile = self._start_profile()
+        start_time = time.time()
+        try:
+            yield counting
+        finally:
+            self.observe('stage_seconds', time.time() - start_time)
+            if counting is not None:
+                self.inc('stage_rows', counting.rows)
+            if profile is not None:
+                profile.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.profile_dir, name + '.prof'))
+            self._context.labels = previous
+
+    def enable_profiling(self, directory):
+        self.profile_dir = directory
+
+    def report(self):
+        '''
+        :return: JSON-ready dict of every value recorded so far
+        '''
+        def entries(values, fields):
+            return [dict(zip(('name', 'labels'), (name, dict(labels))), **fields(value))
+                    for (name, labels), value in sorted(values.items(), key=lambda item: repr(item[0]))]
+        with self._lock:
+            return {
+                'started': self.started,
+                'seconds': time.time() - self.started,
+                'counters': entries(self.counters, lambda value: {'value': value}),
+                'gauges': entries(self.gauges, lambda value: {'value': value}),
+                'timers': entries(self.timers, lambda value: {'count': value[0], 'sum': value[1], 'max': value[2]}),
+            }
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path):
+        '''
+        Write the values in the Prometheus text exposition format. Timers become summaries with _sum and
+        _count, plus a gauge family of their own named <name>_max, as a summary may hold no other samples.
+        '''
+        lines = []
+        report = self.report()
+        for kind, entries in (('counter', report['counters']), ('gauge', report['gauges'])):
+            for name in sorted({entry['name'] for entry in entries}):
+                lines.append("# TYPE %s%s %s" % (PREFIX, name, kind))
+                for entry in entries:
+                    if entry['name'] == name:
+                        lines.append("%s%s%s %s" % (PREFIX, name, _labels(entry['labels']), entry['value']))
+        for name in sorted({entry['name'] for entry in report['timers']}):
+            timers = [entry for entry in report['timers'] if entry['name'] == name]
+            lines.append("# TYPE %s%s summary" % (PREFIX, name))
+            for entry in timers:
+                labels = _labels(entry['labels'])
+                lines.append("%s%s_sum%s %s" % (PREFIX, name, labels, entry['sum']))
+                lines.append("%s%s_count%s %s" % (PREFIX, name, labels, entry['count']))
+            lines.append("# TYPE %s%s_max gauge" % (PREFIX, name))
+            for entry in timers:
+                lines.append("%s%s_max%s %s" % (PREFIX, name, _labels(entry['labels']), entry['max']))
+        self._write(path, '\n'.join(lines) + '\n')
+
+    def export(self, directory, name):
+        '''
+        Write <name>.json and <name>.prom into a directory
+        '''
+        self.write_json(os.path.join(directory, name + '.json'))
+        self.write_prometheus(os.path.join(directory, name + '.prom'))
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters.clear()
+            self.gauges.clear()
+            self.timers.clear()
+
+    def _key(self, name, labels):
+        context = getattr(self._context, 'labels', None)
+        if context:
+            labels = dict(context, **labels)
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def _start_profile(self):
+        if self.profile_dir is None:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another stage is being profiled on another thread
+            return None
+        return profile
+
+    @staticmethod
+    def _write(path, text):
+        # written aside and renamed, so a collector never reads half a file
+        with open(path + '.tmp', 'w') as f_out:
+            f_out.write(text)
+        os.replace(path + '.tmp', path)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in sorted(labels.items())) + '}'
+
+
+registry = Metrics(os.environ.get('PROFILE_DIR'))
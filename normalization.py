@@ -4,51 +4,175 @@
 Python3 program for determining Functional Dependencies of the previously loaded IMDB database.
 '''
 
-import psycopg2
-
+import os
+import threading
 import time
 from itertools import combinations
-from  builtins import any as b_any
 
+import dbconnection
+import encoding
+import fdalgebra
+from gzipcopy import copy_gzip
+from hyfd import HyFD
+from incremental import FDState
+from loadscheduler import Stage, StageScheduler
+from metrics import registry
+from paralleltane import ParallelTane
+from partitions import PartitionCache
+import snapshot
+from sqllattice import SqlTane
+from tane import Tane, format_fds
 
 
-class DatabaseConnection:
+# the table and columns the dependency methods look at unless they are given others
+TABLE = 'normalization'
+COLUMNS = ['movieid', 'type', 'startyear', 'runtime', 'avgrating', 'genreid', 'genre', 'memberid', 'birthyear', 'role']
+ID_COLUMN = 'nid'
+
+# arguments GROUPING() accepts in Postgres
+MAX_GROUPING_ARGUMENTS = 31
+
+# raw IMDB files as loaded into the staging tables of postgresimdb.py, by file name
+STAGING = {
+    'title.basics': ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+                     'runTime', 'genres'],
+    'title.principals': ['tconst', 'ordering', 'nconst', 'category', 'job', 'charactersPlayed'],
+}
 
-    def __init__(self,h,db,username,pwd):
-        '''
-        Constructor is used to connect to the database
-        :param h: hostname
-        :param db: database name
-        :param username: Username
-        :param pwd: password
-        '''
-        try:
-            self.connection = psycopg2.connect(host=str(h), database=str(db), user=str(username), password=str(pwd))
-            # self.connection = psycopg2.connect(host='localhost', database='IMDB', user='user000', password='abcde')
-            self.connection.autocommit=True
-            self.cursor=self.connection.cursor()
-        except Exception as e:
-            print(getattr(e, 'message', repr(e)))
-            print(getattr(e, 'message', str(e)))
+
+class DatabaseConnection(dbconnection.DatabaseConnection):
 
     def create_table(self):
         self.cursor.execute("create table normalization(nid SERIAL, movieId VARCHAR, "
                             "type VARCHAR, startYear INT, runtime INT, avgRating float, genreId INT, genre VARCHAR, "
                             "   memberId VARCHAR, birthYear INT, role VARCHAR, CONSTRAINT unique_const UNIQUE(movieid, memberid,genreid), PRIMARY KEY(movieid, memberid, genreid))")
 
-    def insert_table(self):
-        self.cursor.execute("insert into normalization(movieId, type, startyear, runtime, avgrating, genreid, genre, memberid, birthyear,role) "
-                            "select m.id, m.type, m.startyear, m.runtime, m.avgrating, g.id, mg.genre, mb.id, mb.birthyear, amr.role from movie m inner join movie_genre mg on m.id=mg.movie "
-                            "inner join genre g on g.id=mg.genre inner join movie_actor ma on m.id=ma.movie inner join member mb on mb.id = ma.actor inner join actor_movie_role amr on amr.actor = mb.id "
-                            "inner join role r on amr.role=r.id where runtime>= 90 and mb.id in (select actor from role r inner join actor_movie_role amr on amr.role = r.id group by actor having count(amr.role)=1)")
+    def insert_table(self, chunks=16, workers=4):
+        '''
+        Fill the normalization table in movie id range chunks, each inserted and recorded as done in
+        Normalization_Progress in one transaction, several at a time on pooled connections. Run again after a
+        failure, it only inserts the chunks that are not done yet.
+        :param chunks: number of movie id ranges
+        :param workers: chunks inserted at the same time
+        :return: report of loadscheduler.StageScheduler.run, None if every chunk was already done
+        '''
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS Normalization_Progress(chunk INT, first_movie VARCHAR(20), "
+                            "last_movie VARCHAR(20), rows BIGINT, seconds float, done BOOLEAN, PRIMARY KEY(chunk))")
+        self.cursor.execute("SELECT count(*) FROM Normalization_Progress")
+        if self.cursor.fetchone()[0] == 0:
+            self.cursor.execute("INSERT INTO Normalization_Progress SELECT chunk, min(id), max(id), 0, 0, false FROM "
+                                "(SELECT id, ntile(%s) OVER (ORDER BY id) AS chunk FROM movie WHERE runtime>= 90) AS c "
+                                "GROUP BY chunk", (chunks,))
+        self.cursor.execute("SELECT chunk, first_movie, last_movie FROM Normalization_Progress WHERE NOT done "
+                            "ORDER BY chunk")
+        pending = self.cursor.fetchall()
+        self.cursor.execute("SELECT count(*) FROM Normalization_Progress")
+        total = self.cursor.fetchone()[0]
+        if not pending:
+            print("all %d chunks of normalization are done" % total)
+            return None
+
+        # the actors with exactly one role, computed once for all pending chunks; not temporary so every connection
+        # sees it. It is rebuilt on every run and logged: after a crash an unlogged table comes back empty, and the
+        # chunks resumed against it would insert nothing and still be marked done.
+        self.cursor.execute("DROP TABLE IF EXISTS Single_Role_Actor")
+        self.cursor.execute("CREATE TABLE Single_Role_Actor AS SELECT actor FROM role r "
+                            "inner join actor_movie_role amr on amr.role = r.id group by actor having count(amr.role)=1")
+        self.cursor.execute("ANALYZE Single_Role_Actor")
+
+        done = [total - len(pending)]
+        lock = threading.Lock()
+
+        def insert_chunk(chunk, first_movie, last_movie):
+            def run(cursor):
+                start_time = time.time()
+                cursor.execute("BEGIN")
+                try:
+                    cursor.execute("insert into normalization(movieId, type, startyear, runtime, avgrating, genreid, genre, memberid, birthyear,role) "
+                                   "select m.id, m.type, m.startyear, m.runtime, m.avgrating, g.id, mg.genre, mb.id, mb.birthyear, amr.role from movie m inner join movie_genre mg on m.id=mg.movie "
+                                   "inner join genre g on g.id=mg.genre inner join movie_actor ma on m.id=ma.movie inner join member mb on mb.id = ma.actor inner join actor_movie_role amr on amr.actor = mb.id "
+                                   "inner join role r on amr.role=r.id where runtime>= 90 and mb.id in (select actor from Single_Role_Actor) "
+                                   "and m.id between %s and %s", (first_movie, last_movie))
+                    rows = cursor.rowcount
+                    seconds = time.time() - start_time
+                    cursor.execute("UPDATE Normalization_Progress SET rows = %s, seconds = %s, done = true "
+                                   "WHERE chunk = %s", (rows, seconds, chunk))
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                with lock:
+                    done[0] += 1
+                    print("chunk %d (%s - %s): %d rows in %.1f seconds, %.0f rows/s, %d of %d chunks done" %
+                          (chunk, first_movie, last_movie, rows, seconds, rows / seconds if seconds else 0,
+                           done[0], total))
+            return run
+
+        scheduler = StageScheduler([Stage('chunk_%d' % chunk, insert_chunk(chunk, first_movie, last_movie))
+                                    for chunk, first_movie, last_movie in pending])
+        report = scheduler.run(self.pool, workers)
+        self.cursor.execute("DROP TABLE Single_Role_Actor")
+        self.cursor.execute("SELECT sum(rows), sum(seconds) FROM Normalization_Progress")
+        rows, seconds = self.cursor.fetchone()
+        print("--- normalization: %d rows in %s seconds, %s chunk seconds ---" % (rows, report['seconds'], seconds))
+        return report
+
+    def table_columns(self, table, exclude=(ID_COLUMN,)):
+        '''
+        Column names of a table, for profiling all of them
+        :param table: table name
+        :param exclude: columns to leave out
+        :return: list of column names in table order
+        '''
+        self.cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = lower(%s) "
+                            "ORDER BY ordinal_position", (table,))
+        return [row[0] for row in self.cursor.fetchall() if row[0] not in exclude]
 
-    def func_depd_naive(self):
+    def extract_columns(self, columns, where=None, snapshot_path=None, table=TABLE, id_column=ID_COLUMN,
+                        check_stale=False):
+        '''
+        Stream a table once and dictionary-encode the given columns into int arrays
+        :param columns: column names
+        :param where: optional SQL condition restricting the rows
+        :param snapshot_path: snapshot file to map instead if it exists, or to write the extracted columns to.
+                              An existing snapshot has to come from the same table, columns, condition and id
+                              column; it is opened with snapshot.load, without a query.
+        :param table: table to read
+        :param id_column: integer column identifying the rows, None if the table has none
+        :param check_stale: also reject an existing snapshot that has not as many rows and the same highest id
+                            as the table has now; a change that keeps both is not noticed
+        :return: encoding.EncodedRelation
+        '''
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            relation = snapshot.load(snapshot_path, columns, {'table': table, 'where': where, 'id_column': id_column})
+            if check_stale:
+                self.cursor.execute("SELECT count(*)" + (", max(" + id_column + ")" if id_column else "") +
+                                    " FROM " + table + (" WHERE " + where if where else ""))
+                registry.inc('fd_queries')
+                current = tuple(self.cursor.fetchone())
+                # rows are extracted in id order, so the last one has the highest id
+                held = (relation.num_rows,) + ((relation.row_ids[-1] if relation.num_rows else None,) if id_column
+                                               else ())
+                if current != held:
+                    raise ValueError("snapshot %s is stale: it holds %s rows and highest id, the table %s; delete it "
+                                     "to extract again" % (snapshot_path, held, current))
+            return relation
+
+        relation = encoding.extract(self.cursor, table, columns, id_column, where)
+        registry.inc('fd_queries')
+        if snapshot_path is not None:
+            snapshot.write(relation, snapshot_path)
+        return relation
+
+    def func_depd_naive(self, table=TABLE, columns=COLUMNS):
         '''
         function for determining functional dependencies using the naive approach.
+        :param table: table to look at
+        :param columns: columns to look at
         :return: None
         '''
 
-        input = ['movieid', 'type', 'startyear', 'runtime', 'avgrating', 'genreid', 'genre', 'memberid', 'birthyear', 'role']
+        input = list(columns)
 
         output = sum([list(map(list, combinations(input, i))) for i in range(len(input) + 1)], [])
 
@@ -60,8 +184,10 @@ class DatabaseConnection:
 
         for left_column in output:
             for right_column in input:
-                query="SELECT count(DISTINCT " + str(right_column) + " ) from normalization GROUP BY " + str(left_column) +" HAVING COUNT(DISTINCT " + str(right_column) +" ) > 1"
+                query="SELECT count(DISTINCT " + str(right_column) + " ) from " + table + " GROUP BY " + str(left_column) +" HAVING COUNT(DISTINCT " + str(right_column) +" ) > 1"
                 self.cursor.execute(query)
+                registry.inc('fd_queries')
+                registry.inc('fd_candidates_checked', level=left_column.count(',') + 1)
                 row = self.cursor.fetchone()
                 if row is None:
                     fd=str(left_column) + "-->" + str(right_column)
@@ -71,13 +197,157 @@ class DatabaseConnection:
 
 
 
-    def func_depd_pruning(self):
+    def check_fds(self, candidates, table=TABLE, sets_per_query=64):
+        '''
+        Validate many candidate dependencies inside Postgres with few statements. Each statement groups by up
+        to sets_per_query LHSs, with at most MAX_GROUPING_ARGUMENTS columns between them, at once with GROUPING
+        SETS and computes one COUNT(DISTINCT) per RHS column, so all RHSs of all LHSs in the batch are checked
+        in a single scan.
+        :param candidates: list of (lhs column tuple, list of rhs columns)
+        :param table: table or sample to check against
+        :param sets_per_query: number of LHS groupings per statement
+        :return: set of (lhs column tuple, rhs column) that hold
+        '''
+        batches = [[]]
+        lhs_columns = set()
+        for lhs, rhs in candidates:
+            # GROUPING() is passed all LHS columns of the batch
+            if batches[-1] and (len(batches[-1]) == sets_per_query or
+                                len(lhs_columns | set(lhs)) > MAX_GROUPING_ARGUMENTS):
+                batches.append([])
+                lhs_columns = set()
+            batches[-1].append((lhs, rhs))
+            lhs_columns |= set(lhs)
+
+        holding = set()
+        for batch in batches:
+            if not batch:
+                continue
+            lhs_columns = sorted({column for lhs, rhs in batch for column in lhs})
+            rhs_columns = sorted({column for lhs, rhs in batch for column in rhs})
+
+            # a single LHS is the only grouping, wider than GROUPING() allows or not
+            gid = "GROUPING(" + ', '.join(lhs_columns) + ")" if len(batch) > 1 else "0"
+            counts = ', '.join("count(DISTINCT " + column + ") AS c" + str(i) for i, column in enumerate(rhs_columns))
+            query = "SELECT gid, " + ', '.join("max(c" + str(i) + ")" for i in range(len(rhs_columns))) + \
+                    " FROM (SELECT " + gid + " AS gid, " + counts + " FROM " + table + " GROUP BY GROUPING SETS (" + \
+                    ', '.join("(" + ', '.join(lhs) + ")" for lhs, rhs in batch) + ")) AS grouped GROUP BY gid"
+            self.cursor.execute(query)
+            registry.inc('fd_queries')
+            for lhs, rhs in batch:
+                registry.inc('fd_candidates_checked', len(rhs), level=len(lhs))
+
+            # GROUPING() sets the bit of every argument that is not grouped on, last argument lowest
+            maxima = {}
+            for row in self.cursor.fetchall():
+                grouped = tuple(column for i, column in enumerate(lhs_columns)
+                                if not row[0] >> (len(lhs_columns) - 1 - i) & 1)
+                maxima[grouped] = row[1:]
+
+            for lhs, rhs in batch:
+                row = maxima.get(tuple(sorted(lhs)))
+                for column in rhs:
+                    # no groups at all means an empty table, where every dependency holds
+                    if row is None or row[rhs_columns.index(column)] <= 1:
+                        holding.add((lhs, column))
+        return holding
+
+    def func_depd_batched(self, sets_per_query=64, table=TABLE, columns=COLUMNS):
+        '''
+        function for determining functional dependencies like func_depd_naive, but with all RHS columns of many
+        LHSs checked per statement instead of one query per (LHS, RHS) pair.
+        :param sets_per_query: number of LHS groupings per statement
+        :param table: table to look at
+        :param columns: columns to look at
+        :return: None
+        '''
+
+        input = list(columns)
+
+        output = sum([list(map(tuple, combinations(input, i))) for i in range(len(input) + 1)], [])
+
+        output.pop(0) #deleting the empty set
+
+        holding = self.check_fds([(left_column, input) for left_column in output], table, sets_per_query)
+
+        func_dep=[]
+
+        for left_column in output:
+            for right_column in input:
+                if (left_column, right_column) in holding:
+                    fd=', '.join(left_column) + "-->" + str(right_column)
+                    func_dep.append(fd)
+
+        print(func_dep)
+
+    def func_depd_sampled(self, sample_percent=1.0, stratify=None, per_stratum=2, sets_per_query=64, table=TABLE,
+                          columns=COLUMNS):
+        '''
+        function for determining functional dependencies in two phases. Every candidate is first checked on a
+        sample, which can only refute it; the survivors are then verified on the whole table, so the result
+        is exact and the same as func_depd_naive.
+        :param sample_percent: percentage of rows in a random sample
+        :param stratify: column to sample per value of instead, keeping up to per_stratum random rows of each
+        :param per_stratum: rows per value of the stratify column
+        :param sets_per_query: number of LHS groupings per statement
+        :param table: table to look at
+        :param columns: columns to look at
+        :return: None
+        '''
+
+        input = list(columns)
+
+        output = sum([list(map(tuple, combinations(input, i))) for i in range(len(input) + 1)], [])
+
+        output.pop(0) #deleting the empty set
+
+        # qualified with pg_temp so that neither statement can touch a permanent table of that name
+        sample = "pg_temp." + table.split('.')[-1] + "_sample"
+        self.cursor.execute("DROP TABLE IF EXISTS " + sample)
+        if stratify is None:
+            self.cursor.execute("CREATE TEMPORARY TABLE " + sample + " AS SELECT * FROM " + table + " "
+                                "TABLESAMPLE BERNOULLI (%s)", (sample_percent,))
+        else:
+            self.cursor.execute("CREATE TEMPORARY TABLE " + sample + " AS SELECT * FROM "
+                                "(SELECT *, row_number() OVER (PARTITION BY " + stratify + " ORDER BY random()) AS rn "
+                                "FROM " + table + ") AS numbered WHERE rn <= %s", (per_stratum,))
+
+        sampled = self.check_fds([(left_column, input) for left_column in output], sample, sets_per_query)
+        self.cursor.execute("DROP TABLE " + sample)
+
+        survivors = []
+        for left_column in output:
+            right_columns = [right_column for right_column in input if (left_column, right_column) in sampled]
+            if right_columns:
+                survivors.append((left_column, right_columns))
+
+        holding = self.check_fds(survivors, table, sets_per_query)
+
+        func_dep=[]
+
+        for left_column in output:
+            for right_column in input:
+                if (left_column, right_column) in holding:
+                    fd=', '.join(left_column) + "-->" + str(right_column)
+                    func_dep.append(fd)
+
+        print(func_dep)
+        print("%d of %d candidates refuted on the sample, %d verified on the full table, %d hold"
+              % (len(output) * len(input) - len(sampled), len(output) * len(input), len(sampled), len(holding)))
+
+    def func_depd_pruning(self, snapshot_path=None, table=TABLE, columns=COLUMNS, id_column=ID_COLUMN):
         '''
-                function for determining functional dependencies using the naive approach.
+                function for determining functional dependencies with at most two LHS columns, pruned: the
+                partitions of the one- and two-column LHSs are built once, each LHS is checked against every RHS
+                in one pass over its classes, and a dependency is dropped when a subset of its LHS already
+                determines the same RHS.
+                :param snapshot_path: columnar snapshot to run on instead of the database, written first if missing
+                :param table: table to look at
+                :param columns: columns to look at
+                :param id_column: integer column identifying the rows, None if the table has none
                 :return: None
                 '''
-        input = ['movieid', 'type', 'startyear', 'runtime', 'avgrating', 'genreid', 'genre', 'memberid', 'birthyear',
-                 'role']
+        input = list(columns)
 
         output = sum([list(map(list, combinations(input, i))) for i in range(3)], [])
 
@@ -86,56 +356,202 @@ class DatabaseConnection:
         concat_list = [', '.join(sub_list) for sub_list in output]
 
 
-        table_list=[]
-        table_dict={}
+        relation = self.extract_columns(input, snapshot_path=snapshot_path, table=table, id_column=id_column)
+        cache = PartitionCache(relation.columns)
 
-        for column in concat_list:
-            column_list = []
-            query = "SELECT array_agg(nid) FROM normalization GROUP BY "+ column +" order by " + column
-            self.cursor.execute(query)
-            arrays = self.cursor.fetchall()
-            for array in arrays:
-                array=str(array)
-                array = array.strip('()[],')
-                column_list.append(array.translate('()[]').split(', '))
-            table_list.append(column_list)
+        func_depd=[]
+        # LHS bitmasks found so far per RHS: a dependency is only kept if no subset of its LHS is there
+        found = {}
+
+        # two-column partitions are products of the one-column ones. Stripped partitions are enough:
+        # a single-row class is always contained in some class of the right hand side.
+        for left_col in concat_list:
+            left_mask = 0
+            for col in left_col.split(', '):
+                left_mask |= 1 << input.index(col)
+            partition = cache.get(left_mask)
+            for right, right_col in enumerate(input):
+                if left_mask >> right & 1:
+                    continue
+                # the codes of a column are the class ids of its partition, so one pass over the LHS classes
+                # checks that each lies inside a single RHS class
+                if partition.refines(relation.columns[right]):
+                    lhs_found = found.setdefault(right_col, [])
+                    if not any(known & left_mask == known for known in lhs_found):
+                        lhs_found.append(left_mask)
+                        func_depd.append(left_col + "-->"+ right_col)
+
+        stats = cache.stats()
+        registry.set('partitions_built', stats['misses'])
+        for name, value in stats.items():
+            registry.set('partition_cache_' + name, value)
 
+        print(func_depd)
 
-        table_dict.clear()
+    def func_depd_tane(self, workers=None, cache_bytes=None, max_error=None, state_path=None, snapshot_path=None,
+                       table=TABLE, columns=COLUMNS, id_column=ID_COLUMN):
+        '''
+        function for determining all minimal functional dependencies with the level-wise partition search in tane.py.
+        The relation is read once; no query is issued per candidate.
+        :param workers: number of worker processes checking candidates in parallel, None to run in this process
+        :param cache_bytes: byte budget of the partition cache, or of the partitions the workers keep in shared
+                            memory, None for no limit
+        :param max_error: report approximate dependencies that hold after removing at most this fraction of rows
+        :param state_path: file to save the discovery state to, for func_depd_incremental; exact search only
+        :param snapshot_path: columnar snapshot to run on instead of the database, written first if missing
+        :param table: table to look at
+        :param columns: columns to look at
+        :param id_column: integer column identifying the rows, None if the table has none
+        :return: None
+        '''
+        if state_path is not None and max_error is not None:
+            raise ValueError("the discovery state is only kept for exact dependencies")
+        input = list(columns)
 
+        relation = self.extract_columns(input, snapshot_path=snapshot_path, table=table, id_column=id_column)
 
-        for i in range(0,len(concat_list)):
-            table_dict[concat_list[i]] = table_list[i]
+        if workers is None:
+            tane = Tane(relation.columns, cache_bytes, max_error)
+        elif max_error is not None:
+            raise ValueError("approximate dependencies are only searched in this process")
+        else:
+            tane = ParallelTane(relation.columns, workers, cache_bytes=cache_bytes)
 
-        func_depd=[]
+        fds = tane.run()
+        func_depd = format_fds(fds, input)
+
+        print(func_depd)
+        print("partition cache: %s" % tane.cache.stats())
+
+        if state_path is not None:
+            FDState(relation, fds).save(state_path)
+
+    def func_depd_sql(self, table=TABLE, columns=COLUMNS, where=None, sets_per_table=200):
+        '''
+        function for determining all minimal functional dependencies with func_depd_tane's search, run inside
+        the database: partitions are class id columns of temporary tables and no row leaves the server.
+        :param table: table to look at
+        :param columns: columns to look at
+        :param where: optional SQL condition restricting the rows
+        :param sets_per_table: class id columns per temporary table
+        :return: None
+        '''
+        input = list(columns)
+
+        tane = SqlTane(self.cursor, table, input, where, sets_per_table)
+        func_depd = format_fds(tane.run(), input)
+
+        print(func_depd)
+        print("class id columns built: %d" % tane.cache.built)
 
-        for left_col in table_dict.keys():
-            for right_col in input:
-                count=0
-                lolleft=table_dict[left_col]
-                lolright=table_dict[right_col]
-                for left_list in lolleft:
-                    for right_list in lolright:
-                        if set(left_list) <= set(right_list):
-                            count+=1
-                            break
-                        else:
-                            continue
-                if count == len(lolleft):
-                    leftcollist=left_col.split(", ")
-                    someflag=True
-                    for col in leftcollist:
-                        if col.strip(" ") != right_col.strip(" "):
-                            continue
-                        else:
-                            someflag=False
-                    if someflag:
-                        word = "-->" + str(right_col)
-                        if not b_any(word in x for x in func_depd):
-                            func_depd.append(left_col + "-->"+ right_col)
+    def func_depd_hyfd(self, cache_bytes=None, max_lhs=None, snapshot_path=None, table=TABLE, columns=COLUMNS,
+                       id_column=ID_COLUMN):
+        '''
+        function for determining all minimal functional dependencies with the hybrid search in hyfd.py, which
+        scales to wider tables than func_depd_tane. The relation is read once.
+        :param cache_bytes: byte budget of the partition cache, None for no limit
+        :param max_lhs: only report dependencies with at most this many LHS columns, None for all
+        :param snapshot_path: columnar snapshot to run on instead of the database, written first if missing
+        :param table: table to look at
+        :param columns: columns to look at, None for all columns of the table but id_column
+        :param id_column: integer column identifying the rows, None if the table has none
+        :return: list of dependencies as strings
+        '''
+        input = list(columns) if columns is not None else self.table_columns(table, (id_column,))
 
+        relation = self.extract_columns(input, snapshot_path=snapshot_path, table=table, id_column=id_column)
+        hyfd = HyFD(relation.columns, cache_bytes, max_lhs)
+        func_depd = format_fds(hyfd.run(), input)
 
         print(func_depd)
+        print("%d non-FDs, partition cache: %s" % (len(hyfd.non_fds), hyfd.cache.stats()))
+        return func_depd
+
+    def profile_staging(self, path, name, cache_bytes=None, max_lhs=None):
+        '''
+        function for determining the functional dependencies of a raw IMDB file, loaded into a temporary staging
+        table the way postgresimdb.py loads it.
+        :param path: directory of the files, e.g. C:/users/files/
+        :param name: file name without extension, a key of STAGING
+        :param cache_bytes: byte budget of the partition cache, None for no limit
+        :param max_lhs: only report dependencies with at most this many LHS columns, None for all
+        :return: list of dependencies as strings
+        '''
+        columns = STAGING[name]
+        staging = "staging_" + name.replace('.', '_')
+        self.cursor.execute("DROP TABLE IF EXISTS " + staging)
+        self.cursor.execute("CREATE TEMPORARY TABLE " + staging + "(" +
+                            ', '.join(column + " VARCHAR" for column in columns) + ")")
+        copy_gzip(self.cursor, str(path) + name + '.tsv.gz', staging, columns)
+        try:
+            return self.func_depd_hyfd(cache_bytes, max_lhs, table=staging,
+                                       columns=[column.lower() for column in columns], id_column=None)
+        finally:
+            self.cursor.execute("DROP TABLE " + staging)
+
+    def decompose(self, snapshot_path=None, max_keys=100, table=TABLE, columns=COLUMNS, id_column=ID_COLUMN):
+        '''
+        function for normalizing the normalization table: minimal cover, candidate keys, and lossless 3NF and BCNF
+        decompositions of the exact dependencies found by func_depd_tane's search.
+        :param snapshot_path: columnar snapshot to run on instead of the database, written first if missing
+        :param max_keys: most candidate keys to list
+        :param table: table to normalize
+        :param columns: columns to look at
+        :param id_column: integer column identifying the rows, None if the table has none
+        :return: dict with the cover, keys, 3NF relations and BCNF relations as strings
+        '''
+        input = list(columns)
+
+        relation = self.extract_columns(input, snapshot_path=snapshot_path, table=table, id_column=id_column)
+        fds = Tane(relation.columns).run()
+
+        cover = fdalgebra.minimal_cover(fds, len(input))
+        keys = fdalgebra.candidate_keys(cover, len(input), max_keys)
+        third = fdalgebra.synthesize_3nf(cover, len(input))
+        bcnf = fdalgebra.decompose_bcnf(cover, len(input))
+
+        result = {
+            'cover': format_fds(cover, input),
+            'keys': fdalgebra.format_relations(keys, input),
+            '3nf': fdalgebra.format_relations([mask for mask, key in third], input),
+            'bcnf': fdalgebra.format_relations(bcnf, input),
+        }
+        print("%d dependencies, minimal cover of %d: %s" % (len(fds), len(cover), result['cover']))
+        print("candidate keys: %s" % result['keys'])
+        print("3NF: %s" % result['3nf'])
+        print("BCNF: %s" % result['bcnf'])
+        return result
+
+    def func_depd_incremental(self, state_path, table=TABLE, id_column=ID_COLUMN):
+        '''
+        function for bringing the dependencies saved by func_depd_tane up to date after rows were appended to
+        the table. Only rows above the saved id high-water mark are read, with the condition the state was
+        extracted with.
+        :param state_path: file with the saved discovery state; updated in place
+        :param table: table the state was discovered on
+        :param id_column: integer column identifying the rows
+        :return: None
+        '''
+        state = FDState.load(state_path)
+        input = state.relation.names
+        source = state.relation.source or {}
+        if (source.get('table'), source.get('id_column')) != (table, id_column):
+            raise ValueError("state %s was discovered on %s, not on table %s with id column %s"
+                             % (state_path, source, table, id_column))
+        where = id_column + " > %d" % state.high_water
+        if source.get('where'):
+            where += " AND (" + source['where'] + ")"
+
+        first_row = state.relation.num_rows
+        encoding.extract(self.cursor, table, input, id_column, where, state.relation)
+        registry.inc('fd_queries')
+        violated, added = state.update(first_row)
+        state.save(state_path)
+
+        print("%d new rows" % (state.relation.num_rows - first_row))
+        print("no longer hold: %s" % format_fds(violated, input))
+        print("new minimal dependencies: %s" % format_fds(added, input))
+        print(format_fds(state.fds, input))
 
 
 
@@ -153,11 +569,35 @@ if __name__ == '__main__':
     # database_connection.insert_table()
     print("insertion complete.. now determining functional dependencies..")
     start_time=time.time()
-    database_connection.func_depd_naive()
+    with registry.stage('naive'):
+        database_connection.func_depd_naive()
     print("--- %s seconds  for naive ---" % (time.time() - start_time))
 
     st=time.time()
-    database_connection.func_depd_pruning()
+    with registry.stage('batched'):
+        database_connection.func_depd_batched()
+    print("--- %s seconds  for batched ---" % (time.time() - st))
+
+    st=time.time()
+    with registry.stage('pruning'):
+        database_connection.func_depd_pruning()
     print("--- %s seconds  for pruning---" % (time.time() - st))
 
+    st=time.time()
+    with registry.stage('tane'):
+        database_connection.func_depd_tane()
+    print("--- %s seconds  for tane---" % (time.time() - st))
+
+    st=time.time()
+    with registry.stage('sql'):
+        database_connection.func_depd_sql()
+    print("--- %s seconds  for sql---" % (time.time() - st))
+
+    st=time.time()
+    with registry.stage('hyfd'):
+        database_connection.func_depd_hyfd()
+    print("--- %s seconds  for hyfd---" % (time.time() - st))
+
+    registry.export(os.environ.get('METRICS_DIR', '.'), 'normalization')
+
 
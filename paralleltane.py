@@ -0,0 +1,307 @@
+'''
+Process-pool version of the TANE search in tane.py.
+
+The encoded columns are copied once into a shared memory block that every worker maps. Each lattice level
+is split into batches of attribute sets. A worker computes the stripped partition of a set, as its rows in
+classes of more than one row with their class ids, from the stripped partitions of the two sets of the
+previous level it was generated from, looking only at the rows in those, however many attributes the set
+has. It writes the partitions of its batch into a shared memory block of its own, whose name it returns.
+The main process keeps track of those blocks like tane.py's partition cache keeps partitions, and frees a
+block once all of its sets are discarded. A set whose partition does not fit in the byte budget is not
+stored, and a child of it is computed from the columns instead. The main process only runs the pruning
+logic, in sorted order, so the result does not depend on the number of workers.
+'''
+
+import operator
+import os
+from array import array
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import compress, count
+from multiprocessing import shared_memory
+
+from tane import Tane
+
+
+_shared = None
+_columns = None
+_num_rows = 0
+# partition blocks mapped by this worker, by name
+_blocks = {}
+
+
+def _attach(name, num_attributes, num_rows):
+    '''
+    Worker initializer: map the shared columns
+    '''
+    global _shared, _columns, _num_rows
+    _shared = shared_memory.SharedMemory(name=name)
+    view = _shared.buf[:num_attributes * num_rows * 4].cast('i')
+    _columns = [view[a * num_rows:(a + 1) * num_rows] for a in range(num_attributes)]
+    _num_rows = num_rows
+
+
+def _map(name, keep):
+    '''
+    Map a partition block, and unmap the ones the main process has freed
+    :param name: name of the block
+    :param keep: names of the blocks still in use
+    :return: int memoryview of the block
+    '''
+    for old in [old for old in _blocks if old not in keep]:
+        block, view = _blocks.pop(old)
+        view.release()
+        block.close()
+    if name not in _blocks:
+        block = shared_memory.SharedMemory(name=name)
+        _blocks[name] = (block, block.buf.cast('i'))
+    return _blocks[name][1]
+
+
+def _read(location, keep):
+    '''
+    :param location: (block name, offset, number of rows) of a stored partition
+    :return: (rows in classes of more than one row, class id of each of them)
+    '''
+    name, offset, size = location
+    if not size:
+        return array('i'), array('i')
+    view = _map(name, keep)
+    return view[offset:offset + size], view[offset + size:offset + 2 * size]
+
+
+def _keys(positions):
+    '''
+    Value combination of an attribute set for every row
+    '''
+    if len(positions) == 1:
+        return _columns[positions[0]]
+    if not positions:
+        return [0] * _num_rows
+    return list(zip(*[_columns[a] for a in positions]))
+
+
+def _strip(rows, keys):
+    '''
+    Stripped partition of rows by a key per row
+    :param rows: rows that may share a class with another row; every other row is a class of its own
+    :param keys: hashable value of every row in rows, equal exactly for rows of the same class
+    :return: (array of rows in classes of more than one row, array of their class ids, error)
+    '''
+    counts = Counter(keys)
+    shared = list(map((1).__lt__, map(counts.__getitem__, keys)))
+    keys = list(compress(keys, shared))
+    ids = dict(zip(dict.fromkeys(keys), count()))
+    stripped = array('i', compress(rows, shared))
+    return stripped, array('i', map(ids.__getitem__, keys)), len(stripped) - len(ids)
+
+
+def _evaluate(tasks, keep):
+    '''
+    Stripped partitions and errors of a batch of attribute sets of one level
+    :param tasks: list of (column positions, left parent location, right parent location, whether to store the
+                  partition); a set without both parent locations is computed from its columns
+    :param keep: names of the blocks the main process still uses
+    :return: list of (error, location of the stored partition or None)
+    '''
+    n = _num_rows
+    width = 2 * n
+    results = []
+    for positions, left, right, store in tasks:
+        if left is not None and right is not None:
+            left_rows, left_ids = _read(left, keep)
+            right_rows, right_ids = _read(right, keep)
+            if len(right_rows) < len(left_rows):
+                left_rows, left_ids, right_rows, right_ids = right_rows, right_ids, left_rows, left_ids
+            # only rows in classes of both parents can share a class in the product; a row that is alone in the
+            # larger parent gets an id of its own there, n + row, above every class id
+            lookup = dict(zip(right_rows, right_ids))
+            keys = list(map(operator.add, map(width.__mul__, left_ids),
+                            map(lookup.get, left_rows, map(n.__add__, left_rows))))
+            rows = left_rows
+        else:
+            rows, keys = range(n), _keys(positions)
+        stripped, ids, error = _strip(rows, keys)
+        results.append((error, (stripped, ids) if store else None))
+
+    size = sum(2 * len(stored[0]) for error, stored in results if stored is not None)
+    if not size:
+        return [(error, None if stored is None else (None, 0, 0)) for error, stored in results]
+    block = shared_memory.SharedMemory(create=True, size=size * 4)
+    view = block.buf.cast('i')
+    offset = 0
+    located = []
+    for error, stored in results:
+        if stored is None:
+            located.append((error, None))
+            continue
+        stripped, ids = stored
+        view[offset:offset + len(stripped)] = stripped
+        view[offset + len(stripped):offset + 2 * len(stripped)] = ids
+        located.append((error, (block.name, offset, len(stripped))))
+        offset += 2 * len(stripped)
+    view.release()
+    block.close()
+    return located
+
+
+def _determines(positions, location, rhs, keep):
+    '''
+    Check that every class of an attribute set agrees on a column
+    :param positions: column positions of the attribute set
+    :param location: location of its stored partition, None to compute it from the columns
+    :param rhs: column position
+    :return: bool
+    '''
+    column = _columns[rhs]
+    if location is not None:
+        rows, ids = _read(location, keep)
+    else:
+        rows, ids, error = _strip(range(_num_rows), _keys(positions))
+    seen = {}
+    for row, class_id in zip(rows, ids):
+        value = column[row]
+        if seen.setdefault(class_id, value) != value:
+            return False
+    return True
+
+
+class SharedPartitions:
+    '''
+    Where the stripped partition of every attribute set is, in the place of the partition cache of tane.py.
+    A block is freed once all of its sets are discarded.
+    '''
+
+    def __init__(self, budget=None):
+        '''
+        :param budget: maximum bytes of partitions to keep in shared memory, None for no limit
+        '''
+        self.budget = budget
+        self.nbytes = 0
+        self.locations = {}
+        self.blocks = {}
+        self.built = 0
+        self.unstored = 0
+
+    def fits(self, nbytes):
+        return self.budget is None or self.nbytes + nbytes <= self.budget
+
+    def put(self, mask, location):
+        '''
+        :param location: (block name, offset, number of rows); a block name of None for a partition without rows
+        '''
+        self.locations[mask] = location
+        if location[0] is not None:
+            self.blocks.setdefault(location[0], set()).add(mask)
+            self.nbytes += 8 * location[2]
+
+    def discard(self, mask):
+        location = self.locations.pop(mask, None)
+        if location is None or location[0] is None:
+            return
+        self.nbytes -= 8 * location[2]
+        masks = self.blocks[location[0]]
+        masks.discard(mask)
+        if not masks:
+            del self.blocks[location[0]]
+            self._unlink(location[0])
+
+    def stats(self):
+        return {'partitions': len(self.locations), 'bytes': self.nbytes, 'blocks': len(self.blocks),
+                'misses': self.built, 'unstored': self.unstored}
+
+    def close(self):
+        for name in self.blocks:
+            self._unlink(name)
+        self.blocks.clear()
+        self.locations.clear()
+        self.nbytes = 0
+
+    @staticmethod
+    def _unlink(name):
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
+
+
+class ParallelTane(Tane):
+    '''
+    TANE with the candidate checks of every level spread over a pool of processes.
+    '''
+
+    def __init__(self, columns, workers=None, batch_size=32, cache_bytes=None):
+        '''
+        :param columns: one int array per attribute, e.g. EncodedRelation.columns
+        :param workers: number of worker processes, os.cpu_count() by default
+        :param batch_size: attribute sets per task
+        :param cache_bytes: byte budget of the partitions kept in shared memory, None for no limit
+        '''
+        Tane.__init__(self, columns, cache=SharedPartitions(cache_bytes))
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self._pool = None
+
+    def evaluate(self, candidates, prev_level):
+        masks = sorted(candidates)
+        batches = [masks[i:i + self.batch_size] for i in range(0, len(masks), self.batch_size)]
+        errors = {}
+        # bytes promised to the batches that are running, so that their partitions fit in the budget together
+        reserved = 0
+        running = {}
+        while batches or running:
+            # a few batches per worker keep the pool busy while the budget is still checked against results
+            while batches and len(running) < 2 * self.workers:
+                batch = batches.pop(0)
+                tasks = []
+                bound = 0
+                for mask in batch:
+                    parents = candidates[mask]
+                    left, right = parents if parents else (None, None)
+                    left, right = self.cache.locations.get(left), self.cache.locations.get(right)
+                    # a product has at most the rows of the smaller parent
+                    rows = min(left[2], right[2]) if left and right else self.num_rows
+                    store = self.cache.fits(reserved + bound + 8 * rows)
+                    if store:
+                        bound += 8 * rows
+                    else:
+                        self.cache.unstored += 1
+                    tasks.append(([a for a in range(self.num_attributes) if mask >> a & 1], left, right, store))
+                reserved += bound
+                future = self._pool.submit(_evaluate, tasks, self._live())
+                running[future] = (batch, bound)
+
+            for future in wait(running, return_when=FIRST_COMPLETED).done:
+                batch, bound = running.pop(future)
+                reserved -= bound
+                for mask, (error, location) in zip(batch, future.result()):
+                    errors[mask] = error
+                    if location is not None:
+                        self.cache.put(mask, location)
+                self.cache.built += len(batch)
+        return dict.fromkeys(masks), errors
+
+    def determines(self, lhs, rhs, prev_level):
+        positions = [a for a in range(self.num_attributes) if lhs >> a & 1]
+        return self._pool.submit(_determines, positions, self.cache.locations.get(lhs), rhs.bit_length() - 1,
+                                 self._live()).result()
+
+    def run(self):
+        size = self.num_attributes * self.num_rows * 4
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            view = block.buf[:size].cast('i')
+            for a, column in enumerate(self.columns):
+                view[a * self.num_rows:(a + 1) * self.num_rows] = memoryview(column)
+            view.release()
+
+            with ProcessPoolExecutor(self.workers, initializer=_attach,
+                                     initargs=(block.name, self.num_attributes, self.num_rows)) as self._pool:
+                return Tane.run(self)
+        finally:
+            self._pool = None
+            self.cache.close()
+            block.close()
+            block.unlink()
+
+    def _live(self):
+        return set(self.cache.blocks)
@@ -0,0 +1,275 @@
+'''
+Stripped partitions of a relation, used by the level-wise functional dependency search in tane.py.
+
+A partition groups the rows of a relation into equivalence classes of rows that agree on an attribute set.
+A stripped partition keeps only the classes with two or more rows, which is all the search needs.
+Attribute sets are int bitmasks over the column positions: bit i set means column i is in the set.
+'''
+
+from array import array
+from collections import OrderedDict
+
+
+def bits(mask):
+    '''
+    Split an attribute set into its single-attribute masks
+    :param mask: attribute set bitmask
+    :return: generator of single-bit masks, lowest first
+    '''
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+class StrippedPartition:
+    '''
+    Stripped partition stored as one flat array of row numbers and an array of class boundaries.
+    Class i is rows[bounds[i]:bounds[i + 1]].
+    '''
+
+    __slots__ = ('rows', 'bounds', 'num_rows')
+
+    def __init__(self, rows, bounds, num_rows):
+        '''
+        :param rows: array of row numbers, grouped class by class
+        :param bounds: array of class start offsets into rows, followed by len(rows)
+        :param num_rows: number of rows in the relation
+        '''
+        self.rows = rows
+        self.bounds = bounds
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_column(cls, column):
+        '''
+        Build the stripped partition of a single column
+        :param column: sequence of hashable values, one per row
+        :return: StrippedPartition
+        '''
+        groups = {}
+        for row, value in enumerate(column):
+            members = groups.get(value)
+            if members is None:
+                groups[value] = [row]
+            else:
+                members.append(row)
+
+        rows = array('i')
+        bounds = array('i', [0])
+        for members in groups.values():
+            if len(members) > 1:
+                rows.extend(members)
+                bounds.append(len(rows))
+        return cls(rows, bounds, len(column))
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def classes(self):
+        '''
+        Iterate over the equivalence classes
+        :return: generator of arrays of row numbers
+        '''
+        rows, bounds = self.rows, self.bounds
+        for i in range(len(bounds) - 1):
+            yield rows[bounds[i]:bounds[i + 1]]
+
+    def error(self):
+        '''
+        Number of rows minus number of classes of the full partition, i.e. e(X) * |r| in the TANE paper.
+        Two attribute sets X and X+A have the same error exactly when X --> A holds.
+        :return: int
+        '''
+        return len(self.rows) - len(self)
+
+    def is_key(self):
+        '''
+        :return: True if no two rows agree on the attribute set, i.e. the attribute set is a superkey
+        '''
+        return len(self.rows) == 0
+
+    def conflict(self, ids):
+        '''
+        Find two rows in one class with different class ids, in a single pass over the rows that stops at the
+        first such pair
+        :param ids: row to class id lookup vector, e.g. a column of codes
+        :return: (row, row), None if every class lies inside a single class of ids
+        '''
+        rows, bounds = self.rows, self.bounds
+        for i in range(len(bounds) - 1):
+            start = bounds[i]
+            first = ids[rows[start]]
+            for k in range(start + 1, bounds[i + 1]):
+                if ids[rows[k]] != first:
+                    return rows[start], rows[k]
+        return None
+
+    def refines(self, ids):
+        '''
+        Check that the partition refines another one given as a lookup vector, i.e. that the attribute set
+        determines the other attribute set
+        :param ids: row to class id lookup vector, e.g. a column of codes
+        :return: bool
+        '''
+        return self.conflict(ids) is None
+
+    def violations(self, column, limit=None):
+        '''
+        Number of rows to remove for the attribute set to determine a column, i.e. g3 * |r|. Within every class
+        all rows but those with the most frequent column value have to go.
+        :param column: sequence of values, one per row, such as a lookup vector
+        :param limit: stop counting as soon as the count exceeds this, None to always count everything
+        :return: int, larger than limit if the count was cut short
+        '''
+        removed = 0
+        rows, bounds = self.rows, self.bounds
+        for i in range(len(bounds) - 1):
+            start, end = bounds[i], bounds[i + 1]
+            first = column[rows[start]]
+            k = start + 1
+            while k < end and column[rows[k]] == first:
+                k += 1
+            if k == end:
+                # the class agrees, as most do: nothing to count
+                continue
+            counts = {first: k - start}
+            for k in range(k, end):
+                value = column[rows[k]]
+                counts[value] = counts.get(value, 0) + 1
+            removed += end - start - max(counts.values())
+            if limit is not None and removed > limit:
+                break
+        return removed
+
+    def product(self, other, table):
+        '''
+        Partition of the union of both attribute sets, computed from the two partitions in linear time.
+        :param other: StrippedPartition of the other attribute set
+        :param table: list of num_rows ints, all -1; used as scratch space and left all -1 again
+        :return: StrippedPartition
+        '''
+        rows, bounds = self.rows, self.bounds
+        for i in range(len(bounds) - 1):
+            for k in range(bounds[i], bounds[i + 1]):
+                table[rows[k]] = i
+
+        new_rows = array('i')
+        new_bounds = array('i', [0])
+        other_rows, other_bounds = other.rows, other.bounds
+        for j in range(len(other_bounds) - 1):
+            groups = {}
+            for k in range(other_bounds[j], other_bounds[j + 1]):
+                row = other_rows[k]
+                i = table[row]
+                if i >= 0:
+                    members = groups.get(i)
+                    if members is None:
+                        groups[i] = [row]
+                    else:
+                        members.append(row)
+            for members in groups.values():
+                if len(members) > 1:
+                    new_rows.extend(members)
+                    new_bounds.append(len(new_rows))
+
+        for row in rows:
+            table[row] = -1
+        return StrippedPartition(new_rows, new_bounds, self.num_rows)
+
+
+class PartitionCache:
+    '''
+    Stripped partitions by attribute set (an int bitmask over column positions), kept within a byte budget.
+    A missing partition of X+Y is derived as the product of the partitions of X and Y rather than rebuilt
+    from the data, and the least recently used partitions are evicted once the budget is exceeded.
+    '''
+
+    def __init__(self, columns, budget=None):
+        '''
+        :param columns: one sequence of values per attribute
+        :param budget: maximum bytes of partition arrays to keep, None for no limit
+        '''
+        self.columns = columns
+        self.budget = budget
+        self.num_rows = len(columns[0]) if columns else 0
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._partitions = OrderedDict()
+        self._table = [-1] * self.num_rows
+
+    @staticmethod
+    def size_of(partition):
+        return len(partition.rows) * partition.rows.itemsize + len(partition.bounds) * partition.bounds.itemsize
+
+    def __contains__(self, mask):
+        return mask in self._partitions
+
+    def get(self, mask, parents=None):
+        '''
+        Partition of an attribute set, from the cache or derived from cached subsets
+        :param mask: attribute set
+        :param parents: optional pair of subsets whose union is mask, preferred for the derivation
+        :return: StrippedPartition
+        '''
+        partition = self._partitions.get(mask)
+        if partition is not None:
+            self.hits += 1
+            self._partitions.move_to_end(mask)
+            return partition
+
+        self.misses += 1
+        if mask & (mask - 1) == 0:
+            partition = StrippedPartition.from_column(self.columns[mask.bit_length() - 1] if mask
+                                                      else [None] * self.num_rows)
+        else:
+            if parents is None:
+                parents = self._split(mask)
+            partition = self.get(parents[0]).product(self.get(parents[1]), self._table)
+        self.put(mask, partition)
+        return partition
+
+    def put(self, mask, partition):
+        '''
+        Add a partition and evict until the cache fits its budget again. The newest partition is never evicted.
+        '''
+        previous = self._partitions.pop(mask, None)
+        if previous is not None:
+            self.nbytes -= self.size_of(previous)
+        self._partitions[mask] = partition
+        self.nbytes += self.size_of(partition)
+        while self.budget is not None and self.nbytes > self.budget and len(self._partitions) > 1:
+            evicted_mask, evicted = self._partitions.popitem(last=False)
+            self.nbytes -= self.size_of(evicted)
+            self.evictions += 1
+
+    def discard(self, mask):
+        '''
+        Drop a partition that will not be needed again
+        '''
+        partition = self._partitions.pop(mask, None)
+        if partition is not None:
+            self.nbytes -= self.size_of(partition)
+
+    def stats(self):
+        return {'partitions': len(self._partitions), 'bytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def _split(self, mask):
+        '''
+        Pick two subsets to multiply: the cached X with X+A == mask that leaves the fewest rows if there is
+        one, otherwise everything but the highest attribute and that attribute
+        '''
+        best = None
+        for mask_bit in bits(mask):
+            rest = mask ^ mask_bit
+            if rest in self._partitions and (best is None or self.size_of(self._partitions[rest]) <
+                                             self.size_of(self._partitions[best])):
+                best = rest
+        if best is not None:
+            return best, mask ^ best
+        high = 1 << (mask.bit_length() - 1)
+        return mask ^ high, high
+
@@ -0,0 +1,130 @@
+'''
+Versioned on-disk snapshot of an encoded relation, opened with mmap so FD runs need no database.
+
+Layout, all integers little-endian:
+    8 bytes     magic b'FDSNAP\\0\\0'
+    4 bytes     format version
+    4 bytes     length of the JSON header
+    header      names, type oids, row count, checksum of the extracted COPY stream, sha256 of the row ids and
+                columns below, source table, where condition and id column, dictionaries
+    padding     to a multiple of 8
+    row ids     int64 per row
+    columns     int32 per row, one column after the other
+
+Dictionary values are the raw binary COPY values, stored hex-encoded, with null for NULL.
+'''
+
+import hashlib
+import json
+import mmap
+import struct
+import sys
+
+from encoding import EncodedRelation
+
+
+MAGIC = b'FDSNAP\0\0'
+VERSION = 3
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def write(relation, path):
+    '''
+    Write an encoded relation to a snapshot file
+    :param relation: encoding.EncodedRelation
+    :param path: file path
+    :return: None
+    '''
+    arrays = []
+    data_checksum = hashlib.sha256()
+    for data in [relation.row_ids] + relation.columns:
+        if sys.byteorder != 'little':
+            data = type(data)(data.typecode, data)
+            data.byteswap()
+        arrays.append(data)
+        data_checksum.update(data)
+
+    header = json.dumps({
+        'names': relation.names,
+        'types': relation.types,
+        'num_rows': relation.num_rows,
+        'checksum': relation.checksum,
+        'data_checksum': data_checksum.hexdigest(),
+        'source': relation.source,
+        'dictionaries': [[value.hex() if value is not None else None for value in dictionary]
+                         for dictionary in relation.dictionaries],
+    }).encode('utf-8')
+
+    with open(path, 'wb') as f_out:
+        f_out.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f_out.write(header)
+        f_out.write(b'\0' * (-(_PREAMBLE.size + len(header)) % 8))
+        for data in arrays:
+            data.tofile(f_out)
+
+
+def open_snapshot(path, verify=False):
+    '''
+    Map a snapshot file. The columns and row ids of the returned relation are read-only memoryviews
+    into the mapping, so nothing is copied; call materialize() on it before appending rows or pickling it.
+    A file whose size does not match its header is always rejected.
+    :param path: file path
+    :param verify: also check the sha256 of the row ids and columns, which reads the whole file
+    :return: encoding.EncodedRelation
+    '''
+    if sys.byteorder != 'little':
+        raise ValueError("snapshots can only be mapped on little-endian machines")
+
+    with open(path, 'rb') as f_in:
+        mapping = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_length = _PREAMBLE.unpack_from(mapping, 0)
+    if magic != MAGIC:
+        raise ValueError("%s is not an FD snapshot" % path)
+    if version != VERSION:
+        raise ValueError("%s has snapshot format version %d, expected %d" % (path, version, VERSION))
+
+    header = json.loads(mapping[_PREAMBLE.size:_PREAMBLE.size + header_length].decode('utf-8'))
+    num_rows = header['num_rows']
+
+    relation = EncodedRelation(header['names'], header['types'])
+    relation.checksum = header['checksum']
+    relation.source = header['source']
+    relation.dictionaries = [[bytes.fromhex(value) if value is not None else None for value in dictionary]
+                             for dictionary in header['dictionaries']]
+
+    view = memoryview(mapping)
+    offset = _PREAMBLE.size + header_length
+    offset += -offset % 8
+    end = offset + (8 + 4 * len(relation.names)) * num_rows
+    if len(mapping) != end:
+        raise ValueError("%s has %d bytes, its header describes %d; it is truncated or corrupt"
+                         % (path, len(mapping), end))
+    if verify and hashlib.sha256(view[offset:end]).hexdigest() != header['data_checksum']:
+        raise ValueError("%s does not match its checksum; it is corrupt" % path)
+
+    relation.row_ids = view[offset:offset + 8 * num_rows].cast('q')
+    offset += 8 * num_rows
+    relation.columns = []
+    for name in relation.names:
+        relation.columns.append(view[offset:offset + 4 * num_rows].cast('i'))
+        offset += 4 * num_rows
+    return relation
+
+
+def load(path, columns, source, verify=True):
+    '''
+    Open a snapshot for an FD run without a database, checking that it holds what the run asks for
+    :param path: file path
+    :param columns: column names the run needs, in order
+    :param source: dict of the table, where condition and id column the run would extract from
+    :param verify: check the checksum of the row ids and columns
+    :return: encoding.EncodedRelation
+    '''
+    relation = open_snapshot(path, verify)
+    if relation.names != list(columns):
+        raise ValueError("snapshot %s holds columns %s" % (path, relation.names))
+    if relation.source != source:
+        raise ValueError("snapshot %s was extracted with %s, not %s" % (path, relation.source, source))
+    return relation
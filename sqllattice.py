@@ -0,0 +1,178 @@
+'''
+The TANE search of tane.py run inside Postgres, for relations that are not to leave the database.
+
+The partition of an attribute set is kept as a column of class ids in a temporary table: rows in the same
+class share an id, and ids are numbered 1, 2, ... by dense_rank(). The single columns are ranked in one scan
+of the source table. Every later set is the union of two sets of the previous level, and its ids are the
+dense_rank() over the pair of parent ids, so each level is built by scanning the integer tables of the level
+before, never the source strings again. The number of classes of a set is the max of its ids, which gives
+the error the search works with.
+
+Only evaluate and determines are replaced, so the pruning is that of tane.py.
+'''
+
+from metrics import registry
+from tane import Tane
+
+
+class ClassIdTables:
+    '''
+    Where the class id column of every attribute set is, in the place of the partition cache of tane.py. A
+    level's table is dropped once all of its sets are discarded; the table of the single columns is kept to
+    the end, as every check reads its RHS column there.
+    '''
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.locations = {}
+        self.tables = {}
+        self.base = None
+        self.built = 0
+
+    def put(self, mask, table, column):
+        '''
+        :param column: column name, qualified with the table
+        '''
+        self.locations[mask] = (table, column)
+        self.tables.setdefault(table, set()).add(mask)
+        self.built += 1
+
+    def discard(self, mask):
+        location = self.locations.get(mask)
+        if location is None or location[0] == self.base:
+            return
+        del self.locations[mask]
+        masks = self.tables[location[0]]
+        masks.discard(mask)
+        if not masks:
+            del self.tables[location[0]]
+            self.cursor.execute("DROP TABLE " + location[0])
+
+    def stats(self):
+        return {'partitions': len(self.locations), 'tables': len(self.tables), 'misses': self.built}
+
+    def close(self):
+        for table in set(self.tables) | ({self.base} if self.base else set()):
+            self.cursor.execute("DROP TABLE IF EXISTS " + table)
+        self.locations.clear()
+        self.tables.clear()
+
+
+class SqlTane(Tane):
+    '''
+    Finds every minimal non-trivial functional dependency among columns of a table, with the partitions kept
+    in the database
+    '''
+
+    def __init__(self, cursor, table, columns, where=None, sets_per_table=200, prefix='lattice'):
+        '''
+        :param cursor: psycopg2 cursor
+        :param table: table name
+        :param columns: column names
+        :param where: optional SQL condition restricting the rows
+        :param sets_per_table: class id columns per temporary table, far below the limit of 1600 columns
+        :param prefix: name prefix of the temporary tables
+        '''
+        # the values stay in the database, so the columns are only names and the rows are counted by run()
+        Tane.__init__(self, list(columns), cache=ClassIdTables(cursor), num_rows=0)
+        self.cursor = cursor
+        self.table = table
+        self.names = self.columns
+        self.where = where
+        self.sets_per_table = sets_per_table
+        self.prefix = prefix
+        self._tables = 0
+
+    def run(self):
+        '''
+        :return: sorted list of (lhs mask, rhs column position) pairs
+        '''
+        try:
+            self._rank_columns()
+            return Tane.run(self)
+        finally:
+            self.cache.close()
+
+    def evaluate(self, candidates, prev_level):
+        errors = {}
+        if all(parents is None for parents in candidates.values()):
+            # the single columns, ranked up front
+            masks = sorted(candidates)
+            classes = self._classes(self.cache.base, [self.cache.locations[mask][1] for mask in masks])
+            errors = {mask: self.num_rows - count for mask, count in zip(masks, classes)}
+            return dict.fromkeys(candidates), errors
+
+        masks = sorted(candidates)
+        for start in range(0, len(masks), self.sets_per_table):
+            batch = masks[start:start + self.sets_per_table]
+            name = self._new_table()
+            tables = []
+            ranks = []
+            for i, mask in enumerate(batch):
+                left, right = (self.cache.locations[parent] for parent in candidates[mask])
+                for parent_table in (left[0], right[0]):
+                    if parent_table not in tables:
+                        tables.append(parent_table)
+                ranks.append("dense_rank() OVER (ORDER BY %s, %s) AS s%d" % (left[1], right[1], i))
+            source = " JOIN ".join(tables[:1] + [table + " USING (rid)" for table in tables[1:]])
+            self.cursor.execute("CREATE TEMPORARY TABLE " + name + " AS SELECT rid, " + ', '.join(ranks) +
+                                " FROM " + source)
+            registry.inc('fd_queries')
+            self._index(name)
+            for i, mask in enumerate(batch):
+                self.cache.put(mask, name, "%s.s%d" % (name, i))
+            classes = self._classes(name, [self.cache.locations[mask][1] for mask in batch])
+            errors.update((mask, self.num_rows - count) for mask, count in zip(batch, classes))
+        return dict.fromkeys(candidates), errors
+
+    def determines(self, lhs, rhs, prev_level):
+        rhs_table, rhs_column = self.cache.locations[rhs]
+        if lhs == 0:
+            self.cursor.execute("SELECT coalesce(max(" + rhs_column + "), 0) <= 1 FROM " + rhs_table)
+        else:
+            lhs_table, lhs_column = self.cache.locations[lhs]
+            source = lhs_table if lhs_table == rhs_table else lhs_table + " JOIN " + rhs_table + " USING (rid)"
+            self.cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM " + source + " GROUP BY " + lhs_column +
+                                " HAVING min(" + rhs_column + ") <> max(" + rhs_column + "))")
+        registry.inc('fd_queries')
+        return bool(self.cursor.fetchone()[0])
+
+    def _rank_columns(self):
+        '''
+        Number the rows and rank every column in one scan of the source table
+        '''
+        name = self.cache.base = self._new_table()
+        ranks = ', '.join("dense_rank() OVER (ORDER BY %s) AS s%d" % (column, a)
+                          for a, column in enumerate(self.names))
+        self.cursor.execute("CREATE TEMPORARY TABLE " + name + " AS SELECT row_number() OVER () AS rid" +
+                            (", " + ranks if ranks else "") + " FROM " + self.table +
+                            (" WHERE " + self.where if self.where else ""))
+        registry.inc('fd_queries')
+        self._index(name)
+        self.cursor.execute("SELECT count(*) FROM " + name)
+        self.num_rows = self.cursor.fetchone()[0]
+        for a in range(self.num_attributes):
+            self.cache.put(1 << a, name, "%s.s%d" % (name, a))
+
+    def _classes(self, table, columns):
+        '''
+        :return: number of classes of every class id column, in one scan
+        '''
+        if not columns:
+            return []
+        self.cursor.execute("SELECT " + ', '.join("coalesce(max(%s), 0)" % column for column in columns) +
+                            " FROM " + table)
+        registry.inc('fd_queries')
+        return list(self.cursor.fetchone())
+
+    def _index(self, name):
+        '''
+        Index a table on rid, as the next level and determines join it with others on rid, and give the planner
+        statistics, which are never gathered on temporary tables by themselves
+        '''
+        self.cursor.execute("CREATE UNIQUE INDEX " + name + "_rid ON " + name + " (rid)")
+        self.cursor.execute("ANALYZE " + name)
+
+    def _new_table(self):
+        self._tables += 1
+        return "%s_%d" % (self.prefix, self._tables)
@@ -0,0 +1,208 @@
+'''
+Level-wise discovery of minimal functional dependencies (TANE, Huhtala et al. 1999).
+
+Attribute sets are int bitmasks over the column positions: bit i set means column i is in the set.
+The search walks the attribute lattice one level at a time, validates candidates with stripped
+partitions instead of queries, and prunes candidate RHS sets, keys and supersets of known LHSs.
+'''
+
+from metrics import registry
+from partitions import PartitionCache, bits
+
+
+def format_fds(fds, names):
+    '''
+    Render dependencies the way the rest of normalization.py prints them, e.g. "movieid, type-->runtime"
+    :param fds: list of (lhs mask, rhs column position) pairs
+    :param names: column names by position
+    :return: list of strings
+    '''
+    result = []
+    for lhs, rhs in fds:
+        left = ', '.join(names[i] for i in range(len(names)) if lhs >> i & 1)
+        result.append(left + "-->" + names[rhs])
+    return result
+
+
+class Tane:
+    '''
+    Finds every minimal non-trivial functional dependency X --> A that holds on a relation given as columns.
+    '''
+
+    def __init__(self, columns, cache_bytes=None, max_error=None, cache=None, num_rows=None):
+        '''
+        :param columns: one sequence of hashable values per attribute, all of the same length
+        :param cache_bytes: byte budget of the partition cache, None for no limit
+        :param max_error: find approximate dependencies instead, whose g3 error (the fraction of rows to remove
+                          for the dependency to hold) is at most this
+        :param cache: where a subclass keeps its partitions instead of a PartitionCache of the columns; it has
+                      discard and stats, and the subclass's evaluate and determines are the only ones to read it
+        :param num_rows: number of rows, for a subclass that does not hold the values of its columns
+        '''
+        self.columns = columns
+        self.num_attributes = len(columns)
+        if num_rows is None:
+            num_rows = len(columns[0]) if columns else 0
+        self.num_rows = num_rows
+        self.cache = cache if cache is not None else PartitionCache(columns, cache_bytes)
+        self.max_error = max_error
+        # the same bound as a number of rows
+        self.max_violations = int(max_error * self.num_rows) if max_error is not None else 0
+
+    def evaluate(self, candidates, prev_level):
+        '''
+        Compute what the search needs to know about a new level
+        :param candidates: dict of attribute set to the pair of sets it was generated from, or None on the first level
+        :param prev_level: the attribute sets of the previous level
+        :return: (the attribute sets of the level, dict of attribute set to its error)
+        '''
+        errors = {}
+        for mask, parents in candidates.items():
+            errors[mask] = self.cache.get(mask, parents).error()
+        return dict.fromkeys(candidates), errors
+
+    def determines(self, lhs, rhs, prev_level):
+        '''
+        Direct check of lhs --> rhs for an lhs on the previous level
+        :param lhs: attribute set
+        :param rhs: single-attribute mask
+        :param prev_level: the attribute sets of the previous level
+        :return: bool
+        '''
+        partition = self.cache.get(lhs)
+        column = self.columns[rhs.bit_length() - 1]
+        if not self.max_violations:
+            return partition.refines(column)
+        return partition.violations(column, self.max_violations) <= self.max_violations
+
+    def approximately_determines(self, lhs, rhs, lhs_error, error):
+        '''
+        Check lhs --> rhs against the g3 bound, where lhs + rhs is on the current level
+        :param lhs: attribute set
+        :param rhs: single-attribute mask
+        :param lhs_error: error of lhs
+        :param error: error of lhs + rhs
+        :return: bool
+        '''
+        # e(X) - e(X+A) <= g3(X --> A) <= e(X) decides most candidates without looking at any rows
+        if lhs_error <= self.max_violations:
+            return True
+        if lhs_error - error > self.max_violations:
+            return False
+        return self.determines(lhs, rhs, None)
+
+    def run(self):
+        '''
+        Walk the lattice until no candidates are left
+        :return: sorted list of (lhs mask, rhs column position) pairs
+        '''
+        everything = (1 << self.num_attributes) - 1
+        fds = []
+
+        # the empty set: all rows fall into one class
+        prev_errors = {0: max(self.num_rows - 1, 0)}
+        prev_cplus = {0: everything}
+        prev_level = {0: None}
+
+        candidates = {1 << a: None for a in range(self.num_attributes)}
+        size = 1
+
+        while candidates:
+            registry.inc('fd_lattice_sets', len(candidates), level=size)
+            level, errors = self.evaluate(candidates, prev_level)
+            cplus = self._compute_dependencies(level, errors, prev_errors, prev_cplus, fds)
+            registry.inc('fd_sets_pruned', self._prune(level, errors, cplus, prev_level, fds), level=size)
+            candidates = self._generate_next_level(level)
+            size += 1
+            # the previous level is not needed once this one is pruned
+            for mask in prev_level:
+                self.cache.discard(mask)
+            prev_errors, prev_cplus = errors, {mask: cplus[mask] for mask in level}
+            prev_level = level
+
+        stats = self.cache.stats()
+        # every miss builds a partition
+        registry.set('partitions_built', stats['misses'])
+        for name, value in stats.items():
+            registry.set('partition_cache_' + name, value)
+        fds.sort(key=lambda fd: (bin(fd[0]).count('1'), fd[0], fd[1]))
+        return fds
+
+    def _compute_dependencies(self, level, errors, prev_errors, prev_cplus, fds):
+        '''
+        Validate X\\{A} --> A for every X in the level and every A in X that is still a RHS candidate
+        :return: dict of RHS candidate sets C+(X)
+        '''
+        cplus = {}
+        for mask in level:
+            candidates = -1
+            for a in bits(mask):
+                candidates &= prev_cplus[mask ^ a]
+            cplus[mask] = candidates
+        if level:
+            registry.inc('fd_candidates_checked', sum(bin(mask & cplus[mask]).count('1') for mask in level),
+                         level=bin(next(iter(level))).count('1'))
+
+        for mask in sorted(level):
+            for a in bits(mask & cplus[mask]):
+                if prev_errors[mask ^ a] == errors[mask]:
+                    fds.append((mask ^ a, a.bit_length() - 1))
+                    # A is no longer a candidate, and nothing outside X can be (Lemma 3 of the paper)
+                    cplus[mask] &= mask & ~a
+                elif self.max_error is not None and \
+                        self.approximately_determines(mask ^ a, a, prev_errors[mask ^ a], errors[mask]):
+                    # only an exact dependency rules out the attributes outside X
+                    fds.append((mask ^ a, a.bit_length() - 1))
+                    cplus[mask] &= ~a
+        return cplus
+
+    def _prune(self, level, errors, cplus, prev_level, fds):
+        '''
+        Remove sets with no RHS candidates left, and superkeys after emitting the dependencies they imply
+        :return: number of sets removed
+        '''
+        removed = []
+        for mask in sorted(level):
+            if cplus[mask] == 0:
+                removed.append(mask)
+            # Keys stay on the lattice in the approximate search: a minimal approximate X-B --> A need not
+            # make X-B a key, so it would be lost with the supersets of X.
+            elif errors[mask] == 0 and self.max_error is None:
+                for a in bits(cplus[mask] & ~mask):
+                    # X --> A is minimal only if no X-B --> A holds. X+A-B keeps A as a candidate exactly
+                    # then; when X+A-B was never generated, check X-B against the column directly.
+                    for b in bits(mask):
+                        sibling = (mask | a) ^ b
+                        if sibling in cplus:
+                            if not cplus[sibling] & a:
+                                break
+                        elif self.determines(mask ^ b, a, prev_level):
+                            break
+                    else:
+                        fds.append((mask, a.bit_length() - 1))
+                removed.append(mask)
+        for mask in removed:
+            del level[mask]
+            # run() only discards the sets that are left on the level
+            self.cache.discard(mask)
+        return len(removed)
+
+    def _generate_next_level(self, level):
+        '''
+        Join pairs of sets that share all but their highest attribute and keep the joins whose every
+        subset survived pruning
+        :return: dict of attribute set to the pair of sets it is generated from
+        '''
+        blocks = {}
+        for mask in sorted(level):
+            prefix = mask ^ (1 << (mask.bit_length() - 1))
+            blocks.setdefault(prefix, []).append(mask)
+
+        candidates = {}
+        for block in blocks.values():
+            for i in range(len(block)):
+                for j in range(i + 1, len(block)):
+                    mask = block[i] | block[j]
+                    if all(mask ^ b in level for b in bits(mask)):
+                        candidates[mask] = (block[i], block[j])
+        return candidates
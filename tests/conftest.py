@@ -0,0 +1,9 @@
+'''
+The modules are plain files at the top of the repository, so it is put on the path for the tests. No test
+needs a database.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
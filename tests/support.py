@@ -0,0 +1,60 @@
+'''
+Brute-force oracles and random relations shared by the tests
+'''
+
+import random
+from itertools import combinations
+
+from encoding import EncodedRelation
+
+
+def violations(columns, lhs, rhs):
+    '''
+    Rows to remove for lhs --> rhs to hold, i.e. the g3 error of the dependency as a number of rows
+    '''
+    classes = {}
+    positions = [a for a in range(len(columns)) if lhs >> a & 1]
+    for row in range(len(columns[rhs])):
+        key = tuple(columns[a][row] for a in positions)
+        counts = classes.setdefault(key, {})
+        counts[columns[rhs][row]] = counts.get(columns[rhs][row], 0) + 1
+    return sum(sum(counts.values()) - max(counts.values()) for counts in classes.values())
+
+
+def minimal_fds(columns, max_violations=0):
+    '''
+    Every minimal non-trivial dependency that holds after removing at most max_violations rows, by checking
+    every LHS against the rows, sorted the way the discovery algorithms return them
+    '''
+    num_attributes = len(columns)
+    fds = []
+    for size in range(num_attributes):
+        for positions in combinations(range(num_attributes), size):
+            lhs = sum(1 << a for a in positions)
+            for rhs in range(num_attributes):
+                if lhs >> rhs & 1 or any(found & lhs == found for found, r in fds if r == rhs):
+                    continue
+                if violations(columns, lhs, rhs) <= max_violations:
+                    fds.append((lhs, rhs))
+    fds.sort(key=lambda fd: (bin(fd[0]).count('1'), fd[0], fd[1]))
+    return fds
+
+
+def random_columns(seed, max_attributes=6, max_rows=30):
+    '''
+    Columns of small random ints, so that many dependencies hold by chance
+    '''
+    rnd = random.Random(seed)
+    num_attributes = rnd.randint(1, max_attributes)
+    num_rows = rnd.randint(0, max_rows)
+    return [[rnd.randint(0, rnd.randint(1, 4)) for row in range(num_rows)] for a in range(num_attributes)]
+
+
+def encode(rows, num_attributes):
+    '''
+    EncodedRelation of raw values, with row ids counting from 1
+    '''
+    relation = EncodedRelation(['c%d' % a for a in range(num_attributes)], [25] * num_attributes)
+    for row_id, row in enumerate(rows, 1):
+        relation.add_row(row_id, row)
+    return relation
@@ -0,0 +1,55 @@
+import pytest
+
+from benchmark import Benchmark, compare, percentile, read_results, write_results
+
+
+def test_percentile_is_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 0.5) == 3
+    assert percentile(values, 0.95) == 5
+    assert percentile(values, 0.2) == 1
+    assert percentile(values, 0.21) == 2
+    assert percentile(values, 0) == 1
+    assert percentile(values, 1) == 5
+    assert percentile([7.5], 0.95) == 7.5
+    assert percentile([], 0.5) is None
+
+
+def test_compare_dicts_and_files(tmp_path):
+    before = {'fast': {'p50': 1.0}, 'slow': {'p50': 1.0}, 'same': {'p50': 1.0}, 'dropped': {'p50': 1.0},
+              'instant': {'p50': 1.0}}
+    after = {'fast': {'p50': 0.5}, 'slow': {'p50': 1.5}, 'same': {'p50': 1.05}, 'added': {'p50': 1.0},
+             'instant': {'p50': 0.0}}
+    comparison = compare(before, after)
+    assert comparison == {'fast': (1.0, 0.5, 2.0, 'faster'), 'slow': (1.0, 1.5, 1 / 1.5, 'slower'),
+                          'same': (1.0, 1.05, 1 / 1.05, 'same'), 'instant': (1.0, 0.0, float('inf'), 'faster')}
+    assert compare(before, after, threshold=0.01)['same'][3] == 'slower'
+
+    write_results(before, str(tmp_path / 'before.json'), 'before')
+    write_results(after, str(tmp_path / 'after.json'), 'after')
+    assert read_results(str(tmp_path / 'before.json'))['label'] == 'before'
+    assert compare(str(tmp_path / 'before.json'), str(tmp_path / 'after.json')) == comparison
+
+
+class FakeCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, query):
+        self.executed.append(query)
+
+    def fetchall(self):
+        return [('plan line',)] if self.executed[-1].startswith('EXPLAIN') else [(1,), (2,)]
+
+
+def test_benchmark_runs_warmup_and_repetitions():
+    cursor = FakeCursor()
+    results = Benchmark(cursor, [('q', 'SELECT 1')], warmup=2, repetitions=3, explain=True).run()
+    assert cursor.executed == ['SELECT 1'] * 5 + ['EXPLAIN (ANALYZE, BUFFERS) SELECT 1']
+    result = results['q']
+    assert result['rows'] == 2
+    assert len(result['seconds']) == 3
+    assert result['min'] <= result['p50'] <= result['p95'] <= result['max']
+    assert result['plan'] == 'plan line'
+    with pytest.raises(ValueError):
+        Benchmark(cursor, [], repetitions=0)
@@ -0,0 +1,137 @@
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+import dbconnection
+from dbconnection import ConnectionPool, is_transient, retry
+
+
+def error(code, base=psycopg2.OperationalError):
+    return type('Error' + code, (base,), {'pgcode': code})('error ' + code)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+        self.autocommit = False
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+    monkeypatch.setattr(dbconnection.psycopg2, 'connect', connect)
+    monkeypatch.setattr(dbconnection.time, 'sleep', lambda seconds: None)
+    return opened
+
+
+@pytest.mark.parametrize('code', ['08006', '08001', '40001', '40P01', '57P01', '57P02', '57P03'])
+def test_transient_codes(code):
+    assert is_transient(error(code))
+
+
+@pytest.mark.parametrize('code', ['23505', '42P01', '22012', '53100'])
+def test_permanent_codes(code):
+    assert not is_transient(error(code, psycopg2.DatabaseError))
+
+
+def test_errors_without_a_code():
+    assert is_transient(psycopg2.OperationalError('server closed the connection unexpectedly'))
+    assert is_transient(psycopg2.InterfaceError('connection already closed'))
+    assert not is_transient(psycopg2.ProgrammingError('no results to fetch'))
+
+
+def test_retry_backs_off_then_gives_up(monkeypatch):
+    delays = []
+    monkeypatch.setattr(dbconnection.time, 'sleep', delays.append)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise error('40001')
+    with pytest.raises(psycopg2.OperationalError):
+        retry(failing, attempts=4, delay=0.5)
+    assert len(calls) == 4
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_retry_does_not_repeat_permanent_errors(connections):
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise error('23505', psycopg2.IntegrityError)
+    with pytest.raises(psycopg2.IntegrityError):
+        retry(failing, attempts=3)
+    assert len(calls) == 1
+
+
+def test_run_retries_a_transient_error_on_another_connection(connections):
+    pool = ConnectionPool({}, size=2)
+    seen = []
+
+    def statement(cursor):
+        seen.append(cursor.connection.number)
+        if len(seen) == 1:
+            # the server went away under the first connection
+            cursor.connection.closed = 2
+            raise error('57P01')
+        return 'rows'
+    assert pool.run(statement) == 'rows'
+    assert seen == [0, 1]
+    assert connections[0].closed
+    assert not connections[1].closed
+
+
+def test_connect_is_retried(connections, monkeypatch):
+    attempts = []
+    connect = dbconnection.psycopg2.connect
+
+    def flaky(**kwargs):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise psycopg2.OperationalError('could not connect to server')
+        return connect(**kwargs)
+    monkeypatch.setattr(dbconnection.psycopg2, 'connect', flaky)
+    pool = ConnectionPool({}, attempts=3)
+    assert pool.connect().autocommit
+    with pytest.raises(psycopg2.OperationalError):
+        attempts.clear()
+        ConnectionPool({}, attempts=2).connect()
+
+
+def test_pool_reuses_and_rolls_back(connections):
+    pool = ConnectionPool({}, size=1)
+    with pool.connection() as connection:
+        connection.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    assert pool.get() is connection
+    assert connection.status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    assert len(connections) == 1
@@ -0,0 +1,57 @@
+import hashlib
+import struct
+
+import pytest
+
+from encoding import COPY_SIGNATURE, BinaryCopyReader, EncodedRelation
+
+ROWS = [(1, [b'x', b'10', None]), (2, [b'yy', b'', b'a']), (5, [b'x', b'10', b'a']), (9, [None, None, b''])]
+
+
+def copy_stream(rows):
+    '''
+    Binary COPY stream of an int8 id column followed by the given raw fields, with a header extension
+    '''
+    data = COPY_SIGNATURE + struct.pack('>ii', 0, 4) + b'ext!'
+    for row_id, values in rows:
+        data += struct.pack('>hiq', 1 + len(values), 8, row_id)
+        for value in values:
+            data += struct.pack('>i', -1) if value is None else struct.pack('>i', len(value)) + value
+    return data + struct.pack('>h', -1)
+
+
+def read(data, chunk_size):
+    relation = EncodedRelation(['a', 'b', 'c'], [25, 25, 25])
+    reader = BinaryCopyReader(relation)
+    for start in range(0, len(data), chunk_size):
+        assert reader.write(memoryview(data)[start:start + chunk_size]) == len(data[start:start + chunk_size])
+    return relation, reader
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 18, 19, 20, 64, 1 << 16])
+def test_chunk_boundaries_anywhere(chunk_size):
+    data = copy_stream(ROWS)
+    relation, reader = read(data, chunk_size)
+
+    assert list(relation.row_ids) == [1, 2, 5, 9]
+    assert [[relation.dictionaries[a][code] for code in relation.columns[a]] for a in range(3)] == \
+        [[values[a] for row_id, values in ROWS] for a in range(3)]
+    # equal values share a code, NULL gets one of its own
+    assert list(relation.columns[0]) == [0, 1, 0, 2]
+    assert relation.decode(2, relation.columns[2][1]) == 'a'
+    assert reader.bytes_read == len(data)
+    assert reader.checksum.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_appended_rows_reuse_codes():
+    relation, reader = read(copy_stream(ROWS[:2]), 4)
+    reader = BinaryCopyReader(relation)
+    reader.write(copy_stream(ROWS[2:]))
+    assert list(relation.columns[0]) == [0, 1, 0, 2]
+    assert list(relation.row_ids) == [1, 2, 5, 9]
+
+
+def test_rejects_text_copy():
+    reader = BinaryCopyReader(EncodedRelation(['a']))
+    with pytest.raises(ValueError):
+        reader.write(b'1\tx\n2\ty\n3\tz\n4\tw\n5\tv\n')
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from fdalgebra import FDSet, candidate_keys, decompose_bcnf, minimal_cover, synthesize_3nf
+from partitions import bits
+from tane import Tane
+
+
+def closure(mask, fds):
+    changed = True
+    while changed:
+        changed = False
+        for lhs, rhs in fds:
+            if lhs & ~mask == 0 and not mask >> rhs & 1:
+                mask |= 1 << rhs
+                changed = True
+    return mask
+
+
+def random_fds(seed):
+    rnd = random.Random(seed)
+    num_attributes = rnd.randint(2, 7)
+    fds = [(rnd.randrange(1 << num_attributes), rnd.randrange(num_attributes)) for i in range(rnd.randint(0, 12))]
+    return fds, num_attributes
+
+
+def join_back(rows, relations):
+    '''
+    Natural join of the projections of rows onto attribute sets
+    '''
+    result = None
+    for relation in relations:
+        positions = [a.bit_length() - 1 for a in bits(relation)]
+        projection = {tuple((a, row[a]) for a in positions) for row in rows}
+        if result is None:
+            result = [dict(tuple_) for tuple_ in projection]
+            continue
+        result = [dict(list(joined.items()) + list(tuple_)) for joined in result for tuple_ in projection
+                  if all(joined.get(a, value) == value for a, value in tuple_)]
+    return {tuple(joined[a] for a in sorted(joined)) for joined in result}
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_closure(seed):
+    fds, num_attributes = random_fds(seed)
+    fd_set = FDSet(fds, num_attributes)
+    for mask in range(1 << num_attributes):
+        assert fd_set.closure(mask) == closure(mask, fds)
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_minimal_cover_is_equivalent_and_minimal(seed):
+    fds, num_attributes = random_fds(seed)
+    cover = minimal_cover(fds, num_attributes)
+    for mask in range(1 << num_attributes):
+        assert closure(mask, cover) == closure(mask, fds)
+    for lhs, rhs in cover:
+        assert not lhs >> rhs & 1
+        assert not closure(lhs, [fd for fd in cover if fd != (lhs, rhs)]) >> rhs & 1
+        for b in bits(lhs):
+            assert not closure(lhs ^ b, fds) >> rhs & 1
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_candidate_keys(seed):
+    fds, num_attributes = random_fds(seed)
+    everything = (1 << num_attributes) - 1
+    keys = sorted((mask for mask in range(1 << num_attributes) if closure(mask, fds) == everything and
+                   all(closure(mask ^ b, fds) != everything for b in bits(mask))),
+                  key=lambda key: (bin(key).count('1'), key))
+    assert sorted(candidate_keys(fds, num_attributes)) == sorted(keys)
+    for limit in (1, 2):
+        limited = candidate_keys(fds, num_attributes, limit=limit)
+        assert len(limited) == min(limit, len(keys))
+        assert set(limited) <= set(keys)
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_3nf_synthesis_preserves_dependencies(seed):
+    fds, num_attributes = random_fds(seed)
+    everything = (1 << num_attributes) - 1
+    relations = [mask for mask, key in synthesize_3nf(fds, num_attributes)]
+    assert any(closure(mask, fds) == everything for mask in relations)
+    assert sum(set().union(*[set(bits(mask)) for mask in relations])) == everything
+    for lhs, rhs in minimal_cover(fds, num_attributes):
+        assert any(mask & (lhs | 1 << rhs) == lhs | 1 << rhs for mask in relations)
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_bcnf_decomposition_has_no_violations(seed):
+    fds, num_attributes = random_fds(seed)
+    for relation in decompose_bcnf(fds, num_attributes):
+        for mask in range(1, 1 << num_attributes):
+            if mask & relation == mask:
+                determined = closure(mask, fds) & relation
+                assert determined in (mask, relation)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_decompositions_join_back_to_the_relation(seed):
+    rnd = random.Random(seed)
+    num_attributes = rnd.randint(2, 5)
+    rows = [tuple(rnd.randint(0, 2) for a in range(num_attributes)) for row in range(rnd.randint(1, 12))]
+    columns = [[row[a] for row in rows] for a in range(num_attributes)]
+    fds = Tane(columns).run()
+    relations = [mask for mask, key in synthesize_3nf(fds, num_attributes)]
+    assert join_back(rows, relations) == set(rows)
+    assert join_back(rows, decompose_bcnf(fds, num_attributes)) == set(rows)
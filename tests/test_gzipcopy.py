@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+import gzipcopy
+from gzipcopy import GzipCopyStream, copy_gzip
+from metrics import registry
+
+HEADER = b'tconst\ttitleType\n'
+BODY = b''.join(b'tt%07d\tmovie\\N\n' % i for i in range(5000))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'title.basics.tsv.gz')
+    with gzip.open(path, 'wb') as f_out:
+        f_out.write(HEADER + BODY)
+    return path
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096, len(BODY) - 1, len(BODY), 10 * len(BODY)])
+def test_read_sizes(path, size):
+    chunks = []
+    with GzipCopyStream(path) as stream:
+        while True:
+            data = stream.read(size)
+            if not data:
+                break
+            assert len(data) <= size
+            chunks.append(data)
+        assert stream.bytes_read == len(BODY)
+        assert stream.compressed_bytes_read > 0
+    assert b''.join(chunks) == BODY
+
+
+def test_read_without_a_size_is_bounded(path, monkeypatch):
+    monkeypatch.setattr(gzipcopy, 'CHUNK_SIZE', 1000)
+    with GzipCopyStream(path) as stream:
+        assert len(stream.read()) == 1000
+        assert len(stream.read(None)) == 1000
+        assert stream.readline() == BODY[2000:BODY.index(b'\n', 2000) + 1]
+
+
+def test_header_is_kept_when_asked(path):
+    with GzipCopyStream(path, skip_header=False) as stream:
+        assert stream.readline() == HEADER
+
+
+class CopyCursor:
+    def __init__(self):
+        self.sizes = []
+        self.data = b''
+
+    def copy_expert(self, query, stream, size):
+        self.query = query
+        while True:
+            data = stream.read(size)
+            if not data:
+                break
+            self.sizes.append(len(data))
+            self.data += data
+
+
+def test_copy_gzip(path):
+    registry.reset()
+    cursor = CopyCursor()
+    assert copy_gzip(cursor, path, 't', ['tconst', 'titleType'], chunk_size=10000) == len(BODY)
+    assert cursor.data == BODY
+    assert max(cursor.sizes) <= 10000
+    assert cursor.query.startswith("COPY t(tconst, titleType) FROM STDIN")
+    assert registry.counters[('gzip_bytes_read', (('file', 'title.basics.tsv.gz'),))] == len(BODY)
+    registry.reset()
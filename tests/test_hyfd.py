@@ -0,0 +1,28 @@
+import pytest
+
+from hyfd import HyFD
+from support import minimal_fds, random_columns
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_hyfd_finds_the_minimal_dependencies(seed):
+    columns = random_columns(seed)
+    assert HyFD(columns).run() == minimal_fds(columns)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_hyfd_with_a_small_cache_and_max_lhs(seed):
+    columns = random_columns(seed)
+    expected = [(lhs, rhs) for lhs, rhs in minimal_fds(columns) if bin(lhs).count('1') <= 2]
+    assert HyFD(columns, cache_bytes=64, max_lhs=2).run() == expected
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_non_fds_are_agree_sets_of_row_pairs(seed):
+    columns = random_columns(seed)
+    hyfd = HyFD(columns)
+    hyfd.run()
+    num_rows = len(columns[0])
+    agree_sets = {sum(1 << a for a, column in enumerate(columns) if column[row] == column[other])
+                  for row in range(num_rows) for other in range(row + 1, num_rows)}
+    assert hyfd.non_fds <= agree_sets
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from incremental import FDState
+from support import encode
+from tane import Tane
+
+
+def random_rows(seed):
+    rnd = random.Random(seed)
+    num_attributes = rnd.randint(1, 6)
+    return [[str(rnd.randint(0, rnd.randint(1, 4))).encode() for a in range(num_attributes)]
+            for row in range(rnd.randint(0, 40))]
+
+
+@pytest.mark.parametrize('saved_keys', [None, 0, 10])
+@pytest.mark.parametrize('seed', range(60))
+def test_update_matches_a_rerun(seed, saved_keys, tmp_path):
+    rows = random_rows(seed)
+    num_attributes = len(rows[0]) if rows else 3
+    first = len(rows) // 2
+    relation = encode(rows[:first], num_attributes)
+    state = FDState(relation, Tane(relation.columns).run(), saved_keys)
+    state.save(tmp_path / 'state')
+    state = FDState.load(tmp_path / 'state')
+
+    for row_id, row in enumerate(rows[first:], first + 1):
+        state.relation.add_row(row_id, row)
+    violated, added = state.update(first)
+
+    assert state.fds == sorted(Tane(state.relation.columns).run())
+    assert not set(violated) & set(state.fds)
+    assert set(added) <= set(state.fds)
+    assert state.high_water == len(rows)
+
+
+def test_save_keeps_the_smallest_indexes_within_the_bound(tmp_path):
+    # c0 has two values, c1 four: the index of c0 fits in the bound, the one of c1 does not
+    relation = encode([[b'a', b'1', b'x'], [b'a', b'2', b'x'], [b'b', b'3', b'y'], [b'b', b'4', b'y']], 3)
+    state = FDState(relation, Tane(relation.columns).run(), saved_keys=3)
+    assert sorted(state.indexes) == [1, 2, 4]
+    state.save(tmp_path / 'state')
+
+    loaded = FDState.load(tmp_path / 'state')
+    assert list(loaded.indexes) == [1]
+    assert loaded.fds == state.fds
@@ -0,0 +1,118 @@
+import random
+import re
+from itertools import permutations
+
+import pytest
+
+from inddiscovery import Spider, foreign_keys
+
+QUERY = re.compile(r'SELECT (\w+)::text COLLATE "C" AS value, count\(\*\) FROM (\w+) WHERE')
+
+
+class FakeCursor:
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+        self.rows = []
+
+    def execute(self, query):
+        self.connection.executed.append(query)
+        match = QUERY.match(query)
+        if match:
+            values = [str(value) for value in self.connection.tables[match.group(2)][match.group(1)]
+                      if value is not None]
+            self.rows = [(value, values.count(value)) for value in sorted(set(values))]
+
+    def __iter__(self):
+        for row in self.rows:
+            self.connection.fetched[self.name] = self.connection.fetched.get(self.name, 0) + 1
+            yield row
+
+    def close(self):
+        self.connection.closed.append(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, tables):
+        self.tables = tables
+        self.autocommit = True
+        self.executed = []
+        self.fetched = {}
+        self.closed = []
+        self.rolled_back = False
+
+    def cursor(self, name=None):
+        assert not self.autocommit, "a snapshot needs a transaction"
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def violations(tables, dependent, referenced):
+    included = {str(value) for value in tables[referenced[0]][referenced[1]]}
+    values = [str(value) for value in tables[dependent[0]][dependent[1]] if value is not None]
+    missing = [value for value in values if value not in included]
+    return len(values), len(missing), len(set(missing))
+
+
+def random_tables(seed):
+    rnd = random.Random(seed)
+    tables = {}
+    for t in range(rnd.randint(1, 3)):
+        tables['t%d' % t] = {'c%d' % c: [rnd.choice([None, rnd.randint(0, 12), 'x%d' % rnd.randint(0, 3)])
+                                         for row in range(rnd.randint(0, 8))]
+                             for c in range(rnd.randint(1, 3))}
+    # columns of one table have the same number of rows
+    for table in tables.values():
+        size = min(len(values) for values in table.values())
+        for column in table:
+            table[column] = table[column][:size]
+    return tables
+
+
+@pytest.mark.parametrize('max_violations', [None, 0, 2])
+@pytest.mark.parametrize('seed', range(40))
+def test_spider_matches_anti_joins(seed, max_violations):
+    tables = random_tables(seed)
+    columns = [(table, column) for table in sorted(tables) for column in sorted(tables[table])]
+    connection = FakeConnection(tables)
+    inds = Spider(connection, columns, max_violations, itersize=2).run()
+
+    expected = {}
+    for dependent, referenced in permutations(columns, 2):
+        rows, missing, distinct = violations(tables, dependent, referenced)
+        if max_violations is None or missing <= max_violations:
+            expected[dependent, referenced] = (rows, missing, distinct)
+    assert {(ind['dependent'], ind['referenced']): (ind['rows'], ind['violations'], ind['distinct_violations'])
+            for ind in inds} == expected
+    assert [ind['violations'] for ind in inds] == sorted(ind['violations'] for ind in inds)
+    for ind in inds:
+        if ind['referenced_unique'] is not None:
+            values = [value for value in tables[ind['referenced'][0]][ind['referenced'][1]] if value is not None]
+            assert ind['referenced_unique'] == (len(values) == len(set(map(str, values))))
+    assert connection.rolled_back and connection.autocommit
+
+
+def test_pruned_streams_are_closed_early():
+    tables = {'movie': {'id': list(range(100))}, 'link': {'movie': [0, 1, 2] + [500] * 5, 'other': [7] * 8}}
+    connection = FakeConnection(tables)
+    inds = Spider(connection, [('link', 'movie'), ('movie', 'id')],
+                  pairs=[(('link', 'movie'), ('movie', 'id'))]).run()
+    assert inds == []
+    # the dependent fails at value 500, the referenced stream is dropped long before its 100 values
+    assert 'spider_1' in connection.closed
+    assert connection.fetched['spider_1'] < 100
+
+
+def test_foreign_keys_need_exact_dependencies_on_unique_columns():
+    tables = {'movie': {'id': [1, 2, 3]}, 'link': {'movie': [1, 1, 3], 'member': [2, 2, 2]}}
+    inds = Spider(FakeConnection(tables), [('link', 'movie'), ('movie', 'id'), ('link', 'member')]).run()
+    assert foreign_keys(inds) == ["ALTER TABLE link ADD FOREIGN KEY(member) REFERENCES movie(id)",
+                                  "ALTER TABLE link ADD FOREIGN KEY(movie) REFERENCES movie(id)"]
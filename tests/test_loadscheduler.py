@@ -0,0 +1,102 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from loadscheduler import Stage, StageScheduler
+
+
+class FakeCursor:
+    statusmessage = None
+    rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakePool:
+    @contextmanager
+    def connection(self):
+        yield FakeConnection()
+
+
+def record(events, lock, name, seconds=0.0):
+    def run(cursor):
+        with lock:
+            events.append(('start', name))
+        time.sleep(seconds)
+        with lock:
+            events.append(('end', name))
+    return run
+
+
+def stages(events, lock, seconds=0.0):
+    return [Stage('members', record(events, lock, 'members', seconds)),
+            Stage('movies', record(events, lock, 'movies', seconds)),
+            Stage('links', record(events, lock, 'links', seconds), ['members', 'movies']),
+            Stage('roles', record(events, lock, 'roles', seconds), ['links']),
+            Stage('stats', record(events, lock, 'stats', seconds), ['links'])]
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def test_stages_start_after_their_dependencies(workers):
+    events = []
+    lock = threading.Lock()
+    scheduler = StageScheduler(stages(events, lock))
+    report = scheduler.run(FakePool(), workers)
+
+    assert sorted(report['stages']) == ['links', 'members', 'movies', 'roles', 'stats']
+    for stage in scheduler.stages.values():
+        for dependency in stage.depends:
+            assert events.index(('end', dependency)) < events.index(('start', stage.name))
+    for timing in report['stages'].values():
+        assert 0 <= timing['start'] <= timing['end'] <= report['seconds']
+
+
+def test_independent_stages_run_at_the_same_time():
+    events = []
+    lock = threading.Lock()
+    StageScheduler(stages(events, lock, 0.05)).run(FakePool(), 2)
+    assert events[:2] == [('start', 'members'), ('start', 'movies')]
+
+
+def test_failure_stops_dependents():
+    events = []
+    lock = threading.Lock()
+
+    def fail(cursor):
+        raise RuntimeError('copy failed')
+
+    scheduler = StageScheduler([Stage('members', fail), Stage('movies', record(events, lock, 'movies')),
+                                Stage('links', record(events, lock, 'links'), ['members', 'movies'])])
+    with pytest.raises(RuntimeError):
+        scheduler.run(FakePool(), 2)
+    assert ('start', 'links') not in events
+
+
+def test_critical_path():
+    scheduler = StageScheduler(stages([], threading.Lock()))
+    assert scheduler.critical_path({'members': 1, 'movies': 3, 'links': 1, 'roles': 5, 'stats': 2}) == \
+        ['movies', 'links', 'roles']
+    assert scheduler.critical_path({'members': 4, 'movies': 3, 'links': 1, 'roles': 0, 'stats': 2}) == \
+        ['members', 'links', 'stats']
+    assert StageScheduler([]).critical_path({}) == []
+
+
+def test_invalid_stages():
+    run = record([], threading.Lock(), 'a')
+    with pytest.raises(ValueError, match='duplicate'):
+        StageScheduler([Stage('a', run), Stage('a', run)])
+    with pytest.raises(ValueError, match='unknown'):
+        StageScheduler([Stage('a', run, ['b'])])
+    with pytest.raises(ValueError, match='cycle'):
+        StageScheduler([Stage('a', run, ['b']), Stage('b', run, ['a'])])
@@ -0,0 +1,100 @@
+import json
+import re
+
+from metrics import PREFIX, Metrics
+
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="[^"]*"'
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(%s(,%s)*)?\})? (\S+)$' % (LABEL, LABEL))
+# the samples a family of each type may hold, by suffix
+SUFFIXES = {'counter': ('',), 'gauge': ('',), 'summary': ('_sum', '_count')}
+
+
+def parse(text):
+    '''
+    Parse the text exposition format strictly enough to reject samples outside their family
+    :return: dict of family name to (type, list of (sample name, labels, value))
+    '''
+    families = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            name, kind = line[len('# TYPE '):].split(' ')
+            assert name not in families, "family %s declared twice" % name
+            families[name] = (kind, [])
+            current = name
+            continue
+        match = SAMPLE.match(line)
+        assert match, "not a sample: %r" % line
+        name = match.group(1)
+        kind, samples = families[current]
+        assert any(name == current + suffix for suffix in SUFFIXES[kind]), \
+            "%s in %s family %s" % (name, kind, current)
+        labels = dict(re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)="([^"]*)"', match.group(3) or ''))
+        samples.append((name, labels, float(match.group(5))))
+    return families
+
+
+def test_prometheus_output_parses(tmp_path):
+    metrics = Metrics()
+    metrics.inc('rows_loaded', 10, table='movie')
+    metrics.inc('rows_loaded', 5, table='member')
+    metrics.set('partitions_built', 3)
+    with metrics.stage('load'):
+        metrics.observe('query_seconds', 0.5)
+        metrics.observe('query_seconds', 1.5)
+
+    path = str(tmp_path / 'run.prom')
+    metrics.write_prometheus(path)
+    with open(path) as f_in:
+        families = parse(f_in.read())
+
+    assert families[PREFIX + 'rows_loaded'][0] == 'counter'
+    assert sorted(value for name, labels, value in families[PREFIX + 'rows_loaded'][1]) == [5, 10]
+    assert families[PREFIX + 'partitions_built'] == ('gauge', [(PREFIX + 'partitions_built', {}, 3)])
+    assert families[PREFIX + 'stage_seconds'][0] == 'summary'
+    kind, samples = families[PREFIX + 'query_seconds']
+    assert kind == 'summary'
+    assert sorted(samples) == [(PREFIX + 'query_seconds_count', {'stage': 'load'}, 2),
+                               (PREFIX + 'query_seconds_sum', {'stage': 'load'}, 2.0)]
+    assert families[PREFIX + 'query_seconds_max'] == ('gauge',
+                                                      [(PREFIX + 'query_seconds_max', {'stage': 'load'}, 1.5)])
+
+
+def test_json_report(tmp_path):
+    metrics = Metrics()
+    metrics.inc('queries')
+    metrics.inc('queries')
+    metrics.export(str(tmp_path), 'run')
+    with open(str(tmp_path / 'run.json')) as f_in:
+        report = json.load(f_in)
+    assert report['counters'] == [{'name': 'queries', 'labels': {}, 'value': 2}]
+    assert (tmp_path / 'run.prom').exists()
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statusmessage = None
+        self.rowcount = -1
+
+    def execute(self, query, *args):
+        self.statusmessage, self.rowcount = {'insert': ('INSERT 0 3', 3), 'select': ('SELECT 7', 7)}[query]
+
+    def copy_expert(self, query, data):
+        self.statusmessage, self.rowcount = 'COPY 4', 4
+
+
+def test_stage_counts_written_rows_and_nests_labels():
+    metrics = Metrics()
+    with metrics.stage('load', FakeCursor()) as cursor:
+        cursor.execute('insert')
+        cursor.execute('select')
+        cursor.copy_expert('copy', None)
+        with metrics.timer('query_seconds', table='movie'):
+            pass
+
+    assert cursor.rows == 7
+    assert metrics.counters[('stage_rows', (('stage', 'load'),))] == 7
+    assert [key for key in metrics.timers if key[0] == 'query_seconds'] == \
+        [('query_seconds', (('stage', 'load'), ('table', 'movie')))]
+    metrics.reset()
+    assert not metrics.counters and not metrics.timers
@@ -0,0 +1,44 @@
+from array import array
+
+import pytest
+
+from metrics import registry
+from paralleltane import ParallelTane
+from support import minimal_fds, random_columns
+
+
+@pytest.mark.parametrize('seed', range(12))
+@pytest.mark.parametrize('cache_bytes', [None, 0, 400])
+def test_parallel_tane_finds_the_minimal_dependencies(seed, cache_bytes):
+    columns = [array('i', column) for column in random_columns(seed)]
+    tane = ParallelTane(columns, workers=2, batch_size=2, cache_bytes=cache_bytes)
+    assert tane.run() == minimal_fds(columns)
+    # every block is freed by the end
+    assert tane.cache.stats()['blocks'] == 0
+    assert tane.cache.nbytes == 0
+
+
+def test_budget_is_respected():
+    columns = [array('i', column) for column in random_columns(5)]
+    stored = []
+    tane = ParallelTane(columns, workers=2, batch_size=1, cache_bytes=200)
+    put = tane.cache.put
+
+    def tracked_put(mask, location):
+        put(mask, location)
+        stored.append(tane.cache.nbytes)
+    tane.cache.put = tracked_put
+    assert tane.run() == minimal_fds(columns)
+    assert max(stored) <= 200
+    # some sets were left out and computed from the columns
+    assert 0 < tane.cache.stats()['unstored'] < tane.cache.stats()['misses']
+
+
+def test_partitions_built_counts_the_worker_products():
+    columns = [array('i', column) for column in random_columns(5)]
+    registry.reset()
+    tane = ParallelTane(columns, workers=2)
+    tane.run()
+    built = registry.report()['gauges']
+    assert {'name': 'partitions_built', 'labels': {}, 'value': tane.cache.stats()['misses']} in built
+    assert tane.cache.stats()['misses'] >= len(columns)
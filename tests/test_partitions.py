@@ -0,0 +1,54 @@
+import pytest
+
+from partitions import PartitionCache, StrippedPartition
+from support import minimal_fds, random_columns, violations
+from tane import Tane
+
+
+def test_conflict_finds_a_disagreeing_pair():
+    partition = StrippedPartition.from_column([0, 1, 0, 1, 2])
+    assert partition.conflict([5, 6, 5, 6, 7]) is None
+    assert partition.refines([5, 6, 5, 6, 7])
+    assert partition.conflict([5, 6, 5, 7, 7]) == (1, 3)
+    assert not partition.refines([5, 6, 5, 7, 7])
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_product_and_violations_match_the_rows(seed):
+    columns = random_columns(seed)
+    if len(columns) < 3:
+        return
+    product = StrippedPartition.from_column(columns[0]).product(StrippedPartition.from_column(columns[1]),
+                                                                [-1] * len(columns[0]))
+    pairs = list(zip(columns[0], columns[1]))
+    assert sorted(map(sorted, product.classes())) == \
+        sorted(sorted(row for row in range(len(pairs)) if pairs[row] == pair)
+               for pair in set(pairs) if pairs.count(pair) > 1)
+    assert product.violations(columns[2]) == violations(columns, 3, 2)
+    assert product.refines(columns[2]) == (violations(columns, 3, 2) == 0)
+
+
+@pytest.mark.parametrize('budget', [None, 0, 100])
+@pytest.mark.parametrize('seed', range(20))
+def test_tane_with_a_byte_budget(seed, budget):
+    columns = random_columns(seed)
+    tane = Tane(columns, cache_bytes=budget)
+    assert tane.run() == minimal_fds(columns)
+    if budget is not None:
+        # only the newest partition may go over the budget
+        assert tane.cache.nbytes <= budget or tane.cache.stats()['partitions'] == 1
+
+
+def test_cache_derives_missing_partitions_and_evicts_the_oldest():
+    columns = [[0, 0, 1, 1, 2], [0, 1, 0, 1, 0], [5, 5, 5, 6, 6]]
+    cache = PartitionCache(columns)
+    full = cache.get(0b111)
+    assert sorted(map(list, full.classes())) == []
+    assert sorted(map(list, cache.get(0b101).classes())) == [[0, 1]]
+    assert 0b001 in cache and 0b100 in cache
+
+    small = PartitionCache(columns, budget=PartitionCache.size_of(cache.get(0b001)))
+    small.get(0b001)
+    small.get(0b010)
+    assert 0b001 not in small and 0b010 in small
+    assert small.stats()['evictions'] == 1
@@ -0,0 +1,96 @@
+import pytest
+
+import snapshot
+from incremental import FDState
+from support import encode
+from tane import Tane
+
+
+SOURCE = {'table': 't', 'where': None, 'id_column': 'nid'}
+
+
+def write(tmp_path, rows=([b'x', b'1', None], [b'y', b'2', b'a'], [b'x', b'1', b'a'])):
+    relation = encode(rows, 3)
+    relation.checksum = 'abc'
+    relation.source = SOURCE
+    path = str(tmp_path / 'relation.snap')
+    snapshot.write(relation, path)
+    return relation, path
+
+
+def test_snapshot_round_trip(tmp_path):
+    relation, path = write(tmp_path)
+
+    mapped = snapshot.open_snapshot(path, verify=True)
+    assert mapped.names == relation.names
+    assert mapped.types == relation.types
+    assert mapped.checksum == 'abc'
+    assert mapped.source == relation.source
+    assert mapped.dictionaries == relation.dictionaries
+    assert list(mapped.row_ids) == [1, 2, 3]
+    assert [list(column) for column in mapped.columns] == [list(column) for column in relation.columns]
+    assert [mapped.decode(0, code) for code in mapped.columns[0]] == ['x', 'y', 'x']
+    assert mapped.decode(2, mapped.columns[2][0]) is None
+
+
+def test_empty_snapshot(tmp_path):
+    relation, path = write(tmp_path, [])
+    mapped = snapshot.open_snapshot(path, verify=True)
+    assert mapped.num_rows == 0
+    assert [list(column) for column in mapped.columns] == [[], [], []]
+
+
+def test_state_of_a_snapshot_can_be_saved_and_updated(tmp_path):
+    relation = encode([[b'x', b'1'], [b'y', b'2'], [b'x', b'1']], 2)
+    path = str(tmp_path / 'relation.snap')
+    snapshot.write(relation, path)
+    mapped = snapshot.open_snapshot(path)
+
+    state = FDState(mapped, Tane(mapped.columns).run())
+    assert state.fds == [(1, 1), (2, 0)]
+    state.save(tmp_path / 'state')
+    state = FDState.load(tmp_path / 'state')
+
+    state.relation.add_row(4, [b'y', b'3'])
+    violated, added = state.update(3)
+    assert violated == [(1, 1)]
+    # the appended value is coded like the mapped ones
+    assert list(state.relation.columns[0]) == [0, 1, 0, 1]
+    assert state.fds == sorted(Tane(state.relation.columns).run())
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(ValueError):
+        snapshot.open_snapshot(str(path))
+
+
+def test_truncated_snapshot_is_rejected(tmp_path):
+    relation, path = write(tmp_path)
+    with open(path, 'rb') as f_in:
+        data = f_in.read()
+    with open(path, 'wb') as f_out:
+        f_out.write(data[:-4])
+    with pytest.raises(ValueError, match='truncated'):
+        snapshot.open_snapshot(path)
+
+
+def test_corrupt_snapshot_is_rejected_when_verified(tmp_path):
+    relation, path = write(tmp_path)
+    with open(path, 'r+b') as f_out:
+        f_out.seek(-1, 2)
+        f_out.write(b'\x07')
+    # without verifying, only the size is checked
+    assert list(snapshot.open_snapshot(path).columns[2]) != list(relation.columns[2])
+    with pytest.raises(ValueError, match='checksum'):
+        snapshot.open_snapshot(path, verify=True)
+
+
+def test_load_checks_columns_and_source(tmp_path):
+    relation, path = write(tmp_path)
+    assert snapshot.load(path, ['c0', 'c1', 'c2'], SOURCE).num_rows == 3
+    with pytest.raises(ValueError, match='columns'):
+        snapshot.load(path, ['c0', 'c1'], SOURCE)
+    with pytest.raises(ValueError, match='extracted with'):
+        snapshot.load(path, ['c0', 'c1', 'c2'], dict(SOURCE, where='nid > 1'))
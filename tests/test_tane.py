@@ -0,0 +1,30 @@
+import pytest
+
+from support import minimal_fds, random_columns, violations
+from tane import Tane, format_fds
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_tane_finds_the_minimal_dependencies(seed):
+    columns = random_columns(seed)
+    assert Tane(columns).run() == minimal_fds(columns)
+
+
+def test_tane_on_an_empty_relation():
+    assert Tane([[], []]).run() == [(0, 0), (0, 1)]
+    assert Tane([]).run() == []
+
+
+def test_format_fds():
+    assert format_fds([(0b011, 2), (0, 0)], ['a', 'b', 'c']) == ['a, b-->c', '-->a']
+
+
+@pytest.mark.parametrize('seed', range(40))
+@pytest.mark.parametrize('max_error', [0.05, 0.1, 0.25])
+def test_approximate_search_finds_the_minimal_dependencies_within_the_bound(seed, max_error):
+    columns = random_columns(seed, max_rows=40)
+    tane = Tane(columns, max_error=max_error)
+    fds = tane.run()
+    for lhs, rhs in fds:
+        assert violations(columns, lhs, rhs) <= tane.max_violations
+    assert fds == minimal_fds(columns, tane.max_violations)